@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class FinanceConfig(AppConfig):
@@ -7,5 +8,9 @@ class FinanceConfig(AppConfig):
 
     def ready(self):
         import finance.signals
-        from . import scheduler
-        scheduler.start()
+        # Off unless FINANCE_SCHEDULER_AUTOSTART: run `manage.py run_scheduler` as its own process.
+        # When on, web processes compete for the scheduler lease; management commands never start it
+        if getattr(settings, 'FINANCE_SCHEDULER_AUTOSTART', False):
+            from . import scheduler
+            if scheduler.should_autostart():
+                scheduler.start()
@@ -0,0 +1,217 @@
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from io import StringIO
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import Expense, Income
+from . import caching, jobs, reminders
+
+DEFAULT_RUNS = 20
+DEFAULT_WARMUP = 2
+
+# What a web worker may spend importing at boot; about twice the time measured after
+# xhtml2pdf and APScheduler were deferred, for slower machines
+IMPORT_TIME_BUDGET_MS = 600
+# Heavy packages only some requests or processes need, which must stay out of a worker's boot
+DEFERRED_PACKAGES = ('xhtml2pdf', 'reportlab', 'pyhanko', 'html5lib', 'apscheduler')
+
+
+def _host():
+    # The test client's default 'testserver' host is not in ALLOWED_HOSTS outside the test runner
+    for host in settings.ALLOWED_HOSTS:
+        if host not in ('*',) and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _view(name, **params):
+    def run(client):
+        response = client.get(reverse(name), params)
+        if response.status_code != 200:
+            raise RuntimeError(f"{name} answered {response.status_code}")
+        # Streamed and file responses do their work while being read
+        if response.streaming:
+            b''.join(response.streaming_content)
+        response.close()
+    return run
+
+
+def _download_report_pdf(client):
+    # A cache miss only queues the render: run that job here, then time the download too
+    response = client.get(reverse('download_report_pdf'))
+    if response.status_code == 202:
+        jobs.run(response.json()['id'])
+    _view('download_report_pdf')(client)
+
+
+def _send_reminders(client):
+    # Rolled back so every run finds the same due reminders
+    with transaction.atomic():
+        call_command('send_reminders', stdout=StringIO())
+        transaction.set_rollback(True)
+
+
+# Name -> callable(client) doing one request (or command run)
+SCENARIOS = {
+    'dashboard': _view('dashboard'),
+    'dashboard_365': _view('dashboard', days='365'),
+    'all_transactions': _view('all_transactions'),
+    'finance_report': _view('finance_report'),
+    'download_report_pdf': _download_report_pdf,
+    'send_reminders': _send_reminders,
+}
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def measure(scenario, client, runs=DEFAULT_RUNS, warmup=DEFAULT_WARMUP, prepare=None):
+    """
+    Time `runs` calls of a scenario after `warmup` untimed ones, then make one more
+    call with queries captured and tracemalloc on (both slow things down, so that call
+    is not timed). `prepare()` runs before every call, e.g. to empty the cache.
+    """
+    prepare = prepare or (lambda: None)
+    for _ in range(warmup):
+        prepare()
+        scenario(client)
+
+    timings = []
+    for _ in range(runs):
+        prepare()
+        started = time.perf_counter()
+        scenario(client)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    prepare()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as ctx:
+            scenario(client)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'runs': runs,
+        'p50_ms': round(_percentile(timings, 0.50), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'queries': len(ctx.captured_queries),
+        'sql_ms': round(sum(float(q['time']) for q in ctx.captured_queries) * 1000, 2),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run(user, names=None, runs=DEFAULT_RUNS, warmup=DEFAULT_WARMUP, cold=False):
+    """
+    Benchmark the scenarios in `names` (default: all) as `user`. With `cold` the
+    finance cache is emptied before every call, so cached dashboards/reports are rebuilt.
+    Returns a JSON-serializable dict describing the environment, the data size and results.
+    """
+    names = names or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    client = Client(HTTP_HOST=_host())
+    client.force_login(user)
+    prepare = caching.get_cache().clear if cold else None
+    return {
+        'created_at': timezone.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+        },
+        'user': user.username,
+        'rows': {
+            'incomes': Income.objects.filter(user=user).count(),
+            'expenses': Expense.objects.filter(user=user).count(),
+            'due_reminders': reminders.due_reminders().count(), # All users: send_reminders is global
+        },
+        'runs': runs,
+        'warmup': warmup,
+        'cache': 'cold' if cold else 'warm',
+        'results': {name: measure(SCENARIOS[name], client, runs, warmup, prepare) for name in names},
+    }
+
+
+def compare(previous, current):
+    """{scenario: {metric: relative change}} for scenarios present in both result sets."""
+    changes = {}
+    for name, result in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: round((result[metric] - before[metric]) / before[metric], 3) if before[metric] else None
+            for metric in ('p50_ms', 'p95_ms', 'queries', 'peak_kib')
+        }
+    return changes
+
+
+def _boot_script():
+    # django.setup(), then the WSGI module and the URLconf (which imports every view),
+    # as a fresh web worker does before serving its first request
+    wsgi_module = settings.WSGI_APPLICATION.rsplit('.', 1)[0]
+    return (
+        "import importlib, sys, django\n"
+        "django.setup()\n"
+        f"importlib.import_module({wsgi_module!r})\n"
+        f"importlib.import_module({settings.ROOT_URLCONF!r})\n"
+        "print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))\n"
+    )
+
+
+def _parse_importtime(stderr):
+    """[(module, cumulative µs)] of the top-level imports in `python -X importtime` output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        name = name[1:] # One space after the bar, then two per nesting level
+        if not name.startswith(' '):
+            imports.append((name.strip(), int(cumulative)))
+    return imports
+
+
+def import_time(runs=5):
+    """
+    Boot a web worker's imports in `runs` fresh interpreters under -X importtime.
+    Returns the median total in ms, the heaviest top-level imports of that run and
+    which DEFERRED_PACKAGES were loaded anyway.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'FINANCE_SCHEDULER_AUTOSTART': ''}
+    measured = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _boot_script()],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise RuntimeError(f"Boot import failed: {result.stderr.strip().splitlines()[-1]}")
+        imports = _parse_importtime(result.stderr)
+        measured.append((sum(us for _, us in imports), imports, result.stdout.split()))
+
+    total, imports, packages = sorted(measured, key=lambda run: run[0])[len(measured) // 2]
+    return {
+        'runs': runs,
+        'total_ms': round(total / 1000, 1),
+        'budget_ms': IMPORT_TIME_BUDGET_MS,
+        'heaviest': [{'module': name, 'ms': round(us / 1000, 1)} for name, us in sorted(imports, key=lambda i: -i[1])[:10]],
+        'deferred_loaded': [name for name in DEFERRED_PACKAGES if name in packages],
+    }
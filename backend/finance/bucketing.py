@@ -0,0 +1,89 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db.models import DateTimeField, ExpressionWrapper, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def local_day(value):
+    """Return the local calendar day a stored date or datetime falls on."""
+    if isinstance(value, datetime):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return timezone.localtime(value).date()
+    return value
+
+
+def day_bounds(day):
+    """Aware [start, end) datetimes covering one local day."""
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+
+def _offset_segments(start_day, end_day):
+    """Split [start_day, end_day] into runs of days sharing one UTC offset."""
+    tz = timezone.get_current_timezone()
+    segments = []
+    day = start_day
+    while day <= end_day:
+        # Midday avoids ambiguity on the (rare) days a transition happens
+        offset = datetime.combine(day, time(12), tzinfo=tz).utcoffset()
+        if segments and segments[-1][2] == offset:
+            segments[-1][1] = day
+        else:
+            segments.append([day, day, offset])
+        day += timedelta(days=1)
+    return segments
+
+
+def local_day_rows(queryset, start_day=None, end_day=None, *, date_field='date', group_by=(), **aggregates):
+    """
+    Aggregate a queryset per local (TIME_ZONE) calendar day inside the database.
+
+    Returns a list of dicts with a 'day' key, the `group_by` values and the named
+    `aggregates` (default: total=Sum('amount')). No model instances are built.
+
+    DateTimeFields are shifted by the zone's fixed UTC offset and truncated in UTC,
+    which needs no time zone tables on MySQL and avoids the SQLite TruncDate quirk.
+    A window that spans an offset change is queried once per constant-offset run.
+    """
+    aggregates = aggregates or {'total': Sum('amount')}
+    field = queryset.model._meta.get_field(date_field)
+
+    if not isinstance(field, DateTimeField):
+        # Already a local calendar day (Savings.date, DailyRollup.day)
+        if start_day:
+            queryset = queryset.filter(**{f'{date_field}__gte': start_day})
+        if end_day:
+            queryset = queryset.filter(**{f'{date_field}__lte': end_day})
+        rows = queryset.values(date_field, *group_by).annotate(**aggregates).order_by()
+        return [{'day': row.pop(date_field), **row} for row in rows]
+
+    if start_day is None or end_day is None:
+        bounds = queryset.aggregate(first=Min(date_field), last=Max(date_field))
+        if bounds['first'] is None:
+            return []
+        start_day = start_day or local_day(bounds['first'])
+        end_day = end_day or local_day(bounds['last'])
+
+    results = []
+    for seg_start, seg_end, offset in _offset_segments(start_day, end_day):
+        shifted = ExpressionWrapper(F(date_field) + offset, output_field=DateTimeField())
+        segment = queryset.filter(**{
+            f'{date_field}__gte': day_bounds(seg_start)[0],
+            f'{date_field}__lt': day_bounds(seg_end)[1],
+        })
+        rows = (
+            segment.annotate(local_day=TruncDate(shifted, tzinfo=dt_timezone.utc))
+            .values('local_day', *group_by)
+            .annotate(**aggregates)
+            .order_by()
+        )
+        results.extend({'day': row.pop('local_day'), **row} for row in rows)
+    return results
+
+
+def sum_by_local_day(queryset, start_day=None, end_day=None, *, date_field='date', amount_field='amount', group_by=()):
+    """{(day, *group_values): total} for a queryset, see local_day_rows()."""
+    rows = local_day_rows(queryset, start_day, end_day, date_field=date_field, group_by=group_by, total=Sum(amount_field))
+    return {(row['day'], *(row[g] for g in group_by)): row['total'] for row in rows}
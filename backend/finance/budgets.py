@@ -0,0 +1,69 @@
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.utils import timezone
+from .models import Budget, DailyRollup
+
+
+def is_active(budget, today):
+    if budget.start_date and budget.end_date:
+        return budget.start_date <= today <= budget.end_date
+    return True
+
+
+def evaluate(user, budgets):
+    """
+    Attach spent/remaining (and their formatted versions) to every budget.
+
+    Spending for all budgets comes from one pass over the user's expense rollup rows
+    covering the union of the budget windows, so the query count does not grow with
+    the number of budgets.
+    """
+    budgets = list(budgets)
+    if not budgets:
+        return budgets
+
+    rows = DailyRollup.objects.filter(
+        user=user,
+        kind='Expense',
+        category__in={b.category_id for b in budgets},
+        day__gte=min(b.start_date for b in budgets),
+    )
+    if all(b.end_date for b in budgets):
+        rows = rows.filter(day__lte=max(b.end_date for b in budgets))
+
+    # Per category id: sorted days plus running totals so each budget is two bisects
+    days = {}
+    running = {}
+    for category, day, total in rows.order_by('category', 'day').values_list('category', 'day', 'total'):
+        days.setdefault(category, []).append(day)
+        cumulative = running.setdefault(category, [Decimal('0')])
+        cumulative.append(cumulative[-1] + total)
+
+    for budget in budgets:
+        category_days = days.get(budget.category_id, [])
+        cumulative = running.get(budget.category_id, [Decimal('0')])
+        lo = bisect_left(category_days, budget.start_date)
+        hi = bisect_right(category_days, budget.end_date) if budget.end_date else len(category_days)
+        spent = cumulative[hi] - cumulative[lo] if hi > lo else Decimal('0')
+
+        budget.spent = spent
+        budget.remaining = (budget.limit_amount or 0) - spent
+        budget.limit_f = intcomma(int(budget.limit_amount))
+        budget.spent_f = intcomma(int(spent))
+        budget.remaining_f = intcomma(int(budget.remaining))
+    return budgets
+
+
+def active_pockets(user, today=None):
+    """(weekly, monthly) budgets that cover today, with spending attached."""
+    today = today or timezone.localdate()
+    budgets = [b for b in Budget.objects.filter(user=user).select_related('category').order_by('end_date') if is_active(b, today)]
+
+    weekly, monthly = [], []
+    for budget in evaluate(user, budgets):
+        if budget.period == 'Weekly':
+            weekly.append(budget)
+        else:
+            monthly.append(budget)
+    return weekly, monthly
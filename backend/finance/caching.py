@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+
+def get_cache():
+    return caches[getattr(settings, 'FINANCE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id):
+    return f'finance:data-version:{user_id}'
+
+
+def get_data_version(user_id):
+    """Opaque token that changes whenever any of the user's finance data changes."""
+    cache = get_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Random rather than a counter, so an evicted key can never come back
+        # as a version some old cached entry was stored under
+        version = uuid4().hex
+        if not cache.add(_version_key(user_id), version, timeout=None):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def bump_data_version(user_id):
+    get_cache().set(_version_key(user_id), uuid4().hex, timeout=None)
+
+
+def data_changed(user_id):
+    bump_data_version(user_id)
+    if transaction.get_connection().in_atomic_block:
+        # Bump again once the write is visible to other connections, otherwise a
+        # concurrent request could cache pre-commit figures under the new version
+        transaction.on_commit(lambda: bump_data_version(user_id))
+
+
+def seconds_until_local_midnight():
+    now = timezone.localtime()
+    midnight = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+def memoize(user_id, name, build, *parts, timeout=None):
+    """
+    Return build() cached under the user's current data version.
+
+    Any write to the user's data changes the version and so orphans every entry
+    stored before it; orphans simply expire. `parts` distinguish variants (date
+    ranges, the local day for date-sensitive values, ...).
+    """
+    cache = get_cache()
+    key = ':'.join(['finance', name, str(user_id), get_data_version(user_id)] + [str(p) for p in parts])
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout=timeout)
+    return value
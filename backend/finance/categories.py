@@ -0,0 +1,89 @@
+from django.db import transaction
+from .models import IncomeCategory, ExpenseCategory, PaymentMethod
+from . import caching
+
+DEFAULT_INCOME_CATEGORIES = ['Salary', 'Bonus', 'Allowance', 'Overtime', 'Investment', 'Other']
+DEFAULT_EXPENSE_CATEGORIES = ['Food', 'Rent', 'Utilities', 'Transportation', 'Entertainment', 'Health', 'Groceries', 'Other']
+DEFAULT_PAYMENT_METHODS = ['Esewa', 'Khalti', 'Mobile Banking', 'Cash']
+
+# Choice list name -> model it is read from
+MODELS = {
+    'income': IncomeCategory,
+    'expense': ExpenseCategory,
+    'payment': PaymentMethod,
+}
+
+
+def _key(user_id):
+    return f'finance:category-choices:{user_id}'
+
+
+def seed_defaults(user):
+    """Give a new user the default categories and payment methods, one INSERT per table."""
+    for model, names in (
+        (IncomeCategory, DEFAULT_INCOME_CATEGORIES),
+        (ExpenseCategory, DEFAULT_EXPENSE_CATEGORIES),
+        (PaymentMethod, DEFAULT_PAYMENT_METHODS),
+    ):
+        model.objects.bulk_create([model(user=user, name=name, is_default=True) for name in names])
+    changed(user.pk) # bulk_create sends no post_save
+
+
+def choices(user_id):
+    """
+    The user's income categories, expense categories and payment methods as
+    {'income': [(id, name), ...], 'expense': [...], 'payment': [...]}.
+
+    Kept under its own key rather than the data version, which every income or
+    expense write changes; only adding or removing a category invalidates it.
+    """
+    cache = caching.get_cache()
+    value = cache.get(_key(user_id))
+    if value is None:
+        value = {
+            kind: list(model.objects.filter(user_id=user_id).order_by('pk').values_list('pk', 'name'))
+            for kind, model in MODELS.items()
+        }
+        cache.set(_key(user_id), value, timeout=None)
+    return value
+
+
+def names(user_id, kind):
+    """{id: name} for one of the user's choice lists."""
+    return dict(choices(user_id)[kind])
+
+
+def name_of(user_id, kind, pk):
+    """Display name of a category or payment method id ('' for None)."""
+    if pk is None:
+        return ''
+    found = names(user_id, kind).get(pk)
+    if found is None:
+        # Added by another process just now and not in this cached copy yet
+        changed(user_id)
+        found = names(user_id, kind).get(pk, '')
+    return found
+
+
+def resolve(user_id, kind, wanted):
+    """
+    {name: id} for the names in `wanted`, creating the ones the user does not have yet
+    with a single INSERT. Lets importers and recurring entries, which carry names,
+    write the foreign keys without a lookup per row.
+    """
+    ids = {name: pk for pk, name in choices(user_id)[kind]}
+    missing = {name for name in wanted if name not in ids}
+    if missing:
+        model = MODELS[kind]
+        model.objects.bulk_create([model(user_id=user_id, name=name) for name in sorted(missing)])
+        changed(user_id)
+        ids.update(model.objects.filter(user_id=user_id, name__in=missing).values_list('name', 'pk'))
+    return ids
+
+
+def changed(user_id):
+    key = _key(user_id)
+    caching.get_cache().delete(key)
+    if transaction.get_connection().in_atomic_block:
+        # As in caching.data_changed(): drop it again once the write is visible to other connections
+        transaction.on_commit(lambda: caching.get_cache().delete(key))
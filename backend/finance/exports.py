@@ -0,0 +1,80 @@
+import csv
+import json
+from django.db.models import Q
+from .models import Income, Expense, Savings
+from .bucketing import day_bounds
+from . import categories
+
+CHUNK_SIZE = 2000
+
+COLUMNS = ['type', 'date', 'category', 'amount', 'payment_method', 'source_type', 'description']
+
+
+class Echo:
+    """File-like object whose write() just hands the line back to csv.writer's caller."""
+    def write(self, value):
+        return value
+
+
+def _chunks(queryset, *fields):
+    """
+    Yield value tuples (date, pk, *fields) ordered by (date, pk), CHUNK_SIZE rows per query.
+
+    Keyset chunks rather than a single .iterator(): PyMySQL buffers a whole result set
+    client-side, so one big query would hold every row in memory on MySQL.
+    """
+    queryset = queryset.order_by('date', 'pk').values_list('date', 'pk', *fields)
+    last = None
+    while True:
+        chunk = queryset
+        if last:
+            chunk = chunk.filter(Q(date__gt=last[0]) | Q(date=last[0], pk__gt=last[1]))
+        rows = list(chunk[:CHUNK_SIZE])
+        yield from rows
+        if len(rows) < CHUNK_SIZE:
+            return
+        last = rows[-1]
+
+
+def export_rows(user, start_day=None, end_day=None):
+    """Yield one dict per income, expense and savings row, oldest first within each type."""
+    start_dt = day_bounds(start_day)[0] if start_day else None
+    end_dt = day_bounds(end_day)[1] if end_day else None
+
+    def in_range(queryset, is_datetime=True):
+        if start_day:
+            queryset = queryset.filter(date__gte=start_dt) if is_datetime else queryset.filter(date__gte=start_day)
+        if end_day:
+            queryset = queryset.filter(date__lt=end_dt) if is_datetime else queryset.filter(date__lte=end_day)
+        return queryset
+
+    # Rows carry category ids; the names come from the user's cached choice lists
+    names = {kind: categories.names(user.pk, kind) for kind in categories.MODELS}
+
+    incomes = in_range(Income.objects.filter(user=user))
+    for date, pk, source, amount, description in _chunks(incomes, 'source', 'amount', 'description'):
+        yield {'type': 'Income', 'date': date.isoformat(), 'category': names['income'].get(source, ''), 'amount': str(amount),
+               'payment_method': '', 'source_type': '', 'description': description or ''}
+
+    expenses = in_range(Expense.objects.filter(user=user))
+    fields = ('category', 'amount', 'payment_method', 'source_type', 'description')
+    for date, pk, category, amount, payment_method, source_type, description in _chunks(expenses, *fields):
+        yield {'type': 'Expense', 'date': date.isoformat(), 'category': names['expense'].get(category, ''), 'amount': str(amount),
+               'payment_method': names['payment'].get(payment_method, ''), 'source_type': source_type, 'description': description or ''}
+
+    savings = in_range(Savings.objects.filter(user=user), is_datetime=False)
+    for date, pk, is_automatic, amount, description in _chunks(savings, 'is_automatic', 'amount', 'description'):
+        yield {'type': 'Savings', 'date': date.isoformat(), 'category': 'Automatic' if is_automatic else 'Manual',
+               'amount': str(amount), 'payment_method': '', 'source_type': '', 'description': description or ''}
+
+
+def stream_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
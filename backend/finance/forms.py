@@ -1,8 +1,40 @@
 from django import forms
 from django.utils import timezone
-from .models import Income, Expense, SavingsGoal, Budget, Reminder
+from .models import Income, Expense, SavingsGoal, Budget, Reminder, RecurrenceRule
+from . import categories as categories_cache
 
-class IncomeForm(forms.ModelForm):
+ADD_NEW = 'Add New'
+
+def _category_field(attrs):
+    # Category and payment method ids, filled from the user's cached choices in __init__;
+    # a plain ChoiceField so neither rendering nor validation queries the category tables
+    return forms.ChoiceField(widget=forms.Select(attrs=attrs))
+
+def _set_choices(field, choices, placeholder, add_label):
+    field.choices = [('', placeholder)] + list(choices) + [(ADD_NEW, add_label)]
+
+def _check_new_name(form, field, new_field):
+    if form.cleaned_data.get(field) == ADD_NEW and not form.cleaned_data.get(new_field):
+        form.add_error(new_field, "Enter a name for the new entry.")
+
+class RecurrenceFields(forms.Form):
+    # Optional repetition of the entry being added, see recurrence.create_rule()
+    repeat = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Does not repeat')] + RecurrenceRule.FREQUENCY_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    repeat_every = forms.IntegerField(
+        required=False, min_value=1, initial=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Every'})
+    )
+    repeat_until = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+
+class IncomeForm(RecurrenceFields, forms.ModelForm):
+    source = _category_field({'class': 'form-select'})
     new_category = forms.CharField(
         required=False, 
         label="Or add a new category",
@@ -15,10 +47,9 @@ class IncomeForm(forms.ModelForm):
 
     class Meta:
         model = Income
-        fields = ['source', 'amount', 'date', 'description']
+        fields = ['amount', 'date', 'description']
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
-            'source': forms.Select(attrs={'class': 'form-select'}),
             'amount': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Enter amount'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Optional description'}),
         }
@@ -27,15 +58,20 @@ class IncomeForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user:
-            from .models import IncomeCategory
-            categories = IncomeCategory.objects.filter(user=user).values_list('name', 'name')
-            self.fields['source'].widget.choices = [('', 'Select Category')] + list(categories) + [('Add New', 'Add New Category')]
+            _set_choices(self.fields['source'], categories_cache.choices(user.pk)['income'], 'Select Category', 'Add New Category')
         
         # Set initial time
         if not self.initial.get('time'):
             self.initial['time'] = timezone.now().time().strftime('%H:%M')
 
-class ExpenseForm(forms.ModelForm):
+    def clean(self):
+        cleaned_data = super().clean()
+        _check_new_name(self, 'source', 'new_category')
+        return cleaned_data
+
+class ExpenseForm(RecurrenceFields, forms.ModelForm):
+    category = _category_field({'class': 'form-control', 'id': 'category-select'})
+    payment_method = _category_field({'class': 'form-control', 'id': 'payment-method-select'})
     new_category = forms.CharField(
         required=False, 
         label="Or add a new category",
@@ -53,12 +89,10 @@ class ExpenseForm(forms.ModelForm):
 
     class Meta:
         model = Expense
-        fields = ['amount', 'category', 'new_category', 'payment_method', 'new_payment_method', 'source_type', 'date', 'time', 'description']
+        fields = ['amount', 'new_category', 'new_payment_method', 'source_type', 'date', 'time', 'description']
         widgets = {
             'amount': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Enter amount'}),
-            'category': forms.Select(attrs={'class': 'form-control', 'id': 'category-select'}),
             'new_category': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter new category', 'id': 'new-category-input', 'style': 'display: none;'}),
-            'payment_method': forms.Select(attrs={'class': 'form-control', 'id': 'payment-method-select'}),
             'new_payment_method': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter new payment method', 'id': 'new-payment-method-input', 'style': 'display: none;'}),
             'source_type': forms.Select(attrs={'class': 'form-control'}),
             'date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
@@ -70,20 +104,24 @@ class ExpenseForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user:
-            from .models import ExpenseCategory, PaymentMethod
+            choices = categories_cache.choices(user.pk)
             
             # Categories
-            categories = ExpenseCategory.objects.filter(user=user).values_list('name', 'name')
-            self.fields['category'].widget.choices = [('', 'Select Category')] + list(categories) + [('Add New', 'Add New Category')]
+            _set_choices(self.fields['category'], choices['expense'], 'Select Category', 'Add New Category')
             
             # Payment Methods
-            p_methods = PaymentMethod.objects.filter(user=user).values_list('name', 'name')
-            self.fields['payment_method'].widget.choices = [('', 'Select Payment Method')] + list(p_methods) + [('Add New', 'Add New Payment Method')]
+            _set_choices(self.fields['payment_method'], choices['payment'], 'Select Payment Method', 'Add New Payment Method')
 
         # Set initial time
         if not self.initial.get('time'):
             self.initial['time'] = timezone.now().time().strftime('%H:%M')
 
+    def clean(self):
+        cleaned_data = super().clean()
+        _check_new_name(self, 'category', 'new_category')
+        _check_new_name(self, 'payment_method', 'new_payment_method')
+        return cleaned_data
+
 class SavingsGoalForm(forms.ModelForm):
     class Meta:
         model = SavingsGoal
@@ -96,6 +134,7 @@ class SavingsGoalForm(forms.ModelForm):
         }
 
 class BudgetForm(forms.ModelForm):
+    category = _category_field({'class': 'form-select'})
     new_category = forms.CharField(
         required=False, 
         label="Or add a new category",
@@ -104,9 +143,8 @@ class BudgetForm(forms.ModelForm):
 
     class Meta:
         model = Budget
-        fields = ['category', 'limit_amount', 'period', 'start_date']
+        fields = ['limit_amount', 'period', 'start_date']
         widgets = {
-            'category': forms.Select(attrs={'class': 'form-select'}),
             'limit_amount': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Enter limit amount'}),
             'period': forms.Select(choices=[('Weekly', 'Weekly'), ('Monthly', 'Monthly')], attrs={'class': 'form-select'}),
             'start_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
@@ -116,11 +154,14 @@ class BudgetForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user:
-            from .models import ExpenseCategory
-            categories = ExpenseCategory.objects.filter(user=user).values_list('name', 'name')
-            self.fields['category'].widget.choices = [('', 'Select Category')] + list(categories) + [('Add New', 'Add New Category')]
+            _set_choices(self.fields['category'], categories_cache.choices(user.pk)['expense'], 'Select Category', 'Add New Category')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        _check_new_name(self, 'category', 'new_category')
+        return cleaned_data
 
-class ReminderForm(forms.ModelForm):
+class ReminderForm(RecurrenceFields, forms.ModelForm):
     date = forms.DateField(
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
     )
@@ -0,0 +1,100 @@
+import logging
+import os
+import traceback
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from .models import BackgroundJob
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 30 * 60
+
+# kind -> (handler, setting holding the worker count, default worker count)
+_handlers = {}
+_executors = {}
+
+
+def register(kind, workers_setting, default_workers=1):
+    """Decorator registering `handler(job)` to run jobs of this kind off the request path."""
+    def decorator(handler):
+        _handlers[kind] = (handler, workers_setting, default_workers)
+        return handler
+    return decorator
+
+
+def _executor(kind):
+    # One bounded pool per kind, so a burst of one kind cannot occupy every thread
+    if kind not in _executors:
+        handler, workers_setting, default_workers = _handlers[kind]
+        workers = getattr(settings, workers_setting, default_workers)
+        _executors[kind] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'finance-{kind}')
+    return _executors[kind]
+
+
+def job_path(job, extension):
+    return os.path.join(settings.MEDIA_ROOT, 'jobs', f"{job.kind}-{job.pk}.{extension}")
+
+
+def create(user, kind, **params):
+    """Create a pending job and queue it once the surrounding transaction commits."""
+    job = BackgroundJob.objects.create(user=user, kind=kind, params=params)
+    transaction.on_commit(lambda: _executor(kind).submit(_run_in_worker, job.pk))
+    return job
+
+
+def set_progress(job, progress, total=None):
+    job.progress = progress
+    fields = ['progress']
+    if total is not None:
+        job.total = total
+        fields.append('total')
+    job.save(update_fields=fields)
+
+
+def run(job_id):
+    """Execute one job in the current thread, recording the outcome on the job row."""
+    job = BackgroundJob.objects.select_related('user').get(pk=job_id)
+    handler = _handlers[job.kind][0]
+    job.status = 'running'
+    job.save(update_fields=['status'])
+    try:
+        with profiling.sampled(f'job_{job.kind}'), metrics.job(f'job_{job.kind}'):
+            job.result_file = handler(job) or ''
+        job.status = 'done'
+    except Exception:
+        logger.exception("Background job %s failed", job_id)
+        job.status = 'failed'
+        job.error = traceback.format_exc(limit=5)
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result_file', 'error', 'finished_at', 'progress', 'total'])
+        metrics.flush()
+    return job
+
+
+def fail_stale(timeout=None):
+    """
+    Mark failed the pending and running jobs older than `timeout` (default
+    FINANCE_JOB_TIMEOUT_SECONDS). Jobs only live in the memory of the web process that
+    created them, so a restart or deploy leaves rows nothing will ever pick up; failing
+    them lets the user start the job again. Returns how many were failed.
+    """
+    timeout = timeout if timeout is not None else getattr(settings, 'FINANCE_JOB_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS)
+    now = timezone.now()
+    stale = BackgroundJob.objects.filter(status__in=['pending', 'running'], created_at__lt=now - timedelta(seconds=timeout))
+    count = stale.update(status='failed', error='Abandoned: the worker stopped before finishing the job', finished_at=now)
+    if count:
+        logger.warning("Failed %s abandoned background jobs", count)
+    return count
+
+
+def _run_in_worker(job_id):
+    try:
+        run(job_id)
+    finally:
+        # Pool threads are long-lived; don't let them hold connections between jobs
+        connections.close_all()
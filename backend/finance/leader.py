@@ -0,0 +1,39 @@
+import os
+import socket
+import uuid
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import SchedulerLease
+
+
+def holder_id():
+    """Identifies this process (host, pid and a random suffix in case pids are reused)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def try_acquire(name, holder, ttl):
+    """
+    Take or renew the lease `name` for `ttl` if it is free, expired or already ours.
+    Returns the new expiry time, or None if another live process holds it.
+
+    Both paths are a single conditional write, so two processes can never both succeed.
+    """
+    now = timezone.now()
+    expires_at = now + ttl
+    updated = SchedulerLease.objects.filter(Q(holder=holder) | Q(expires_at__lt=now), name=name).update(
+        holder=holder, expires_at=expires_at,
+    )
+    if updated:
+        return expires_at
+    try:
+        with transaction.atomic():
+            SchedulerLease.objects.create(name=name, holder=holder, expires_at=expires_at)
+    except IntegrityError:
+        return None # Row exists and is held by someone else
+    return expires_at
+
+
+def release(name, holder):
+    """Give the lease up early so another process can take over without waiting for expiry."""
+    SchedulerLease.objects.filter(name=name, holder=holder).update(expires_at=timezone.now())
@@ -0,0 +1,133 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from django.db.models import Q, Sum
+from django.utils import timezone
+from .models import Income, Expense, LedgerEntry
+from .bucketing import day_bounds
+from .rollups import AUTOMATIC, MANUAL
+from . import categories
+
+PAGE_SIZE = 25
+
+# Entry types that move money; Savings only earmark part of an income
+BALANCE_TYPES = ('Income', 'Expense')
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return timezone.make_aware(value) if timezone.is_naive(value) else value
+    return day_bounds(value)[0] # A plain date counts from local midnight
+
+
+def entry_values(instance):
+    """
+    LedgerEntry field values mirroring an Income, Expense or Savings row. The label
+    is the category name at the time of writing, looked up in the cached choices.
+    """
+    if isinstance(instance, Income):
+        transaction_type, amount = 'Income', instance.amount
+        label = categories.name_of(instance.user_id, 'income', instance.source_id)
+    elif isinstance(instance, Expense):
+        transaction_type, amount = 'Expense', -instance.amount
+        label = categories.name_of(instance.user_id, 'expense', instance.category_id)
+    else:
+        transaction_type, label, amount = 'Savings', AUTOMATIC if instance.is_automatic else MANUAL, instance.amount
+    return {
+        'user_id': instance.user_id,
+        'transaction_type': transaction_type,
+        'object_id': instance.pk,
+        'label': label,
+        'amount': amount,
+        'date': _as_datetime(instance.date),
+        'description': instance.description,
+    }
+
+
+def entry_for(instance):
+    """Unsaved LedgerEntry for a source row, for bulk_create."""
+    return LedgerEntry(**entry_values(instance))
+
+
+def sync(instance):
+    values = entry_values(instance)
+    LedgerEntry.objects.update_or_create(
+        transaction_type=values.pop('transaction_type'), object_id=values.pop('object_id'), defaults=values,
+    )
+
+
+def remove(instance):
+    LedgerEntry.objects.filter(transaction_type=entry_values(instance)['transaction_type'], object_id=instance.pk).delete()
+
+
+def history(user):
+    """The user's income and expense entries."""
+    return LedgerEntry.objects.filter(user=user, transaction_type__in=BALANCE_TYPES)
+
+
+def recent(user, count=5):
+    return list(history(user).order_by('-date', '-id')[:count])
+
+
+def encode_cursor(entry):
+    raw = f"{entry.date.isoformat()}|{entry.pk}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """(date, id) from a cursor string, or None if it is malformed."""
+    try:
+        raw = urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        date, pk = raw.split('|')
+        return datetime.fromisoformat(date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _keyset_filter(cursor, older):
+    date, pk = cursor
+    op = 'lt' if older else 'gt'
+    return Q(**{f'date__{op}': date}) | Q(date=date, **{f'id__{op}': pk})
+
+
+def balance_through(entry):
+    """Running balance (income minus expenses) up to and including an entry."""
+    return history(entry.user_id).filter(
+        Q(date__lt=entry.date) | Q(date=entry.date, id__lte=entry.pk)
+    ).aggregate(Sum('amount'))['amount__sum'] or 0
+
+
+def page(user, after=None, before=None, size=PAGE_SIZE):
+    """
+    One page of the user's income/expense history, newest first, with running balances.
+
+    A single (user, date, id) keyset query fetches size + 1 entries, so memory is bounded
+    by the page size no matter how long the history is. Pass the `next_cursor` of a page
+    as `after` to get the following (older) page, or its `prev_cursor` as `before` to go
+    back. Returns (entries, prev_cursor, next_cursor); a cursor is None at either end.
+    """
+    cursor = decode_cursor(before) if before else decode_cursor(after) if after else None
+    older = not (before and cursor)
+
+    entries = history(user)
+    if cursor:
+        entries = entries.filter(_keyset_filter(cursor, older))
+    ordering = ('-date', '-id') if older else ('date', 'id')
+    rows = list(entries.order_by(*ordering)[:size + 1])
+    has_more = len(rows) > size
+    rows = rows[:size]
+
+    if not older:
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = cursor is not None, has_more
+
+    if rows:
+        balance = balance_through(rows[0])
+        for entry in rows:
+            entry.balance = balance
+            balance -= entry.amount
+
+    prev_cursor = encode_cursor(rows[0]) if rows and has_newer else None
+    next_cursor = encode_cursor(rows[-1]) if rows and has_older else None
+    return rows, prev_cursor, next_cursor
@@ -0,0 +1,37 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from finance import benchmarks, synthetic
+
+class Command(BaseCommand):
+    help = 'Measures p50/p95 latency, query count and peak memory of the main views and send_reminders, as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=synthetic.username(synthetic.DEFAULT_PREFIX, 0), help='User to benchmark as (default: the first generated user)')
+        parser.add_argument('--scenario', action='append', choices=list(benchmarks.SCENARIOS), help='Only this scenario (repeatable)')
+        parser.add_argument('--runs', type=int, default=benchmarks.DEFAULT_RUNS)
+        parser.add_argument('--warmup', type=int, default=benchmarks.DEFAULT_WARMUP)
+        parser.add_argument('--cold', action='store_true', help='Empty the finance cache before every call')
+        parser.add_argument('--output', help='Write the results to this JSON file instead of stdout')
+        parser.add_argument('--compare', help='Earlier results file to report relative changes against')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist (run generate_data first)")
+
+        results = benchmarks.run(user, options['scenario'], runs=options['runs'], warmup=options['warmup'], cold=options['cold'])
+        if options['compare']:
+            with open(options['compare']) as f:
+                results['changes'] = benchmarks.compare(json.load(f), results)
+
+        text = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text + '\n')
+            for name, result in results['results'].items():
+                self.stdout.write(f"{name}: p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, {result['queries']} queries, {result['peak_kib']} KiB peak")
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(text)
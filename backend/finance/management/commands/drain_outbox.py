@@ -0,0 +1,31 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from finance import outbox
+
+class Command(BaseCommand):
+    help = 'Sends queued outbox emails with a pool of workers, retrying failures with exponential backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Concurrent senders (default: FINANCE_OUTBOX_WORKERS)')
+        parser.add_argument('--loop', action='store_true', help='Keep draining until interrupted')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between drains with --loop')
+        parser.add_argument('--stats', action='store_true', help='Only print queue depth and latency figures as JSON')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(outbox.stats(), indent=2))
+            return
+
+        while True:
+            counts = outbox.drain(workers=options['workers'])
+            if any(counts.values()) or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{counts['sent']} sent, {counts['retry']} to retry, {counts['failed']} failed permanently"
+                ))
+            if not options['loop']:
+                break
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                break
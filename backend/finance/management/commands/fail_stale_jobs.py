@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from finance import jobs
+
+class Command(BaseCommand):
+    help = 'Marks failed the background jobs left pending or running by a restarted web process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=int, default=None, help='Seconds after creation (default: FINANCE_JOB_TIMEOUT_SECONDS)')
+
+    def handle(self, *args, **options):
+        count = jobs.fail_stale(options['timeout'])
+        self.stdout.write(self.style.SUCCESS(f"{count} stale jobs marked failed"))
@@ -0,0 +1,30 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from finance import synthetic
+
+class Command(BaseCommand):
+    help = 'Generates reproducible synthetic users with incomes, expenses, budgets, savings and reminders for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--years', type=float, default=1.0, help='Length of each user\'s history')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--expenses-per-day', type=int, default=3, help='Average expenses per user per day')
+        parser.add_argument('--end', type=date.fromisoformat, default=None, help='Last day of the history, YYYY-MM-DD (default: today)')
+        parser.add_argument('--prefix', default=synthetic.DEFAULT_PREFIX, help='Usernames are <prefix>0000, <prefix>0001, ...')
+        parser.add_argument('--password', default=synthetic.DEFAULT_PASSWORD)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username=synthetic.username(options['prefix'], 0)).exists():
+            raise CommandError(f"Users prefixed '{options['prefix']}' already exist; choose another --prefix or database")
+
+        counts = synthetic.generate(
+            users=options['users'], years=options['years'], seed=options['seed'], prefix=options['prefix'],
+            expenses_per_day=options['expenses_per_day'], end=options['end'], password=options['password'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {counts['users']} users, {counts['incomes']} incomes, {counts['expenses']} expenses, "
+            f"{counts['savings']} savings, {counts['budgets']} budgets and {counts['reminders']} reminders "
+            f"in {counts['seconds']:.1f}s"
+        ))
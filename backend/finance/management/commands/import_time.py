@@ -0,0 +1,31 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from finance import benchmarks
+
+class Command(BaseCommand):
+    help = 'Measures what a web worker spends on imports at boot (python -X importtime) and fails over the budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to measure; the median is reported')
+        parser.add_argument('--budget', type=float, default=benchmarks.IMPORT_TIME_BUDGET_MS, help='Milliseconds (default: %(default)s)')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            results = benchmarks.import_time(runs=options['runs'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        results['budget_ms'] = options['budget']
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(f"Boot imports: {results['total_ms']}ms (median of {results['runs']}), budget {options['budget']}ms")
+            for row in results['heaviest']:
+                self.stdout.write(f"{row['ms']:>10.1f}ms  {row['module']}")
+
+        if results['deferred_loaded']:
+            raise CommandError(f"Loaded at boot but meant to be deferred: {', '.join(results['deferred_loaded'])}")
+        if results['total_ms'] > options['budget']:
+            raise CommandError(f"Boot imports took {results['total_ms']}ms, over the {options['budget']}ms budget")
+        self.stdout.write(self.style.SUCCESS("Within budget."))
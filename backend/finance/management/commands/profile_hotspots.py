@@ -0,0 +1,25 @@
+import glob
+import os
+from django.core.management.base import BaseCommand, CommandError
+from finance import profiling
+
+class Command(BaseCommand):
+    help = 'Merges sampled cProfile dumps (FINANCE_PROFILE_SAMPLE_RATE) into a list of the most expensive functions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default='*', help='Only profiles of this view or job, e.g. dashboard or send_reminders (glob)')
+        parser.add_argument('--sort', choices=['tottime', 'cumtime'], default='tottime', help='Own time, or time including callees')
+        parser.add_argument('--limit', type=int, default=25)
+        parser.add_argument('--dir', default=None, help='Profile directory (default: FINANCE_PROFILE_DIR)')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or profiling.profile_dir()
+        paths = sorted(glob.glob(os.path.join(directory, f"*-{options['name']}-*.prof")))
+        if not paths:
+            raise CommandError(f"No profiles matching '{options['name']}' in {directory}")
+
+        rows = profiling.hotspots(paths, sort=options['sort'], limit=options['limit'])
+        self.stdout.write(f"{len(paths)} profiles, sorted by {options['sort']}")
+        self.stdout.write(f"{'calls':>10} {'tottime ms':>12} {'cumtime ms':>12}  function")
+        for row in rows:
+            self.stdout.write(f"{row['calls']:>10} {row['tottime_ms']:>12.1f} {row['cumtime_ms']:>12.1f}  {row['function']}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from finance import rollups
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-user daily rollup table from the raw income, expense and savings records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Only rebuild these users (default: everyone)')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        for user_id, username in users.values_list('pk', 'username'):
+            count = rollups.rebuild_user(user_id)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} rollup rows for {username}"))
@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from finance import scheduler
+
+class Command(BaseCommand):
+    help = 'Runs the reminder scheduler in the foreground (it only sends while holding the scheduler lease)'
+
+    def handle(self, *args, **options):
+        scheduler.start()
+        self.stdout.write(self.style.SUCCESS("Scheduler started, waiting for the lease. Press Ctrl+C to stop."))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.stop()
+            self.stdout.write("Scheduler stopped.")
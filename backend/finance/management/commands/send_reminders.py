@@ -1,43 +1,21 @@
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
-from django.utils import timezone
-from finance.models import Reminder
-from django.conf import settings
+from finance import metrics
+from finance.reminders import ENQUEUE_BATCH_SIZE, due_reminders, enqueue_due
 
 class Command(BaseCommand):
-    help = 'Sends email reminders for reminders that are due and not yet sent'
+    help = 'Queues outbox emails for reminders that are due and not yet sent (drain_outbox sends them)'
 
-    def handle(self, *args, **options):
-        now = timezone.now()
-        reminders = Reminder.objects.filter(
-            reminder_date__lte=now,
-            is_completed=False,
-            email_sent=False
-        )
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ENQUEUE_BATCH_SIZE, help='Reminders loaded and flagged per batch')
 
-        if not reminders.exists():
+    def handle(self, *args, **options):
+        if not due_reminders().exists():
             self.stdout.write(self.style.SUCCESS("No pending reminders found."))
             return
 
-        for reminder in reminders:
-            try:
-                subject = f"Reminder: {reminder.title}"
-                message = f"Hi {reminder.user.username},\n\nThis is a reminder for: {reminder.title}\n\nMessage: {reminder.message}\nDate: {reminder.reminder_date}\n\nFrom Mero Kharcha Bachat Tracker."
-                recipient_list = [reminder.user.email]
-                
-                if recipient_list and recipient_list[0]: # Validate email exists
-                    send_mail(
-                        subject,
-                        message,
-                        settings.EMAIL_HOST_USER, # From email
-                        recipient_list,
-                        fail_silently=False,
-                    )
-                    reminder.email_sent = True
-                    reminder.save()
-                    self.stdout.write(self.style.SUCCESS(f"Sent email for reminder: {reminder.title}"))
-                else:
-                     self.stdout.write(self.style.WARNING(f"User {reminder.user.username} has no email address. Skipping."))
-
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Failed to send email for {reminder.title}: {str(e)}"))
+        styles = {'success': self.style.SUCCESS, 'warning': self.style.WARNING}
+        counts = enqueue_due(batch_size=options['batch_size'], log=lambda level, text: self.stdout.write(styles[level](text)))
+        for outcome, count in counts.items():
+            metrics.inc('finance_reminders_total', count, outcome=outcome)
+        metrics.flush(force=True)
+        self.stdout.write(f"{counts['queued']} queued, {counts['skipped']} skipped")
@@ -0,0 +1,274 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError: # Windows: dead processes' files are then never compacted
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+JOB_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+FLUSH_INTERVAL = 1.0
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'finance_request_duration_seconds': ('histogram', 'Request latency by URL name and status code', LATENCY_BUCKETS),
+    'finance_request_queries': ('histogram', 'Database queries per request by URL name', QUERY_BUCKETS),
+    'finance_job_duration_seconds': ('histogram', 'Scheduler and background job run time', JOB_BUCKETS),
+    'finance_job_failures_total': ('counter', 'Scheduler and background job runs that raised', None),
+    'finance_pdf_render_seconds': ('histogram', 'Time xhtml2pdf spent rendering a report', JOB_BUCKETS),
+    'finance_reminders_total': ('counter', 'Due reminders handled by send_reminders, by outcome (queued, skipped)', None),
+    'finance_reminder_emails_total': ('counter', 'Outbox delivery attempts by outcome (sent, retry, failed)', None),
+}
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_counters = {} # (name, labels) -> value
+_histograms = {} # (name, labels) -> [bucket counts..., +Inf count, sum]
+_last_flush = 0.0
+# pid plus a random part, so a process reusing a dead one's pid never overwrites its file
+_process = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def enabled():
+    return getattr(settings, 'FINANCE_METRICS', False)
+
+
+def metrics_dir():
+    return getattr(settings, 'FINANCE_METRICS_DIR', os.path.join(settings.MEDIA_ROOT, 'metrics'))
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Add `amount` to a counter."""
+    if not enabled() or not amount:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """Record one value in a histogram."""
+    if not enabled():
+        return
+    buckets = METRICS[name][2]
+    key = (name, _labels(labels))
+    with _lock:
+        counts = _histograms.setdefault(key, [0] * (len(buckets) + 2))
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[len(buckets)] += 1
+        counts[-1] += value
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the block's run time in seconds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+@contextmanager
+def job(name):
+    """Time a scheduler or background job run and count it as failed if it raises."""
+    try:
+        with timer('finance_job_duration_seconds', job=name):
+            yield
+    except Exception:
+        inc('finance_job_failures_total', job=name)
+        raise
+
+
+def snapshot():
+    """This process's metrics as written to its file."""
+    with _lock:
+        return {
+            'counters': [[name, dict(labels), value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, dict(labels), list(counts)] for (name, labels), counts in _histograms.items()],
+        }
+
+
+def _write(path, data):
+    # A temp file of its own per call, so concurrent writers never rename each other's
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path) # Readers never see a half-written file
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def flush(force=False):
+    """
+    Write this process's totals to <metrics_dir>/<pid>-<id>.json, at most once per
+    FLUSH_INTERVAL unless forced. Every gunicorn worker, scheduler and command process
+    writes its own file; the endpoint adds them up. A failed write is logged, never
+    raised: metrics must not break the request or job that recorded them.
+    """
+    global _last_flush
+    if not enabled() or not (_counters or _histograms):
+        return
+    with _flush_lock:
+        now = time.monotonic()
+        if not force and now - _last_flush < FLUSH_INTERVAL:
+            return
+        _last_flush = now
+        try:
+            os.makedirs(metrics_dir(), exist_ok=True)
+            _write(os.path.join(metrics_dir(), f"{_process}.json"), snapshot())
+        except OSError:
+            logger.exception("Could not write metrics to %s", metrics_dir())
+
+
+atexit.register(flush, force=True)
+
+
+def _merge(into, data):
+    for name, labels, value in data.get('counters', []):
+        key = (name, _labels(labels))
+        into['counters'][key] = into['counters'].get(key, 0) + value
+    for name, labels, counts in data.get('histograms', []):
+        key = (name, _labels(labels))
+        if key not in into['histograms']:
+            into['histograms'][key] = list(counts)
+        elif len(counts) == len(into['histograms'][key]):
+            into['histograms'][key] = [a + b for a, b in zip(into['histograms'][key], counts)]
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Exists, owned by someone else
+    return True
+
+
+@contextmanager
+def _locked(directory):
+    # Serializes scrapes, so one never reads files another is compacting
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _read(paths, merged):
+    for path in paths:
+        try:
+            with open(path) as f:
+                _merge(merged, json.load(f))
+        except (FileNotFoundError, ValueError):
+            continue
+
+
+def _compact(directory):
+    """Fold the files of processes that have exited into dead.json, so restarts don't pile up files."""
+    if fcntl is None:
+        return
+    dead = [path for path in glob.glob(os.path.join(directory, '*-*.json'))
+            if not _alive(int(os.path.basename(path).split('-', 1)[0]))]
+    if not dead:
+        return
+    merged = {'counters': {}, 'histograms': {}}
+    _read([os.path.join(directory, 'dead.json')] + dead, merged)
+    _write(os.path.join(directory, 'dead.json'), {
+        'counters': [[name, dict(labels), value] for (name, labels), value in merged['counters'].items()],
+        'histograms': [[name, dict(labels), counts] for (name, labels), counts in merged['histograms'].items()],
+    })
+    for path in dead:
+        os.remove(path)
+
+
+def collect():
+    """Totals over every process that has written metrics: {'counters': {...}, 'histograms': {...}}."""
+    flush(force=True)
+    directory = metrics_dir()
+    merged = {'counters': {}, 'histograms': {}}
+    if not os.path.isdir(directory):
+        return merged
+    with _locked(directory):
+        _compact(directory)
+        _read(glob.glob(os.path.join(directory, '*.json')), merged)
+    return merged
+
+
+def _gauges():
+    # Read from the database at scrape time: they are shared state, not per-process totals
+    from . import outbox, reminders
+    stats = outbox.stats()
+    return [
+        ('finance_outbox_depth', 'Outbox messages waiting to be sent', stats['depth']),
+        ('finance_outbox_failed', 'Outbox messages that gave up', stats['failed']),
+        ('finance_outbox_oldest_age_seconds', 'Age of the oldest unsent outbox message', stats['oldest_age']),
+        ('finance_reminders_due', 'Due reminders not yet queued', reminders.due_reminders().count()),
+    ]
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    merged = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        if kind == 'counter':
+            for (metric, labels), value in sorted(merged['counters'].items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            continue
+        for (metric, labels), counts in sorted(merged['histograms'].items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {counts[-1]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    for name, help_text, value in _gauges():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forget this process's metrics (tests)."""
+    global _last_flush
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+    _last_flush = 0.0
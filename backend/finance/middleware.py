@@ -0,0 +1,198 @@
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_REQUEST_MS = 1000
+TOP_QUERIES = 5
+MAX_SQL_LENGTH = 1000
+
+_current = ContextVar('finance_request_timing', default=None)
+
+
+class RequestTiming:
+    """What one request spent its time on. Also the execute_wrapper counting its queries."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.spans = {}
+        self.statements = {} # SQL -> [executions, seconds]
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.sql_seconds += elapsed
+            # Keyed by the parameterized SQL, so an N+1 loop shows up as one statement run N times
+            statement = self.statements.setdefault(sql, [0, 0.0])
+            statement[0] += 1
+            statement[1] += elapsed
+
+    def top_queries(self, limit=TOP_QUERIES):
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'sql': sql[:MAX_SQL_LENGTH], 'count': count, 'ms': round(seconds * 1000, 2)}
+            for sql, (count, seconds) in ranked
+        ]
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's `name` span, if it is being timed."""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - started)
+
+
+def _time_templates():
+    # Django only signals template renders under the test runner, so wrap the backend's
+    # render; {% include %} renders through the inner template and is not counted twice
+    from django.template.backends.django import Template
+    if getattr(Template.render, 'finance_timed', False):
+        return
+    render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        with timed('template'):
+            return render(self, context, request)
+    timed_render.finance_timed = True
+    Template.render = timed_render
+
+
+class RequestTimingMiddleware:
+    """
+    Opt-in (FINANCE_REQUEST_TIMING) per-request instrumentation: query count, SQL time,
+    template and PDF rendering time and the remaining view time, sent back in a
+    Server-Timing header. Requests slower than FINANCE_SLOW_REQUEST_MS are logged as
+    JSON with their most expensive statements. When disabled Django drops the
+    middleware at startup, so it costs nothing.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'FINANCE_REQUEST_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'FINANCE_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+        _time_templates()
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timing))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        metrics = self.metrics(timing, total)
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={ms:.1f}' + (f';desc="{timing.queries} queries"' if name == 'db' else '')
+            for name, ms in metrics.items()
+        )
+        if metrics['total'] >= self.slow_ms:
+            self.log_slow(request, response, timing, metrics)
+        return response
+
+    def metrics(self, timing, total):
+        """{name: ms}: db, the named spans, view (whatever is left) and total."""
+        metrics = {'db': timing.sql_seconds * 1000}
+        metrics.update((name, seconds * 1000) for name, seconds in timing.spans.items())
+        metrics['view'] = max(total * 1000 - sum(metrics.values()), 0.0)
+        metrics['total'] = total * 1000
+        return metrics
+
+    def log_slow(self, request, response, timing, metrics):
+        user = getattr(request, 'user', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'queries': timing.queries,
+            **{f'{name}_ms': round(ms, 1) for name, ms in metrics.items()},
+            'top_queries': timing.top_queries(),
+        }
+        logger.warning('Slow request %s', json.dumps(record))
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in (FINANCE_PROFILE_SAMPLE_RATE > 0) cProfile sampling of requests; profiles are
+    named after the view and aggregated by the profile_hotspots command.
+    """
+
+    def __init__(self, get_response):
+        if not profiling.sample_rate():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profiling.sampled('request') as sample:
+            response = self.get_response(request)
+            match = getattr(request, 'resolver_match', None)
+            if match is not None and match.url_name:
+                sample.name = match.url_name
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Opt-in (FINANCE_METRICS) request latency and query count histograms by URL name,
+    served with the other metrics by the metrics view.
+    """
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        # The URL name rather than the path keeps the label set bounded
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        if view != 'metrics':
+            metrics.observe('finance_request_duration_seconds', elapsed, view=view, status=response.status_code)
+            metrics.observe('finance_request_queries', queries, view=view)
+        try:
+            metrics.flush()
+        except Exception:
+            logger.exception("Could not flush metrics") # Never turn a served page into a 500
+        return response
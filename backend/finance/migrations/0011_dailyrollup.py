@@ -0,0 +1,71 @@
+# Generated by Django 6.0 on 2026-10-17 12:28
+
+from datetime import datetime
+from decimal import Decimal
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    # Dashboards read only the rollups from now on: without this, existing users would
+    # see zeros until someone ran rebuild_rollups. Same bucketing as rollups.rebuild_user()
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Income = apps.get_model('finance', 'Income')
+    Expense = apps.get_model('finance', 'Expense')
+    Savings = apps.get_model('finance', 'Savings')
+    DailyRollup = apps.get_model('finance', 'DailyRollup')
+
+    def local_day(value):
+        if isinstance(value, datetime):
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            return timezone.localtime(value).date()
+        return value
+
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        buckets = {}
+        rows = [
+            ('Income', Income.objects.filter(user_id=user_id).values_list('date', 'source', 'amount')),
+            ('Expense', Expense.objects.filter(user_id=user_id).values_list('date', 'category', 'amount')),
+            ('Savings', Savings.objects.filter(user_id=user_id).values_list('date', 'is_automatic', 'amount')),
+        ]
+        for kind, queryset in rows:
+            for date, category, amount in queryset.iterator(chunk_size=2000):
+                if kind == 'Savings':
+                    category = 'Automatic' if category else 'Manual'
+                key = (kind, local_day(date), category)
+                total, count = buckets.get(key, (Decimal('0'), 0))
+                buckets[key] = (total + amount, count + 1)
+        DailyRollup.objects.bulk_create([
+            DailyRollup(user_id=user_id, kind=kind, day=day, category=category, total=total, count=count)
+            for (kind, day, category), (total, count) in buckets.items()
+        ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_expense_source_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('Income', 'Income'), ('Expense', 'Expense'), ('Savings', 'Savings')], max_length=10)),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind', 'day', 'category'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
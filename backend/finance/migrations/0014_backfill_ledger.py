@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-17 13:20
+
+from datetime import datetime
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_ledger(apps, schema_editor):
+    Income = apps.get_model('finance', 'Income')
+    Expense = apps.get_model('finance', 'Expense')
+    Savings = apps.get_model('finance', 'Savings')
+    LedgerEntry = apps.get_model('finance', 'LedgerEntry')
+
+    def copy(queryset, transaction_type, label_of, sign, date_of):
+        batch = []
+        for row in queryset.iterator(chunk_size=2000):
+            batch.append(LedgerEntry(
+                user_id=row.user_id, transaction_type=transaction_type, object_id=row.pk,
+                label=label_of(row), amount=sign * row.amount, date=date_of(row.date),
+                description=row.description,
+            ))
+            if len(batch) >= 2000:
+                LedgerEntry.objects.bulk_create(batch)
+                batch = []
+        LedgerEntry.objects.bulk_create(batch)
+
+    same = lambda value: value
+    local_midnight = lambda day: timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    copy(Income.objects.all(), 'Income', lambda row: row.source, 1, same)
+    copy(Expense.objects.all(), 'Expense', lambda row: row.category, -1, same)
+    copy(Savings.objects.all(), 'Savings', lambda row: 'Automatic' if row.is_automatic else 'Manual', 1, local_midnight)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0013_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
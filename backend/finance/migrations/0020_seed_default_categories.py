@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-17 18:05
+
+from django.db import migrations
+
+# Frozen copy of the defaults in finance/categories.py at the time of this migration
+DEFAULTS = {
+    'IncomeCategory': ['Salary', 'Bonus', 'Allowance', 'Overtime', 'Investment', 'Other'],
+    'ExpenseCategory': ['Food', 'Rent', 'Utilities', 'Transportation', 'Entertainment', 'Health', 'Groceries', 'Other'],
+    'PaymentMethod': ['Esewa', 'Khalti', 'Mobile Banking', 'Cash'],
+}
+
+
+def seed_defaults(apps, schema_editor):
+    # The add forms used to create these on first visit; users who never opened one get them now
+    User = apps.get_model('auth', 'User')
+    for model_name, names in DEFAULTS.items():
+        model = apps.get_model('finance', model_name)
+        users = User.objects.exclude(pk__in=model.objects.values('user_id')).values_list('pk', flat=True)
+        model.objects.bulk_create(
+            [model(user_id=user_id, name=name, is_default=True) for user_id in users.iterator() for name in names],
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('finance', '0019_recurrencerule'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_defaults, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,156 @@
+# Generated by Django 6.0 on 2026-10-17 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, OuterRef, Subquery, Value, When
+
+# (model, old name column, category model it now points to)
+FOREIGN_KEYS = [
+    ('Income', 'source', 'IncomeCategory'),
+    ('Expense', 'category', 'ExpenseCategory'),
+    ('Expense', 'payment_method', 'PaymentMethod'),
+    ('Budget', 'category', 'ExpenseCategory'),
+]
+
+
+def to_foreign_keys(apps, schema_editor):
+    # Every (user, name) pair still needs a category row: the free-text columns drifted
+    # from the category tables, e.g. categories typed in before those tables existed
+    for model_name, field, category_name in FOREIGN_KEYS:
+        model = apps.get_model('finance', model_name)
+        category = apps.get_model('finance', category_name)
+        rows = model.objects.exclude(**{field: ''}) if field == 'payment_method' else model.objects.all()
+        used = set(rows.values_list('user_id', field).distinct())
+        known = set(category.objects.values_list('user_id', 'name'))
+        category.objects.bulk_create(
+            [category(user_id=user_id, name=name) for user_id, name in sorted(used - known)], batch_size=1000,
+        )
+
+    # Then one UPDATE per column, matching names by subquery
+    for model_name, field, category_name in FOREIGN_KEYS:
+        model = apps.get_model('finance', model_name)
+        category = apps.get_model('finance', category_name)
+        matching = category.objects.filter(user_id=OuterRef('user_id'), name=OuterRef(field)).order_by('pk')
+        model.objects.update(**{f'{field}_ref': Subquery(matching.values('pk')[:1])})
+
+    DailyRollup = apps.get_model('finance', 'DailyRollup')
+    for kind, category_name in (('Income', 'IncomeCategory'), ('Expense', 'ExpenseCategory')):
+        category = apps.get_model('finance', category_name)
+        matching = category.objects.filter(user_id=OuterRef('user_id'), name=OuterRef('category')).order_by('pk')
+        DailyRollup.objects.filter(kind=kind).update(category_ref=Subquery(matching.values('pk')[:1]))
+    DailyRollup.objects.filter(kind='Savings').update(
+        category_ref=Case(When(category='Automatic', then=Value(1)), default=Value(0)),
+    )
+
+
+def to_names(apps, schema_editor):
+    for model_name, field, category_name in FOREIGN_KEYS:
+        model = apps.get_model('finance', model_name)
+        category = apps.get_model('finance', category_name)
+        named = category.objects.filter(pk=OuterRef(f'{field}_ref')).values('name')[:1]
+        model.objects.exclude(**{f'{field}_ref': None}).update(**{field: Subquery(named)})
+
+    DailyRollup = apps.get_model('finance', 'DailyRollup')
+    for kind, category_name in (('Income', 'IncomeCategory'), ('Expense', 'ExpenseCategory')):
+        category = apps.get_model('finance', category_name)
+        named = category.objects.filter(pk=OuterRef('category_ref')).values('name')[:1]
+        DailyRollup.objects.filter(kind=kind).update(category=Subquery(named))
+    DailyRollup.objects.filter(kind='Savings').update(
+        category=Case(When(category_ref=1, then=Value('Automatic')), default=Value('Manual')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0020_seed_default_categories'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(model_name='expense', name='expense_user_category_date_idx'),
+        migrations.RemoveIndex(model_name='income', name='income_user_source_date_idx'),
+        migrations.RemoveConstraint(model_name='dailyrollup', name='unique_daily_rollup'),
+
+        # New columns next to the old ones, filled from them, then swapped in
+        migrations.AddField(
+            model_name='income',
+            name='source_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='finance.incomecategory'),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='finance.expensecategory'),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='payment_method_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='finance.paymentmethod'),
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='finance.expensecategory'),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='category_ref',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.RunPython(to_foreign_keys, to_names),
+
+        # A default on the old columns lets a rollback re-add them to existing rows
+        migrations.AlterField(model_name='income', name='source', field=models.CharField(default='', max_length=50)),
+        migrations.AlterField(model_name='expense', name='category', field=models.CharField(default='', max_length=50)),
+        migrations.AlterField(model_name='budget', name='category', field=models.CharField(default='', max_length=50)),
+        migrations.AlterField(model_name='dailyrollup', name='category', field=models.CharField(default='', max_length=50)),
+        migrations.RemoveField(model_name='income', name='source'),
+        migrations.RemoveField(model_name='expense', name='category'),
+        migrations.RemoveField(model_name='expense', name='payment_method'),
+        migrations.RemoveField(model_name='budget', name='category'),
+        migrations.RemoveField(model_name='dailyrollup', name='category'),
+        migrations.RenameField(model_name='income', old_name='source_ref', new_name='source'),
+        migrations.RenameField(model_name='expense', old_name='category_ref', new_name='category'),
+        migrations.RenameField(model_name='expense', old_name='payment_method_ref', new_name='payment_method'),
+        migrations.RenameField(model_name='budget', old_name='category_ref', new_name='category'),
+        migrations.RenameField(model_name='dailyrollup', old_name='category_ref', new_name='category'),
+
+        migrations.AlterField(
+            model_name='income',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='incomes', to='finance.incomecategory'),
+        ),
+        migrations.AlterField(
+            model_name='expense',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='expenses', to='finance.expensecategory'),
+        ),
+        migrations.AlterField(
+            model_name='expense',
+            name='payment_method',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='expenses', to='finance.paymentmethod'),
+        ),
+        migrations.AlterField(
+            model_name='budget',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='budgets', to='finance.expensecategory'),
+        ),
+        migrations.AlterField(
+            model_name='dailyrollup',
+            name='category',
+            field=models.PositiveIntegerField(),
+        ),
+
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'category', 'date'], name='expense_user_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['user', 'source', 'date'], name='income_user_source_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=['user', 'kind', 'day', 'category'], name='unique_daily_rollup'),
+        ),
+    ]
@@ -28,22 +28,37 @@ class PaymentMethod(models.Model):
 
 class Income(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    source = models.CharField(max_length=50) # Removing choices to allow dynamic categories
+    source = models.ForeignKey(IncomeCategory, on_delete=models.PROTECT, related_name='incomes')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     date = models.DateTimeField(default=timezone.now)
     description = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='income_user_date_idx'),
+            models.Index(fields=['user', 'source', 'date'], name='income_user_source_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.source} - {self.amount}"
 
 class Expense(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    category = models.CharField(max_length=50) # Removing choices to allow dynamic categories
-    payment_method = models.CharField(max_length=50, default='Cash')
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.PROTECT, related_name='expenses')
+    payment_method = models.ForeignKey(PaymentMethod, on_delete=models.PROTECT, null=True, blank=True, related_name='expenses')
     source_type = models.CharField(max_length=10, default='Income', choices=[('Income', 'Income'), ('Savings', 'Savings')])
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     date = models.DateTimeField(default=timezone.now)
     description = models.TextField(blank=True, null=True)
+    # Set on rows imported from a statement, see statements.fingerprint()
+    fingerprint = models.CharField(max_length=64, blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='expense_user_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='expense_user_category_date_idx'),
+            models.Index(fields=['user', 'fingerprint'], name='expense_user_fingerprint_idx'),
+        ]
 
     def __str__(self):
         return f"{self.category} - {self.amount}"
@@ -60,12 +75,17 @@ class SavingsGoal(models.Model):
 
 class Budget(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    category = models.CharField(max_length=50)
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.PROTECT, related_name='budgets')
     limit_amount = models.DecimalField(max_digits=10, decimal_places=2)
     period = models.CharField(max_length=20, default='Monthly')
     start_date = models.DateField(default=timezone.now)
     end_date = models.DateField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'end_date'], name='budget_user_end_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.category} Budget"
 
@@ -77,6 +97,13 @@ class Reminder(models.Model):
     is_completed = models.BooleanField(default=False)
     email_sent = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Due-reminder scan in send_reminders
+            models.Index(fields=['email_sent', 'is_completed', 'reminder_date'], name='reminder_due_idx'),
+            models.Index(fields=['user', 'is_completed', 'reminder_date'], name='reminder_user_open_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -88,5 +115,144 @@ class Savings(models.Model):
     description = models.TextField(blank=True, null=True)
     is_automatic = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_automatic', 'date'], name='savings_user_auto_date_idx'),
+        ]
+
     def __str__(self):
         return f"Savings - {self.amount} ({'Auto' if self.is_automatic else 'Manual'})"
+
+class DailyRollup(models.Model):
+    KIND_CHOICES = [('Income', 'Income'), ('Expense', 'Expense'), ('Savings', 'Savings')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    day = models.DateField() # Local (Asia/Kathmandu) calendar day
+    # IncomeCategory / ExpenseCategory id; Savings rows use 1 for automatic and 0 for manual
+    category = models.PositiveIntegerField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind', 'day', 'category'], name='unique_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.category} {self.day} - {self.total}"
+
+class LedgerEntry(models.Model):
+    """
+    Denormalized copy of every Income, Expense and Savings row, kept in sync by signals.
+    Income is stored positive and Expense negative; Savings are allocations of income
+    already on the ledger, so they stay positive and are left out of balances.
+    """
+    TYPE_CHOICES = [('Income', 'Income'), ('Expense', 'Expense'), ('Savings', 'Savings')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    transaction_type = models.CharField(max_length=10, choices=TYPE_CHOICES)
+    object_id = models.PositiveBigIntegerField() # Primary key in the source table
+    label = models.CharField(max_length=50) # Income source / expense category
+    amount = models.DecimalField(max_digits=12, decimal_places=2) # Signed
+    date = models.DateTimeField()
+    description = models.TextField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_type', 'object_id'], name='unique_ledger_source'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date', 'id'], name='ledger_user_date_id_idx'),
+            models.Index(fields=['user', 'transaction_type', 'date'], name='ledger_user_type_date_idx'),
+        ]
+
+    @property
+    def display_amount(self):
+        return abs(self.amount)
+
+    def __str__(self):
+        return f"{self.transaction_type} {self.label} - {self.amount}"
+
+class BackgroundJob(models.Model):
+    STATUS_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=30)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(blank=True, null=True)
+    result_file = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+class SchedulerLease(models.Model):
+    """Time-limited leadership of a background job, see leader.py."""
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at}"
+
+class OutboxMessage(models.Model):
+    """An email waiting to be (or already) sent by the outbox workers, see outbox.py."""
+    STATUS_CHOICES = [('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')]
+
+    reminder = models.ForeignKey(Reminder, on_delete=models.SET_NULL, blank=True, null=True)
+    subject = models.CharField(max_length=300)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True, null=True)
+    to = models.CharField(max_length=254)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim ready rows in this order
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_ready_idx'),
+            models.Index(fields=['status', 'sent_at'], name='outbox_sent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
+
+class RecurrenceRule(models.Model):
+    """A repeating income, expense or reminder, materialized by recurrence.materialize()."""
+    KIND_CHOICES = [('Income', 'Income'), ('Expense', 'Expense'), ('Reminder', 'Reminder')]
+    FREQUENCY_CHOICES = [('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly'), ('custom', 'Every N days')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(default=1) # Every N days/weeks/months
+    # Template of each occurrence
+    title = models.CharField(max_length=255) # Reminder title, income source or expense category
+    amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    payment_method = models.CharField(max_length=50, blank=True)
+    source_type = models.CharField(max_length=10, default='Income')
+    description = models.TextField(blank=True, null=True)
+    # Occurrence n falls on start + n periods; `count` have been created so far
+    start = models.DateTimeField()
+    until = models.DateField(blank=True, null=True)
+    count = models.PositiveIntegerField(default=0)
+    next_run = models.DateTimeField()
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'next_run'], name='recurrence_due_idx'),
+            models.Index(fields=['user', 'is_active'], name='recurrence_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.title} ({self.get_frequency_display()})"
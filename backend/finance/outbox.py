@@ -0,0 +1,169 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, connections, transaction
+from django.db.models import Min
+from django.utils import timezone
+from .models import OutboxMessage
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = 10
+DEFAULT_SMTP_TIMEOUT = 60
+# Socket waits one send can sit through (connect, TLS, login, data); each may run up to the SMTP timeout
+SEND_WAITS = 4
+MAX_BACKOFF = timedelta(hours=6)
+OPEN_STATUSES = ('pending', 'sending')
+
+# SQLite has no row locks and fails a read transaction that tries to upgrade to a write
+# while another thread writes, so there the workers take turns at the database
+_sqlite_lock = threading.Lock()
+
+
+def _db_turn():
+    return nullcontext() if db_connection.features.has_select_for_update else _sqlite_lock
+
+
+def max_attempts():
+    return getattr(settings, 'FINANCE_OUTBOX_MAX_ATTEMPTS', 6)
+
+
+def claim_timeout(batch_size):
+    """
+    How long a claim lasts before the batch may be claimed again (the worker died). Long
+    enough for every message of the batch to wait out the SMTP timeout at each step.
+    """
+    smtp_timeout = getattr(settings, 'EMAIL_TIMEOUT', None) or DEFAULT_SMTP_TIMEOUT
+    return timedelta(seconds=batch_size * smtp_timeout * SEND_WAITS)
+
+
+def backoff(attempts):
+    """Delay before retrying a message that has failed `attempts` times: base * 2^(attempts - 1)."""
+    base = getattr(settings, 'FINANCE_OUTBOX_BACKOFF_SECONDS', 60)
+    return min(timedelta(seconds=base * 2 ** (attempts - 1)), MAX_BACKOFF)
+
+
+def ready(now=None):
+    """Messages a worker may claim: pending and due, or claimed by a worker that timed out."""
+    return OutboxMessage.objects.filter(status__in=OPEN_STATUSES, next_attempt_at__lte=now or timezone.now())
+
+
+def claim(batch_size=CLAIM_BATCH_SIZE):
+    """
+    Lock and mark up to `batch_size` ready messages as being sent by the calling worker.
+    Rows locked by another worker are skipped, so concurrent workers never share a message.
+    """
+    now = timezone.now()
+    with _db_turn(), transaction.atomic():
+        batch = list(ready(now).select_for_update(skip_locked=True).order_by('next_attempt_at', 'pk')[:batch_size])
+        for message in batch:
+            message.status = 'sending'
+            message.attempts += 1
+            message.next_attempt_at = now + claim_timeout(batch_size) # Claim expiry while 'sending'
+        OutboxMessage.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at'])
+    return batch
+
+
+def _deliver(message, connection):
+    email = EmailMessage(message.subject, message.body, message.from_email, [message.to], connection=connection)
+    try:
+        connection.open() # No-op while the connection is already open
+        connection.send_messages([email])
+    except Exception as e:
+        logger.warning("Outbox message %s failed (attempt %s): %s", message.pk, message.attempts, e)
+        connection.close() # Reconnect for the next message
+        message.last_error = str(e)[:1000]
+        if message.attempts >= max_attempts():
+            message.status = 'failed'
+        else:
+            message.status = 'pending'
+            message.next_attempt_at = timezone.now() + backoff(message.attempts)
+        return 'failed' if message.status == 'failed' else 'retry'
+    message.status = 'sent'
+    message.sent_at = timezone.now()
+    return 'sent'
+
+
+def _work(batch_size, counts, counts_lock):
+    connection = get_connection(fail_silently=False)
+    try:
+        while True:
+            batch = claim(batch_size)
+            if not batch:
+                return
+            for message in batch:
+                if timezone.now() >= message.next_attempt_at:
+                    break # Claim ran out, another worker may have the rest of the batch now
+                result = _deliver(message, connection)
+                # Recorded right away, so a crash later in the batch cannot get this one sent again
+                with _db_turn():
+                    message.save(update_fields=['status', 'next_attempt_at', 'last_error', 'sent_at'])
+                with counts_lock:
+                    counts[result] += 1
+    finally:
+        connection.close()
+
+
+def _work_in_thread(*args):
+    try:
+        _work(*args)
+    finally:
+        connections.close_all()
+
+
+def drain(workers=None, batch_size=CLAIM_BATCH_SIZE):
+    """
+    Send every ready message using `workers` concurrent workers, each with its own
+    mail connection, until nothing is ready. Returns {'sent', 'retry', 'failed'}.
+    """
+    workers = workers or getattr(settings, 'FINANCE_OUTBOX_WORKERS', 4)
+    counts = {'sent': 0, 'retry': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+    if workers == 1:
+        _work(batch_size, counts, counts_lock)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='finance-outbox') as pool:
+            for future in [pool.submit(_work_in_thread, batch_size, counts, counts_lock) for _ in range(workers)]:
+                future.result()
+    for outcome, count in counts.items():
+        metrics.inc('finance_reminder_emails_total', count, outcome=outcome)
+    return counts
+
+
+def next_attempt():
+    """When the earliest open message becomes ready, or None if the outbox is empty."""
+    return OutboxMessage.objects.filter(status__in=OPEN_STATUSES).aggregate(next=Min('next_attempt_at'))['next']
+
+
+def _percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else None
+
+
+def stats(window=timedelta(hours=1)):
+    """
+    Queue depth and latency figures: open/ready/failed message counts, the age of the
+    oldest open message, and p50/p95 enqueue-to-sent latency over messages sent within
+    `window`, all in seconds.
+    """
+    now = timezone.now()
+    open_messages = OutboxMessage.objects.filter(status__in=OPEN_STATUSES)
+    oldest = open_messages.aggregate(oldest=Min('created_at'))['oldest']
+    latencies = sorted(
+        (sent_at - created_at).total_seconds()
+        for created_at, sent_at in OutboxMessage.objects.filter(status='sent', sent_at__gte=now - window)
+        .values_list('created_at', 'sent_at')
+    )
+    return {
+        'depth': open_messages.count(),
+        'ready': ready(now).count(),
+        'failed': OutboxMessage.objects.filter(status='failed').count(),
+        'oldest_age': (now - oldest).total_seconds() if oldest else 0,
+        'sent': len(latencies),
+        'latency_p50': _percentile(latencies, 0.50),
+        'latency_p95': _percentile(latencies, 0.95),
+    }
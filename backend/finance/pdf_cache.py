@@ -0,0 +1,84 @@
+import hashlib
+import os
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils import timezone
+from . import caching
+from .utils import render_pdf_to_file
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+def cache_dir():
+    return getattr(settings, 'FINANCE_PDF_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'pdf-cache'))
+
+
+def cache_path(template_src, user_id, start_day, end_day):
+    """
+    Content address of a rendered report: a hash of the template source, the user,
+    the date range, the user's data version and today's date (the PDF prints it).
+    Any write to the user's data changes the version, so stale files are never hit.
+    """
+    source = get_template(template_src).template.source
+    parts = [
+        hashlib.sha256(source.encode()).hexdigest(),
+        str(user_id),
+        str(start_day or '-'),
+        str(end_day or '-'),
+        caching.get_data_version(user_id),
+        timezone.localdate().isoformat(),
+    ]
+    digest = hashlib.sha256('|'.join(parts).encode()).hexdigest()
+    return os.path.join(cache_dir(), f"{digest}.pdf")
+
+
+def lookup(path):
+    """True if the file is cached; a hit refreshes its position in the LRU order."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def evict(max_bytes=None, keep=None):
+    """Delete least recently used files (never `keep`) until the cache fits in max_bytes."""
+    max_bytes = max_bytes if max_bytes is not None else getattr(settings, 'FINANCE_PDF_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+    try:
+        entries = [entry for entry in os.scandir(cache_dir()) if entry.name.endswith('.pdf')]
+    except FileNotFoundError:
+        return
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue # Removed by another process meanwhile
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def get_or_render(template_src, user_id, start_day, end_day, build_context):
+    """
+    Path of the rendered PDF, rendering it only on a cache miss.
+    `build_context` is only called on a miss, so hits touch neither the database
+    nor xhtml2pdf. Returns None if rendering fails.
+    """
+    path = cache_path(template_src, user_id, start_day, end_day)
+    if lookup(path):
+        return path
+    if not render_pdf_to_file(template_src, build_context(), path):
+        return None
+    evict(keep=path)
+    return path
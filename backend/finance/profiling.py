@@ -0,0 +1,110 @@
+import cProfile
+import glob
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP = 500
+
+
+def sample_rate():
+    return getattr(settings, 'FINANCE_PROFILE_SAMPLE_RATE', 0.0)
+
+
+def profile_dir():
+    return getattr(settings, 'FINANCE_PROFILE_DIR', os.path.join(settings.MEDIA_ROOT, 'profiles'))
+
+
+def _keep():
+    return getattr(settings, 'FINANCE_PROFILE_KEEP', DEFAULT_KEEP)
+
+
+def _filename(name):
+    # <unix ms>-<name>-<pid>.prof: sorts by age, and the name can be globbed on
+    slug = re.sub(r'[^A-Za-z0-9_]+', '_', name).strip('_') or 'request'
+    return f"{int(time.time() * 1000)}-{slug}-{os.getpid()}.prof"
+
+
+def rotate(keep=None):
+    """Delete the oldest profiles beyond the newest `keep`."""
+    keep = _keep() if keep is None else keep
+    paths = sorted(glob.glob(os.path.join(profile_dir(), '*.prof')))
+    for path in paths[:max(len(paths) - keep, 0)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass # Rotated by another process meanwhile
+
+
+class Sample:
+    """Handle yielded by sampled(): `name` can be changed before the block ends, `path` is set after."""
+
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+
+
+@contextmanager
+def sampled(name, rate=None):
+    """
+    Run the block under cProfile for a `rate` fraction of calls (default
+    FINANCE_PROFILE_SAMPLE_RATE) and dump the profile into profile_dir().
+    Unsampled calls pay for one random() call.
+    """
+    sample = Sample(name)
+    rate = sample_rate() if rate is None else rate
+    if not rate or random.random() >= rate:
+        yield sample
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already running (on 3.12+ that includes other threads): skip this sample
+        yield sample
+        return
+    try:
+        yield sample
+    finally:
+        profiler.disable()
+        try:
+            os.makedirs(profile_dir(), exist_ok=True)
+            sample.path = os.path.join(profile_dir(), _filename(sample.name))
+            profiler.dump_stats(sample.path)
+            rotate()
+        except OSError:
+            logger.exception("Could not write profile %s", sample.name)
+
+
+def hotspots(paths, sort='tottime', limit=25):
+    """
+    Merge profiles and return the `limit` most expensive functions as dicts with
+    function, calls, tottime_ms and cumtime_ms, sorted by `sort` ('tottime' or 'cumtime').
+    """
+    if sort not in ('tottime', 'cumtime'):
+        raise ValueError(f"Cannot sort by {sort}")
+    if not paths:
+        return []
+    stats = pstats.Stats(*paths)
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        location = function if filename == '~' else f"{_short(filename)}:{line}({function})" # '~': C builtins
+        rows.append({'function': location, 'calls': calls, 'tottime_ms': tottime * 1000, 'cumtime_ms': cumtime * 1000})
+    rows.sort(key=lambda row: row[f'{sort}_ms'], reverse=True)
+    return rows[:limit]
+
+
+def _short(filename):
+    # Trim everything up to site-packages or the project directory
+    for marker in ('site-packages' + os.sep, str(settings.BASE_DIR) + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
@@ -0,0 +1,171 @@
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Income, Expense, Reminder, RecurrenceRule
+from . import caching, categories, importers
+
+BATCH_SIZE = 500
+# Occurrences created per rule per run; a rule further behind catches up over later batches
+MAX_CATCH_UP = 366
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    year, month = value.year + month // 12, month % 12 + 1
+    # The 31st becomes the last day of shorter months, without drifting afterwards
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(rule, n):
+    """Date and time of the rule's n-th occurrence (the 0th is its start), in local time."""
+    start = timezone.localtime(rule.start).replace(tzinfo=None)
+    if rule.frequency == 'monthly':
+        local = _add_months(start, n * rule.interval)
+    else:
+        days = 7 if rule.frequency == 'weekly' else 1
+        local = start + timedelta(days=n * days * rule.interval)
+    return timezone.make_aware(local)
+
+
+def due_rules(now=None):
+    # `IN (true)` rather than `is_active=True` so recurrence_due_idx can be used, see reminders.py
+    return RecurrenceRule.objects.filter(is_active__in=[True], next_run__lte=now or timezone.now())
+
+
+def create_rule(entry, frequency, interval=1, until=None):
+    """
+    Make a saved Income, Expense or Reminder repeat. The entry itself is the first
+    occurrence; the next one is created by materialize() once it is due.
+    """
+    values = {'user': entry.user, 'frequency': frequency, 'interval': interval or 1, 'until': until, 'count': 1}
+    if isinstance(entry, Reminder):
+        values.update(kind='Reminder', title=entry.title, description=entry.message, start=entry.reminder_date)
+    elif isinstance(entry, Income):
+        title = categories.name_of(entry.user_id, 'income', entry.source_id)
+        values.update(kind='Income', title=title, amount=entry.amount, description=entry.description, start=entry.date)
+    else:
+        values.update(
+            kind='Expense', title=categories.name_of(entry.user_id, 'expense', entry.category_id), amount=entry.amount,
+            payment_method=categories.name_of(entry.user_id, 'payment', entry.payment_method_id),
+            source_type=entry.source_type, description=entry.description, start=entry.date,
+        )
+    rule = RecurrenceRule(**values)
+    rule.next_run = occurrence(rule, 1)
+    rule.save()
+    return rule
+
+
+def entry_ids(rule, resolved=None):
+    """
+    (category id, payment method id) for an income/expense rule's entries. Rules keep
+    names, so a category removed since is created again; `resolved` memoizes lookups
+    across the rules of a batch.
+    """
+    resolved = {} if resolved is None else resolved
+
+    def lookup(kind, name):
+        ids = resolved.setdefault((rule.user_id, kind), {})
+        if name not in ids:
+            ids.update(categories.resolve(rule.user_id, kind, [name]))
+        return ids[name]
+
+    if rule.kind == 'Income':
+        return lookup('income', rule.title), None
+    return lookup('expense', rule.title), lookup('payment', rule.payment_method) if rule.payment_method else None
+
+
+def build_occurrence(rule, when, category_id=None, payment_method_id=None):
+    """Unsaved entry for one occurrence of a rule; incomes and expenses need the ids from entry_ids()."""
+    if rule.kind == 'Reminder':
+        return Reminder(user_id=rule.user_id, title=rule.title, message=rule.description, reminder_date=when)
+    if rule.kind == 'Income':
+        return Income(user_id=rule.user_id, source_id=category_id, amount=rule.amount, date=when, description=rule.description)
+    return Expense(
+        user_id=rule.user_id, category_id=category_id, amount=rule.amount, payment_method_id=payment_method_id,
+        source_type=rule.source_type, date=when, description=rule.description,
+    )
+
+
+def _advance(rule, now, ids=(None, None)):
+    """Unsaved entries for every due occurrence of `rule`, moving the rule past them."""
+    entries = []
+    while rule.next_run <= now and len(entries) < MAX_CATCH_UP:
+        if rule.until and timezone.localtime(rule.next_run).date() > rule.until:
+            rule.is_active = False
+            break
+        entries.append(build_occurrence(rule, rule.next_run, *ids))
+        rule.count += 1
+        rule.next_run = occurrence(rule, rule.count)
+    if rule.until and timezone.localtime(rule.next_run).date() > rule.until:
+        rule.is_active = False
+    return entries
+
+
+def materialize(now=None, batch_size=BATCH_SIZE):
+    """
+    Create every due occurrence of every active rule, for all users.
+
+    Due rules are read through recurrence_due_idx in batches and locked with SKIP LOCKED.
+    Each batch's reminders go in with one bulk_create, incomes and expenses through the
+    bulk importer (one call per user), and the rules' counters with a few grouped UPDATEs,
+    all in one transaction. A rule only moves forward together with the entries it produced,
+    so a run can be repeated or interrupted without creating anything twice.
+    Returns {'rules', 'Income', 'Expense', 'Reminder'} counts.
+    """
+    now = now or timezone.now()
+    counts = {'rules': 0, 'Income': 0, 'Expense': 0, 'Reminder': 0}
+    rules = due_rules(now).select_related('user').select_for_update(skip_locked=True, of=('self',)).order_by('next_run', 'pk')
+
+    while True:
+        with transaction.atomic():
+            batch = list(rules[:batch_size])
+            if not batch:
+                break
+            reminders = []
+            transactions = defaultdict(lambda: ([], []))
+            previous = {rule.pk: (rule.count, rule.next_run) for rule in batch}
+            resolved = {}
+            for rule in batch:
+                ids = entry_ids(rule, resolved) if rule.kind != 'Reminder' else (None, None)
+                for entry in _advance(rule, now, ids):
+                    if isinstance(entry, Reminder):
+                        reminders.append(entry)
+                    else:
+                        transactions[rule.user][0 if isinstance(entry, Income) else 1].append(entry)
+                    counts[rule.kind] += 1
+
+            Reminder.objects.bulk_create(reminders)
+            for user, (incomes, expenses) in transactions.items():
+                importers.import_transactions(user, incomes=incomes, expenses=expenses)
+            _save_progress(batch, previous)
+
+            # bulk_create skips the Reminder signals: invalidate caches and wake the reminder job here
+            for user_id in {reminder.user_id for reminder in reminders}:
+                caching.data_changed(user_id)
+            if reminders:
+                earliest = min(reminder.reminder_date for reminder in reminders)
+                transaction.on_commit(lambda: _wake_reminders(earliest))
+        counts['rules'] += len(batch)
+    return counts
+
+
+def _save_progress(rules, previous):
+    # Rules moved by the same step (same number of occurrences, same time shift, e.g. every
+    # weekly rule due this hour) share a single relative UPDATE, so a batch costs a handful
+    # of statements rather than one per rule or bulk_update's per-row CASE expressions
+    groups = defaultdict(list)
+    for rule in rules:
+        count, next_run = previous[rule.pk]
+        groups[(rule.count - count, rule.next_run - next_run, rule.is_active)].append(rule.pk)
+    for (steps, shift, is_active), pks in groups.items():
+        RecurrenceRule.objects.filter(pk__in=pks).update(
+            count=F('count') + steps, next_run=F('next_run') + shift, is_active=is_active,
+        )
+
+
+def _wake_reminders(when):
+    from . import scheduler
+    scheduler.wake(when)
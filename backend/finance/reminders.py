@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboxMessage, Reminder
+
+ENQUEUE_BATCH_SIZE = 500
+
+
+def due_reminders(now=None):
+    """Reminders whose time has come and that have not been emailed or completed yet."""
+    now = now or timezone.now()
+    # `flag=False` compiles to `NOT flag`, which neither SQLite nor MySQL can answer
+    # from reminder_due_idx; `IN (false)` is an equality they can use the index for.
+    return Reminder.objects.filter(
+        email_sent__in=[False],
+        is_completed__in=[False],
+        reminder_date__lte=now,
+    )
+
+
+def build_message(reminder):
+    """Unsaved outbox row carrying the reminder email."""
+    return OutboxMessage(
+        reminder=reminder,
+        subject=f"Reminder: {reminder.title}",
+        body=f"Hi {reminder.user.username},\n\nThis is a reminder for: {reminder.title}\n\nMessage: {reminder.message}\nDate: {reminder.reminder_date}\n\nFrom Mero Kharcha Bachat Tracker.",
+        from_email=settings.EMAIL_HOST_USER,
+        to=reminder.user.email,
+    )
+
+
+def enqueue_due(now=None, batch_size=ENQUEUE_BATCH_SIZE, log=None):
+    """
+    Queue an outbox email for every due reminder; the outbox workers do the sending.
+
+    Reminders are read in id-ordered batches with their users joined in. Each batch's
+    messages are inserted with one bulk INSERT and the reminders flagged with one UPDATE,
+    in the same transaction as a SELECT ... FOR UPDATE SKIP LOCKED, so overlapping runs
+    can never queue a reminder twice. Reminders of users without an email address are
+    left unflagged. `log(level, text)` receives per-reminder lines.
+    Returns {'queued', 'skipped'}.
+    """
+    log = log or (lambda level, text: None)
+    counts = {'queued': 0, 'skipped': 0}
+    reminders = due_reminders(now).select_related('user').select_for_update(skip_locked=True, of=('self',)).order_by('pk')
+    last_pk = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(reminders.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            messages = []
+            for reminder in batch:
+                if reminder.user.email:
+                    messages.append(build_message(reminder))
+                    log('success', f"Queued email for reminder: {reminder.title}")
+                else:
+                    counts['skipped'] += 1
+                    log('warning', f"User {reminder.user.username} has no email address. Skipping.")
+            if messages:
+                OutboxMessage.objects.bulk_create(messages)
+                Reminder.objects.filter(pk__in=[m.reminder.pk for m in messages]).update(email_sent=True)
+        counts['queued'] += len(messages)
+    return counts
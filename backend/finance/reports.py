@@ -0,0 +1,100 @@
+from datetime import datetime
+from django.db.models import Sum
+from .models import DailyRollup
+from . import caching, categories, jobs, ledger, pdf_cache
+from .bucketing import day_bounds
+
+SUMMARY_CACHE_TIMEOUT = 60 * 60
+PDF_TEMPLATE = 'finance/report_pdf.html'
+
+
+def parse_day(value):
+    """A YYYY-MM-DD query-string value as a date, or None if missing/invalid."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def entries_in_range(user, start_day=None, end_day=None):
+    """The user's income/expense ledger entries between two local days (inclusive)."""
+    entries = ledger.history(user)
+    if start_day:
+        entries = entries.filter(date__gte=day_bounds(start_day)[0])
+    if end_day:
+        entries = entries.filter(date__lt=day_bounds(end_day)[1])
+    return entries
+
+
+def _summary(user, start_day, end_day):
+    entries = entries_in_range(user, start_day, end_day)
+    # Per category id from the daily rollups, which are bucketed by the same local days
+    rollup_rows = DailyRollup.objects.filter(user=user, kind='Expense')
+    if start_day:
+        rollup_rows = rollup_rows.filter(day__gte=start_day)
+    if end_day:
+        rollup_rows = rollup_rows.filter(day__lte=end_day)
+    names = categories.names(user.pk, 'expense')
+    expenses_by_category = [
+        {'category': names.get(row['category'], ''), 'total': row['total']}
+        for row in rollup_rows.values('category').annotate(total=Sum('total')).order_by('-total')
+    ]
+    # Ledger amounts are signed: expenses are stored negative
+    totals = dict(entries.values_list('transaction_type').annotate(Sum('amount')))
+    income_total = totals.get('Income') or 0
+    expense_total = -(totals.get('Expense') or 0)
+    return {
+        'income_total': income_total,
+        'expense_total': expense_total,
+        'net_balance': income_total - expense_total,
+        'expenses_by_category': expenses_by_category,
+    }
+
+
+def summary(user, start_day=None, end_day=None):
+    """Totals and per-category breakdown, memoized per data version and date range."""
+    return caching.memoize(
+        user.pk, 'report-summary', lambda: _summary(user, start_day, end_day),
+        start_day or '-', end_day or '-', timeout=SUMMARY_CACHE_TIMEOUT,
+    )
+
+
+def build_report(user, start_date=None, end_date=None):
+    """
+    Everything finance_report and download_report_pdf show for a date range:
+    the (cached) summary plus the individual expense entries, newest first.
+    `start_date`/`end_date` are the raw YYYY-MM-DD strings from the request.
+    """
+    start_day, end_day = parse_day(start_date), parse_day(end_date)
+    report = dict(summary(user, start_day, end_day))
+    report['expenses'] = list(
+        entries_in_range(user, start_day, end_day).filter(transaction_type='Expense').order_by('-date')
+    )
+    report['start_date'] = start_date
+    report['end_date'] = end_date
+    return report
+
+
+def render_report_pdf(user, start_date=None, end_date=None):
+    """Path of the report PDF for a date range, served from the PDF cache when possible."""
+    def context():
+        report = build_report(user, start_date, end_date)
+        report['user'] = user
+        return report
+
+    return pdf_cache.get_or_render(PDF_TEMPLATE, user.pk, parse_day(start_date), parse_day(end_date), context)
+
+
+def cached_report_pdf(user, start_date=None, end_date=None):
+    """Path of the report PDF for a date range if the PDF cache has it, else None. Never renders."""
+    path = pdf_cache.cache_path(PDF_TEMPLATE, user.pk, parse_day(start_date), parse_day(end_date))
+    return path if pdf_cache.lookup(path) else None
+
+
+@jobs.register('report_pdf', 'FINANCE_PDF_RENDER_WORKERS', 2)
+def render_report_job(job):
+    """Background job: render (or reuse) the PDF report for job.params' date range."""
+    path = render_report_pdf(job.user, job.params.get('start_date'), job.params.get('end_date'))
+    if not path:
+        raise RuntimeError("PDF rendering failed")
+    return path
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models import Sum, Count
+from .models import Income, Expense, Savings, DailyRollup
+from .bucketing import day_bounds, local_day, local_day_rows, sum_by_local_day
+from . import categories as categories_cache
+
+AUTOMATIC = 'Automatic'
+MANUAL = 'Manual'
+
+# DailyRollup.category of Savings rows, which have no category table
+SAVINGS_AUTOMATIC = 1
+SAVINGS_MANUAL = 0
+
+
+def rollup_key(instance):
+    """(kind, day, category id) bucket a transaction contributes to."""
+    if isinstance(instance, Income):
+        return ('Income', local_day(instance.date), instance.source_id)
+    if isinstance(instance, Expense):
+        return ('Expense', local_day(instance.date), instance.category_id)
+    return ('Savings', local_day(instance.date), SAVINGS_AUTOMATIC if instance.is_automatic else SAVINGS_MANUAL)
+
+
+def _bucket_queryset(user_id, kind, day, category):
+    if kind == 'Savings':
+        return Savings.objects.filter(user_id=user_id, date=day, is_automatic=(category == SAVINGS_AUTOMATIC))
+
+    start, end = day_bounds(day)
+    if kind == 'Income':
+        return Income.objects.filter(user_id=user_id, source_id=category, date__gte=start, date__lt=end)
+    return Expense.objects.filter(user_id=user_id, category_id=category, date__gte=start, date__lt=end)
+
+
+def refresh_bucket(user_id, kind, day, category):
+    """Recompute a single rollup row from the raw table it summarises."""
+    agg = _bucket_queryset(user_id, kind, day, category).aggregate(total=Sum('amount'), count=Count('id'))
+    lookup = {'user_id': user_id, 'kind': kind, 'day': day, 'category': category}
+
+    if agg['count']:
+        DailyRollup.objects.update_or_create(**lookup, defaults={'total': agg['total'], 'count': agg['count']})
+    else:
+        # Nothing left in the bucket (deleted or moved), drop the row
+        DailyRollup.objects.filter(**lookup).delete()
+
+
+def rebuild_user(user_id, start_day=None, end_day=None):
+    """
+    Throw away and rebuild the user's rollup rows, optionally only for the local days
+    from start_day to end_day. Returns the number of rows written.
+    """
+    aggregates = {'total': Sum('amount'), 'count': Count('id')}
+    sources = (
+        ('Income', Income, 'source'),
+        ('Expense', Expense, 'category'),
+        ('Savings', Savings, 'is_automatic'),
+    )
+    rows = []
+    for kind, model, field in sources:
+        grouped = local_day_rows(model.objects.filter(user_id=user_id), start_day, end_day, group_by=(field,), **aggregates)
+        for row in grouped:
+            category = row[field]
+            if kind == 'Savings':
+                category = SAVINGS_AUTOMATIC if category else SAVINGS_MANUAL
+            rows.append(DailyRollup(user_id=user_id, kind=kind, day=row['day'], category=category, total=row['total'], count=row['count']))
+
+    stale = DailyRollup.objects.filter(user_id=user_id)
+    if start_day:
+        stale = stale.filter(day__gte=start_day)
+    if end_day:
+        stale = stale.filter(day__lte=end_day)
+    with transaction.atomic():
+        stale.delete()
+        DailyRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def overview(user):
+    """
+    All-time figures for the dashboard in a single grouped query:
+    income/expense totals, automatic savings and the expense category summary.
+    Rows are grouped by category id; names come from the cached choice lists.
+    """
+    rows = DailyRollup.objects.filter(user=user).values('kind', 'category').annotate(total=Sum('total'))
+    expense_names = categories_cache.names(user.pk, 'expense')
+
+    totals = {'Income': 0, 'Expense': 0, 'Savings': 0}
+    automated_savings = 0
+    categories = []
+    for row in rows:
+        totals[row['kind']] += row['total']
+        if row['kind'] == 'Expense':
+            categories.append({'category': expense_names.get(row['category'], ''), 'total': row['total']})
+        elif row['kind'] == 'Savings' and row['category'] == SAVINGS_AUTOMATIC:
+            automated_savings += row['total']
+
+    categories.sort(key=lambda item: item['total'], reverse=True)
+    return totals, automated_savings, categories
+
+
+def daily_totals(user, start_day, end_day=None):
+    """{(kind, day): total} for each local day from start_day (to end_day if given)."""
+    totals = sum_by_local_day(DailyRollup.objects.filter(user=user), start_day, end_day,
+                              date_field='day', amount_field='total', group_by=('kind',))
+    return {(kind, day): total for (day, kind), total in totals.items()}
@@ -1,24 +1,322 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+import atexit
+import logging
+import os
+import sys
+import threading
+from datetime import timedelta
+from uuid import uuid4
 from django.conf import settings
 from django.core.management import call_command
-import sys
+from django.db import close_old_connections
+from django.db.models import Min
+from django.utils import timezone
+from . import caching, metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+JOB_ID = 'send_reminders_job'
+OUTBOX_JOB_ID = 'drain_outbox_job'
+RECURRENCE_JOB_ID = 'materialize_recurrences_job'
+LEASE_JOB_ID = 'scheduler_lease_job'
+POLL_JOB_ID = 'scheduler_poll_job'
+STALE_JOBS_JOB_ID = 'fail_stale_jobs_job'
+STALE_JOBS_INTERVAL = 5 * 60
+LEASE_NAME = 'reminder-scheduler'
+DEFAULT_MAX_SLEEP = 15 * 60
+MIN_SLEEP = timedelta(seconds=1) # Even a wake-up time in the past never makes a job spin
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_POLL_SECONDS = 5
+
+_scheduler = None
+_lock = threading.Lock()
+_holder = None
+_lease_expires = None
+_signals_seen = {} # job id -> last wake-up signal poll() acted on
+
+
+def max_sleep():
+    # Upper bound on a sleep, so reminders edited straight in the database (which signal
+    # nothing) or a lost wake-up signal are still picked up reasonably soon
+    return timedelta(seconds=getattr(settings, 'FINANCE_REMINDER_MAX_SLEEP', DEFAULT_MAX_SLEEP))
+
+
+def lease_ttl():
+    return timedelta(seconds=getattr(settings, 'FINANCE_SCHEDULER_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+
+
+def poll_interval():
+    return getattr(settings, 'FINANCE_SCHEDULER_POLL_SECONDS', DEFAULT_POLL_SECONDS)
+
+
+def should_autostart(argv=None):
+    """
+    Whether this process should start the scheduler on app load: web server processes
+    yes, management commands (migrate, shell, test, send_reminders...) no. `runserver`
+    counts as a web server, but only in the reloader's child process.
+    """
+    argv = sys.argv if argv is None else argv
+    program = os.path.basename(argv[0]) if argv else ''
+    if program in ('manage.py', 'django-admin', 'django-admin.py', '__main__.py'):
+        command = argv[1] if len(argv) > 1 else ''
+        if command != 'runserver':
+            return False
+        return '--noreload' in argv or os.environ.get('RUN_MAIN') == 'true'
+    return True
+
+
+def is_leader():
+    return _lease_expires is not None and _lease_expires > timezone.now()
+
+
+def next_wakeup(now=None):
+    """When the reminder job should next run: the earliest pending reminder it can email, capped."""
+    from .models import Reminder
+    now = now or timezone.now()
+    # Reminders of users without an email address stay pending (enqueue_due skips them),
+    # so counting them would keep the wake-up time in the past
+    earliest = Reminder.objects.filter(
+        email_sent__in=[False], is_completed__in=[False], user__email__gt='',
+    ).aggregate(earliest=Min('reminder_date'))['earliest']
+    return _capped(earliest, now)
+
+
+def _capped(when, now):
+    cap = now + max_sleep()
+    if when is None or when > cap:
+        return cap
+    return max(when, now + MIN_SLEEP)
+
+
+def _schedule(run_date, job_id=JOB_ID):
+    _scheduler.add_job(_job_functions[job_id], 'date', run_date=run_date, id=job_id, replace_existing=True, misfire_grace_time=None)
+
+
+def _unschedule():
+    for job_id in _job_functions:
+        if _scheduler.get_job(job_id):
+            _scheduler.remove_job(job_id)
+
+
+def _reschedule(job_id, next_run):
+    """Plan the next run of a job from `next_run()`, falling back to the cap if the database is down."""
+    try:
+        run_date = next_run()
+    except Exception:
+        logger.exception("Could not compute the next wake-up for %s", job_id)
+        run_date = timezone.now() + max_sleep()
+    with _lock:
+        if is_leader():
+            _schedule(run_date, job_id)
+
 
 def job_function():
-    # Only run the job if we are running the server (basic check)
-    # This prevents it from running during migrations, etc if not intended,
-    # though in this simple case it's fine.
+    if not is_leader():
+        return # Lost the lease since this run was planned; the new leader takes over
+    close_old_connections()
     try:
-        call_command('send_reminders')
-        # print("Scheduler checked for reminders.")
-    except Exception as e:
-        print(f"Scheduler failed: {e}")
+        # Only queues emails, so a slow mail server never holds up this job
+        with profiling.sampled('send_reminders'), metrics.job('send_reminders'):
+            call_command('send_reminders')
+    except Exception:
+        logger.exception("Scheduled send_reminders failed")
+    finally:
+        _reschedule(JOB_ID, next_wakeup)
+        wake(timezone.now(), OUTBOX_JOB_ID)
+        metrics.flush()
+        close_old_connections()
+
+
+def next_outbox_wakeup():
+    """When the outbox should next be drained: the earliest retry, capped."""
+    from . import outbox
+    return _capped(outbox.next_attempt(), timezone.now())
+
+
+def outbox_job_function():
+    from . import outbox
+    if not is_leader():
+        return
+    close_old_connections()
+    try:
+        with profiling.sampled('drain_outbox'), metrics.job('drain_outbox'):
+            outbox.drain()
+    except Exception:
+        logger.exception("Scheduled outbox drain failed")
+    finally:
+        _reschedule(OUTBOX_JOB_ID, next_outbox_wakeup)
+        metrics.flush()
+        close_old_connections()
+
+
+def next_recurrence_wakeup():
+    """When recurring entries should next be materialized: the earliest due rule, capped."""
+    from .models import RecurrenceRule
+    earliest = RecurrenceRule.objects.filter(is_active__in=[True]).aggregate(earliest=Min('next_run'))['earliest']
+    return _capped(earliest, timezone.now())
+
+
+def recurrence_job_function():
+    from . import recurrence
+    if not is_leader():
+        return
+    close_old_connections()
+    try:
+        with profiling.sampled('materialize_recurrences'), metrics.job('materialize_recurrences'):
+            recurrence.materialize()
+    except Exception:
+        logger.exception("Scheduled recurrence materialization failed")
+    finally:
+        _reschedule(RECURRENCE_JOB_ID, next_recurrence_wakeup)
+        metrics.flush()
+        close_old_connections()
+
+
+_job_functions = {
+    JOB_ID: job_function,
+    OUTBOX_JOB_ID: outbox_job_function,
+    RECURRENCE_JOB_ID: recurrence_job_function,
+}
+
+
+_polled = {
+    JOB_ID: next_wakeup,
+    RECURRENCE_JOB_ID: next_recurrence_wakeup,
+}
+
+
+def _signal_key(job_id):
+    return f'finance:scheduler-wake:{job_id}'
+
+
+def poll():
+    """
+    Act on wake-up signals left in the shared finance cache by processes that are not
+    the leader (see wake). Reads only the cache; the database is queried to recompute a
+    job's next run only when its signal has changed since the last poll.
+    """
+    if not is_leader():
+        return
+    try:
+        signals = caching.get_cache().get_many([_signal_key(job_id) for job_id in _polled])
+    except Exception:
+        logger.exception("Could not read scheduler wake-up signals")
+        return
+    for job_id, next_run in _polled.items():
+        signal = signals.get(_signal_key(job_id))
+        if signal == _signals_seen.get(job_id):
+            continue
+        _signals_seen[job_id] = signal
+        close_old_connections()
+        try:
+            _wake_local(next_run(), job_id)
+        except Exception:
+            logger.exception("Scheduler poll failed for %s", job_id)
+        finally:
+            close_old_connections()
+
+
+def fail_stale_jobs():
+    """Fail background jobs abandoned by a restarted web process (see jobs.fail_stale)."""
+    from . import jobs
+    if not is_leader():
+        return
+    close_old_connections()
+    try:
+        jobs.fail_stale()
+    except Exception:
+        logger.exception("Could not fail stale background jobs")
+    finally:
+        close_old_connections()
+
+
+def renew_lease():
+    """
+    Take or renew the scheduler lease. Only the process holding it plans reminder,
+    outbox and recurrence runs; when the leader dies its lease expires and the next renewal elsewhere wins.
+    """
+    from . import leader
+    global _lease_expires
+    close_old_connections()
+    was_leader = is_leader()
+    try:
+        _lease_expires = leader.try_acquire(LEASE_NAME, _holder, lease_ttl())
+    except Exception:
+        logger.exception("Could not renew the scheduler lease")
+    finally:
+        close_old_connections()
+
+    with _lock:
+        if is_leader() and not was_leader:
+            logger.info("Process %s is now the reminder scheduler leader", _holder)
+            for job_id in _job_functions:
+                _schedule(timezone.now(), job_id)
+        elif was_leader and not is_leader():
+            logger.warning("Process %s lost the reminder scheduler lease", _holder)
+            _unschedule()
+
+
+def _wake_local(when, job_id):
+    """Move this process's planned run of a job earlier; False if it has none planned."""
+    if _scheduler is None:
+        return False
+    when = max(when, timezone.now())
+    with _lock:
+        job = _scheduler.get_job(job_id)
+        if job is None:
+            return False
+        if job.next_run_time is None or when < job.next_run_time:
+            _schedule(when, job_id)
+        return True
+
+
+def wake(when, job_id=JOB_ID):
+    """
+    Run a job (by default the reminder job) at `when` if that is earlier than its current
+    wake-up time. A process without the job planned (not the leader, or the job is running
+    right now and may have read the database before this change) leaves a fresh token in
+    the shared cache instead, which the leader's poll() picks up.
+    """
+    if _wake_local(when, job_id) or job_id not in _polled:
+        return
+    try:
+        # Random rather than a counter: two processes signalling at once still change the value
+        caching.get_cache().set(_signal_key(job_id), uuid4().hex, timeout=None)
+    except Exception:
+        logger.exception("Could not signal the scheduler leader") # max_sleep() still bounds the delay
+
+
+def stop():
+    global _scheduler, _lease_expires
+    if _scheduler is None:
+        return
+    _scheduler.shutdown(wait=False)
+    _scheduler = None
+    if _lease_expires is not None:
+        from . import leader
+        try:
+            leader.release(LEASE_NAME, _holder)
+        except Exception:
+            logger.exception("Could not release the scheduler lease")
+        _lease_expires = None
+
 
 def start():
-    # To prevent running twice with auto-reloader, we can check a simple logic or let it be.
-    # For robust production, use Celery or a system Cron.
-    # For 'runserver', checking sys.argv helps avoiding double run in reloader mainly if we care strictly.
-    # But BackgroundScheduler usually handles fine.
-    
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(job_function, 'interval', minutes=1, id='send_reminders_job', replace_existing=True)
-    scheduler.start()
+    """
+    Start the scheduler in this process. Every process competes for the lease; the
+    reminder job only runs in the one holding it, starting immediately on election.
+    """
+    from apscheduler.schedulers.background import BackgroundScheduler # Only processes that run it pay for it
+    from . import leader
+    global _scheduler, _holder
+    if _scheduler is not None:
+        return
+    _holder = leader.holder_id()
+    _scheduler = BackgroundScheduler()
+    _scheduler.start()
+    _scheduler.add_job(
+        renew_lease, 'interval', seconds=lease_ttl().total_seconds() / 3,
+        id=LEASE_JOB_ID, next_run_time=timezone.now(), max_instances=1, coalesce=True,
+    )
+    _scheduler.add_job(poll, 'interval', seconds=poll_interval(), id=POLL_JOB_ID, max_instances=1, coalesce=True)
+    _scheduler.add_job(fail_stale_jobs, 'interval', seconds=STALE_JOBS_INTERVAL, id=STALE_JOBS_JOB_ID, max_instances=1, coalesce=True)
+    atexit.register(stop)
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Income, Savings
+from django.contrib.auth.models import User
+from .models import Income, Expense, Savings, Budget, Reminder, RecurrenceRule, IncomeCategory, ExpenseCategory, PaymentMethod
+from . import rollups, caching, ledger, scheduler, categories
 from decimal import Decimal
 
 @receiver(post_save, sender=Income)
@@ -15,7 +18,7 @@ def create_or_update_auto_savings(sender, instance, created, **kwargs):
             'user': instance.user,
             'amount': savings_amount,
             'date': instance.date.date() if hasattr(instance.date, 'date') else instance.date,
-            'description': f"20% auto-savings from {instance.source}",
+            'description': f"20% auto-savings from {categories.name_of(instance.user_id, 'income', instance.source_id)}",
             'is_automatic': True
         }
     )
@@ -24,3 +27,87 @@ def create_or_update_auto_savings(sender, instance, created, **kwargs):
 def delete_auto_savings(sender, instance, **kwargs):
     # Delete the linked savings record when income is deleted
     Savings.objects.filter(income=instance, is_automatic=True).delete()
+
+# Daily rollups: keep the bucket(s) touched by every write in sync
+@receiver(pre_save, sender=Income)
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=Savings)
+def remember_previous_rollup_bucket(sender, instance, **kwargs):
+    # An edit can move a row to another day/category, so the old bucket needs refreshing too
+    instance._previous_rollup_key = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous:
+            instance._previous_rollup_key = (previous.user_id, rollups.rollup_key(previous))
+
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Savings)
+def update_rollup_on_save(sender, instance, **kwargs):
+    current = (instance.user_id, rollups.rollup_key(instance))
+    rollups.refresh_bucket(current[0], *current[1])
+
+    previous = getattr(instance, '_previous_rollup_key', None)
+    if previous and previous != current:
+        rollups.refresh_bucket(previous[0], *previous[1])
+
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Savings)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    rollups.refresh_bucket(instance.user_id, *rollups.rollup_key(instance))
+
+# Unified ledger: mirror every income, expense and savings row
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Savings)
+def sync_ledger_entry(sender, instance, **kwargs):
+    ledger.sync(instance)
+
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Savings)
+def remove_ledger_entry(sender, instance, **kwargs):
+    ledger.remove(instance)
+
+# Any write invalidates the user's cached dashboard/report figures
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Savings)
+@receiver(post_save, sender=Budget)
+@receiver(post_save, sender=Reminder)
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Savings)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=Reminder)
+def bump_user_data_version(sender, instance, **kwargs):
+    caching.data_changed(instance.user_id)
+
+# Reminder scheduler sleeps until the next due reminder; an earlier one must wake it
+@receiver(post_save, sender=Reminder)
+def wake_reminder_scheduler(sender, instance, **kwargs):
+    if not instance.email_sent and not instance.is_completed:
+        when = instance.reminder_date
+        transaction.on_commit(lambda: scheduler.wake(when))
+
+@receiver(post_save, sender=RecurrenceRule)
+def wake_recurrence_scheduler(sender, instance, **kwargs):
+    if instance.is_active:
+        when = instance.next_run
+        transaction.on_commit(lambda: scheduler.wake(when, scheduler.RECURRENCE_JOB_ID))
+
+# Category and payment method choices: seeded once per user, cached until one is added or removed
+@receiver(post_save, sender=User)
+def seed_default_categories(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        categories.seed_defaults(instance)
+
+@receiver(post_save, sender=IncomeCategory)
+@receiver(post_save, sender=ExpenseCategory)
+@receiver(post_save, sender=PaymentMethod)
+@receiver(post_delete, sender=IncomeCategory)
+@receiver(post_delete, sender=ExpenseCategory)
+@receiver(post_delete, sender=PaymentMethod)
+def invalidate_category_choices(sender, instance, **kwargs):
+    categories.changed(instance.user_id)
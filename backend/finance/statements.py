@@ -0,0 +1,223 @@
+import csv
+import hashlib
+import io
+import os
+import re
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .models import Expense
+from . import categories as categories_cache, importers, jobs
+
+# Statement source -> PaymentMethod name the expenses are booked under
+PROVIDERS = {
+    'bank': 'Mobile Banking',
+    'esewa': 'Esewa',
+    'khalti': 'Khalti',
+}
+
+# Header spellings used by the banks and wallets, lower-cased
+DATE_COLUMNS = ('date', 'transaction date', 'txn date', 'date & time', 'date time', 'transaction time', 'value date')
+DESCRIPTION_COLUMNS = ('description', 'remarks', 'particulars', 'narration', 'details', 'service', 'purpose')
+DEBIT_COLUMNS = ('debit', 'withdrawal', 'dr', 'debit amount', 'amount (dr)')
+AMOUNT_COLUMNS = ('amount', 'amount (rs)', 'amount (npr)', 'total amount')
+TYPE_COLUMNS = ('type', 'dr/cr', 'transaction type', 'status')
+CREDIT_TYPES = ('cr', 'credit', 'in', 'received', 'load', 'deposit')
+
+DATE_FORMATS = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y', '%d-%m-%Y %H:%M:%S', '%d-%m-%Y', '%Y/%m/%d %H:%M:%S', '%Y/%m/%d')
+
+# Description keywords -> default expense category; the user's own category names match first
+CATEGORY_KEYWORDS = {
+    'Rent': ('rent', 'landlord'),
+    'Utilities': ('electricity', 'nea', 'water', 'khanepani', 'internet', 'worldlink', 'vianet', 'ntc', 'ncell', 'topup', 'recharge'),
+    'Transportation': ('pathao', 'indrive', 'tootle', 'fuel', 'petrol', 'bus', 'taxi', 'ride'),
+    'Groceries': ('bhatbhateni', 'mart', 'grocery', 'supermarket', 'kirana'),
+    'Food': ('restaurant', 'cafe', 'foodmandu', 'bhojdeals', 'momo', 'food'),
+    'Health': ('pharmacy', 'hospital', 'clinic', 'medical', 'dental'),
+    'Entertainment': ('movie', 'cinema', 'qfx', 'netflix', 'spotify', 'game'),
+}
+FALLBACK_CATEGORY = 'Other'
+
+BATCH_SIZE = 500
+
+
+def normalize_description(text):
+    """Lower-case, punctuation-free, single-spaced description used for matching and fingerprints."""
+    return ' '.join(re.sub(r'[^\w]+', ' ', (text or '').lower()).split())
+
+
+def fingerprint(user_id, amount, when, description, occurrence=0):
+    """
+    Identity of an imported statement line: the same transaction gives the same
+    fingerprint however often (and from whichever overlapping statement) it is imported.
+    `occurrence` tells apart identical lines within one statement, e.g. two equal rides
+    on a date-only statement: the nth repeat (counting from 0) gets |n appended.
+    """
+    stamp = when.astimezone(dt_timezone.utc).replace(microsecond=0).isoformat()
+    raw = f"{user_id}|{amount.quantize(Decimal('0.01'))}|{stamp}|{normalize_description(description)}"
+    if occurrence:
+        raw += f"|{occurrence}" # The first keeps the plain form, so earlier imports still match
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _column(fieldnames, candidates):
+    for name in fieldnames:
+        if name.strip().lower() in candidates:
+            return name
+    return None
+
+
+def _parse_date(value):
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _parse_amount(value):
+    cleaned = re.sub(r'[^\d.\-]', '', value or '')
+    try:
+        return Decimal(cleaned) if cleaned else None
+    except InvalidOperation:
+        return None
+
+
+def categorize(description, categories):
+    """Expense category for a statement line, among the user's `categories` names."""
+    text = normalize_description(description)
+    words = set(text.split())
+    for name in categories:
+        if normalize_description(name) in words:
+            return name
+    for name, keywords in CATEGORY_KEYWORDS.items():
+        if name in categories and any(keyword in words for keyword in keywords):
+            return name
+    return FALLBACK_CATEGORY
+
+
+def parse_statement(stream):
+    """
+    Yield (date, amount, description) for every debit in a statement CSV, reading it
+    line by line. Credits (top-ups, received transfers) and unreadable lines yield None
+    so the caller can count them.
+    """
+    reader = csv.DictReader(stream)
+    fields = reader.fieldnames or []
+    date_col = _column(fields, DATE_COLUMNS)
+    amount_col = _column(fields, DEBIT_COLUMNS) or _column(fields, AMOUNT_COLUMNS)
+    if not date_col or not amount_col:
+        raise ValueError("Statement needs a date and an amount/debit column")
+    debit_only = _column(fields, DEBIT_COLUMNS) is not None
+    description_col = _column(fields, DESCRIPTION_COLUMNS)
+    type_col = _column(fields, TYPE_COLUMNS)
+
+    for row in reader:
+        when = _parse_date(row.get(date_col) or '')
+        amount = _parse_amount(row.get(amount_col))
+        is_credit = type_col and (row.get(type_col) or '').strip().lower() in CREDIT_TYPES
+        if when is None or not amount or is_credit or (debit_only and amount < 0):
+            yield None
+            continue
+        yield when, abs(amount), (row.get(description_col) or '').strip() if description_col else ''
+
+
+def import_statement(user, path, provider, progress=None, batch_size=BATCH_SIZE):
+    """
+    Stream a statement CSV into the user's expenses in batches.
+
+    Lines already imported (same fingerprint, including from an overlapping statement)
+    are skipped using one indexed lookup per batch. Identical lines within the file are
+    separate transactions and each get their own fingerprint. `progress(done_bytes, total_bytes)`
+    is called after every batch. Returns {'imported', 'duplicates', 'skipped'}.
+    """
+    payment_method = PROVIDERS[provider]
+    payment_method_id = categories_cache.resolve(user.pk, 'payment', [payment_method])[payment_method]
+    category_ids = categories_cache.resolve(user.pk, 'expense', [])
+    categories = set(category_ids) or {*CATEGORY_KEYWORDS, FALLBACK_CATEGORY}
+    counts = {'imported': 0, 'duplicates': 0, 'skipped': 0}
+    occurrences = {} # Plain fingerprint -> identical lines so far in this file
+    total = os.path.getsize(path)
+
+    def flush(batch):
+        with transaction.atomic():
+            # The importer locks the user row too; taking it here first keeps two
+            # concurrent imports of the same statement from both missing each other's rows
+            User.objects.select_for_update().filter(pk=user.pk).first()
+            existing = set(
+                Expense.objects.filter(user=user, fingerprint__in=[obj.fingerprint for obj in batch])
+                .values_list('fingerprint', flat=True)
+            )
+            new = [obj for obj in batch if obj.fingerprint not in existing]
+            if new:
+                importers.import_transactions(user, expenses=new, batch_size=batch_size)
+        counts['imported'] += len(new)
+        counts['duplicates'] += len(batch) - len(new)
+
+    with open(path, 'rb') as raw:
+        batch = []
+        for line in parse_statement(io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')):
+            if line is None:
+                counts['skipped'] += 1
+                continue
+            when, amount, description = line
+            key = fingerprint(user.pk, amount, when, description)
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            if occurrence:
+                key = fingerprint(user.pk, amount, when, description, occurrence)
+            category = categorize(description, categories)
+            if category not in category_ids:
+                category_ids.update(categories_cache.resolve(user.pk, 'expense', [category]))
+            batch.append(Expense(
+                category_id=category_ids[category], payment_method_id=payment_method_id, amount=amount,
+                date=when, description=description, fingerprint=key,
+            ))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+                if progress:
+                    progress(raw.tell(), total)
+        if batch:
+            flush(batch)
+    if progress:
+        progress(total, total)
+    return counts
+
+
+def save_upload(uploaded):
+    """Copy an uploaded statement to MEDIA_ROOT chunk by chunk; returns the path."""
+    directory = os.path.join(settings.MEDIA_ROOT, 'uploads')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"statement-{uuid.uuid4().hex}.csv")
+    with open(path, 'wb') as f:
+        for chunk in uploaded.chunks():
+            f.write(chunk)
+    return path
+
+
+@jobs.register('statement_import', 'FINANCE_IMPORT_WORKERS', 1)
+def import_statement_job(job):
+    """Background job: import the uploaded statement at job.params['path']."""
+    path = job.params['path']
+    try:
+        job.params['summary'] = import_statement(
+            job.user, path, job.params['provider'],
+            progress=lambda done, total: jobs.set_progress(job, done, total),
+        )
+        job.save(update_fields=['params'])
+    finally:
+        os.remove(path)
+    return ''
@@ -0,0 +1,143 @@
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .models import Income, Expense, Budget, LedgerEntry, Reminder, Savings
+from . import caching, categories, importers, ledger, rollups
+
+DEFAULT_PREFIX = 'bench'
+DEFAULT_PASSWORD = 'benchmark'
+
+# (category, share of expense rows, typical amount in Rs)
+EXPENSE_PROFILE = [
+    ('Food', 0.35, 450),
+    ('Groceries', 0.2, 1800),
+    ('Transportation', 0.2, 250),
+    ('Utilities', 0.08, 1500),
+    ('Entertainment', 0.08, 900),
+    ('Health', 0.05, 1200),
+    ('Other', 0.04, 700),
+]
+PAYMENT_SHARES = [('Esewa', 0.35), ('Khalti', 0.2), ('Mobile Banking', 0.25), ('Cash', 0.2)]
+REMINDER_TITLES = ['Electricity bill', 'Internet bill', 'Rent', 'Insurance premium', 'Credit card', 'School fee']
+
+
+def username(prefix, index):
+    return f"{prefix}{index:04d}"
+
+
+def _aware(day, rng):
+    # A local time between 07:00 and 22:00
+    moment = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randrange(7 * 60, 22 * 60))
+    return timezone.make_aware(moment)
+
+
+def _amount(rng, typical):
+    # Log-normal around the typical amount: mostly close to it, a few large outliers
+    return Decimal(max(10, round(rng.lognormvariate(0, 0.6) * float(typical)))).quantize(Decimal('0.01'))
+
+
+def _months(start, end):
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def _user_rows(user, rng, start, end, expenses_per_day):
+    """Unsaved incomes, expenses, manual savings, budgets and reminders for one user."""
+    ids = {kind: {name: pk for pk, name in choices} for kind, choices in categories.choices(user.pk).items()}
+    salary = Decimal(rng.randrange(40, 150) * 1000)
+    payday = rng.randrange(1, 29)
+    # Reminders from the last few days are left unsent, so send_reminders has work to do
+    sent_before = timezone.make_aware(datetime.combine(end - timedelta(days=3), datetime.min.time()))
+    incomes, expenses, savings, budgets, reminders = [], [], [], [], []
+
+    for month in _months(start, end):
+        if start <= month.replace(day=payday) <= end:
+            incomes.append(Income(source_id=ids['income']['Salary'], amount=salary, date=_aware(month.replace(day=payday), rng), description='Monthly salary'))
+        if rng.random() < 0.25:
+            day = month + timedelta(days=rng.randrange(28))
+            if start <= day <= end:
+                name = rng.choice(['Bonus', 'Overtime', 'Allowance', 'Investment'])
+                incomes.append(Income(source_id=ids['income'][name], amount=_amount(rng, salary / 5), date=_aware(day, rng)))
+        rent_day = month + timedelta(days=4)
+        if start <= rent_day <= end:
+            expenses.append(Expense(
+                category_id=ids['expense']['Rent'], payment_method_id=ids['payment']['Mobile Banking'],
+                amount=(salary * Decimal('0.3')).quantize(Decimal('1')), date=_aware(rent_day, rng), description='Rent',
+            ))
+        for name, limit in (('Food', salary / 8), ('Groceries', salary / 6), ('Transportation', salary / 15)):
+            budgets.append(Budget(
+                user=user, category_id=ids['expense'][name], limit_amount=limit.quantize(Decimal('1')),
+                period='Monthly', start_date=month, end_date=month + timedelta(days=30),
+            ))
+        if rng.random() < 0.4:
+            savings.append(Savings(user=user, amount=_amount(rng, 3000), date=month + timedelta(days=rng.randrange(28)), description='Manual saving'))
+        for title in rng.sample(REMINDER_TITLES, 2):
+            when = _aware(month + timedelta(days=rng.randrange(28)), rng)
+            past = when < sent_before
+            reminders.append(Reminder(user=user, title=title, message=f"Pay the {title.lower()}", reminder_date=when,
+                                      email_sent=past, is_completed=past and rng.random() < 0.8))
+
+    # One reminder per user is always due, whatever the random dates above came to
+    reminders.append(Reminder(user=user, title='Phone bill', message='Pay the phone bill', reminder_date=_aware(end - timedelta(days=1), rng)))
+
+    names, weights, typical = zip(*EXPENSE_PROFILE)
+    methods, method_weights = zip(*PAYMENT_SHARES)
+    day = start
+    while day <= end:
+        for _ in range(rng.randrange(expenses_per_day * 2 + 1)): # Averages expenses_per_day
+            index = rng.choices(range(len(names)), weights)[0]
+            expenses.append(Expense(
+                category_id=ids['expense'][names[index]], payment_method_id=ids['payment'][rng.choices(methods, method_weights)[0]],
+                source_type='Savings' if rng.random() < 0.03 else 'Income',
+                amount=_amount(rng, typical[index]), date=_aware(day, rng),
+            ))
+        day += timedelta(days=1)
+    return incomes, expenses, savings, budgets, reminders
+
+
+def generate(users=10, years=1.0, seed=0, prefix=DEFAULT_PREFIX, expenses_per_day=3, end=None, password=DEFAULT_PASSWORD):
+    """
+    Create `users` users named <prefix>0000... with `years` of history ending on `end`
+    (default today): monthly salaries and occasional extra income, daily expenses,
+    monthly budgets, manual savings and bill reminders, a few of them still due.
+
+    The same seed, size and end date always give the same data. Rows go in through the
+    bulk importer and bulk_create, one transaction per user. Returns row counts and seconds.
+    Generated data is not meant to be deleted row by row: use a separate database.
+    """
+    started = time.perf_counter()
+    end = end or timezone.localdate()
+    start = end - timedelta(days=round(365 * years) - 1)
+    hashed = make_password(password) # Hashing is slow; every generated user shares one hash
+    counts = {'users': 0, 'incomes': 0, 'expenses': 0, 'savings': 0, 'budgets': 0, 'reminders': 0}
+
+    for index in range(users):
+        rng = random.Random(f"{seed}:{index}")
+        with transaction.atomic():
+            user = User.objects.create(username=username(prefix, index), email=f"{username(prefix, index)}@example.com", password=hashed)
+            incomes, expenses, savings, budgets, reminders = _user_rows(user, rng, start, end, expenses_per_day)
+            result = importers.import_transactions(user, incomes=incomes, expenses=expenses)
+
+            # bulk_create skips the signals: add the savings' ledger entries and rollups here
+            importers.bulk_insert(Savings, savings, user) # Ledger entries need the ids, also on MySQL
+            LedgerEntry.objects.bulk_create([ledger.entry_for(obj) for obj in savings])
+            Budget.objects.bulk_create(budgets)
+            Reminder.objects.bulk_create(reminders, batch_size=1000)
+            rollups.rebuild_user(user.pk)
+            caching.data_changed(user.pk)
+
+        counts['users'] += 1
+        counts['incomes'] += result['incomes']
+        counts['expenses'] += result['expenses']
+        counts['savings'] += result['savings'] + len(savings)
+        counts['budgets'] += len(budgets)
+        counts['reminders'] += len(reminders)
+    return {**counts, 'seconds': time.perf_counter() - started}
+
@@ -1,15 +1,33 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
-from finance.models import Income, Expense
+from finance.models import Income, Expense, IncomeCategory, ExpenseCategory, PaymentMethod
+from finance import caching
 from django.urls import reverse
 from datetime import date
 from django.utils import timezone
 
+# Tests clear and fill the finance cache, so never let them reach the checkout's file cache
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'finance': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'finance-tests'},
+}
+
+def income_category(user, name):
+    return IncomeCategory.objects.get_or_create(user=user, name=name)[0]
+
+def expense_category(user, name):
+    return ExpenseCategory.objects.get_or_create(user=user, name=name)[0]
+
+def payment_method(user, name):
+    return PaymentMethod.objects.get_or_create(user=user, name=name)[0]
+
+@override_settings(CACHES=TEST_CACHES)
 class FinanceTests(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='password')
         self.client.login(username='testuser', password='password')
+        caching.get_cache().clear()
 
     def test_dashboard_view(self):
         response = self.client.get(reverse('dashboard'))
@@ -18,33 +36,33 @@ class FinanceTests(TestCase):
 
     def test_add_income(self):
         response = self.client.post(reverse('add_income'), {
-            'source': 'Salary',
+            'source': income_category(self.user, 'Salary').pk,
             'amount': 5000,
             'date': date.today(),
             'time': '10:00',
             'description': 'Monthly salary'
         })
         self.assertEqual(response.status_code, 302) # Redirects to dashboard
-        self.assertTrue(Income.objects.filter(user=self.user, source='Salary').exists())
+        self.assertTrue(Income.objects.filter(user=self.user, source__name='Salary').exists())
         print("Add Income: OK")
 
     def test_add_expense(self):
         response = self.client.post(reverse('add_expense'), {
-            'category': 'Food',
-            'payment_method': 'Cash',
+            'category': expense_category(self.user, 'Food').pk,
+            'payment_method': payment_method(self.user, 'Cash').pk,
             'amount': 100,
             'date': date.today(),
             'time': '12:00',
             'description': 'Groceries'
         })
         self.assertEqual(response.status_code, 302)
-        self.assertTrue(Expense.objects.filter(user=self.user, category='Food').exists())
+        self.assertTrue(Expense.objects.filter(user=self.user, category__name='Food').exists())
         print("Add Expense: OK")
 
     def test_dashboard_data(self):
         # Create data
-        Income.objects.create(user=self.user, source='Salary', amount=1000, date=date.today())
-        Expense.objects.create(user=self.user, category='Rent', amount=500, date=date.today())
+        Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=date.today())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Rent'), amount=500, date=date.today())
         
         response = self.client.get(reverse('dashboard'))
         self.assertEqual(response.context['income_total'], 1000)
@@ -57,7 +75,7 @@ class FinanceTests(TestCase):
     def test_auto_savings_sync(self):
         from finance.models import Savings
         # Create income
-        income = Income.objects.create(user=self.user, source='Salary', amount=1000, date=date.today())
+        income = Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=date.today())
         self.assertTrue(Savings.objects.filter(income=income, amount=200, is_automatic=True).exists())
         
         # Update income
@@ -73,8 +91,17 @@ class FinanceTests(TestCase):
 
     def test_download_report_pdf(self):
         # Create some data
-        Expense.objects.create(user=self.user, category='TestCat', amount=100, date=date.today())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'TestCat'), amount=100, date=date.today())
         
+        from finance import jobs
+        from finance.models import BackgroundJob
+        # Never rendered inside the request: a miss queues a job, repeated clicks reuse it
+        response = self.client.get(reverse('download_report_pdf'))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.get(reverse('download_report_pdf')).json()['id'], response.json()['id'])
+        self.assertEqual(BackgroundJob.objects.filter(user=self.user, kind='report_pdf').count(), 1)
+
+        jobs.run(response.json()['id'])
         response = self.client.get(reverse('download_report_pdf'))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/pdf')
@@ -100,8 +127,9 @@ class FinanceTests(TestCase):
             email_sent=False
         )
         
-        # Run command
+        # Run command, then send what it queued
         call_command('send_reminders')
+        call_command('drain_outbox', workers=1)
         
         # Verify email sent
         self.assertEqual(len(mail.outbox), 1)
@@ -124,7 +152,7 @@ class FinanceTests(TestCase):
         self.assertEqual(response.status_code, 302) # Redirects to dashboard
         
         # Check Budget created using new category
-        self.assertTrue(Budget.objects.filter(user=self.user, category='Vacation').exists())
+        self.assertTrue(Budget.objects.filter(user=self.user, category__name='Vacation').exists())
         
         # Check Category saved
         self.assertTrue(ExpenseCategory.objects.filter(user=self.user, name='Vacation').exists())
@@ -143,3 +171,1261 @@ class FinanceTests(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(Reminder.objects.count(), 0)
         print("Delete Reminder: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollupuser', password='password')
+
+    def test_rollup_follows_expense_edits(self):
+        from finance.models import DailyRollup
+        from datetime import timedelta
+        now = timezone.now()
+        expense = Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=now)
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=50, date=now)
+
+        today = timezone.localdate()
+        food, rent = expense_category(self.user, 'Food'), expense_category(self.user, 'Rent')
+        row = DailyRollup.objects.get(user=self.user, kind='Expense', day=today, category=food.pk)
+        self.assertEqual(row.total, 150)
+        self.assertEqual(row.count, 2)
+
+        # Moving an expense to another day/category refreshes both buckets
+        expense.category = rent
+        expense.date = now - timedelta(days=1)
+        expense.save()
+        self.assertEqual(DailyRollup.objects.get(user=self.user, kind='Expense', day=today, category=food.pk).total, 50)
+        self.assertEqual(DailyRollup.objects.get(user=self.user, kind='Expense', category=rent.pk).total, 100)
+
+        expense.delete()
+        self.assertFalse(DailyRollup.objects.filter(user=self.user, kind='Expense', category=rent.pk).exists())
+        print("Rollup Sync: OK")
+
+    def test_rebuild_matches_signal_path(self):
+        from django.core.management import call_command
+        from finance.models import DailyRollup
+        from io import StringIO
+        Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=timezone.now())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=250, date=timezone.now())
+        expected = set(DailyRollup.objects.filter(user=self.user).values_list('kind', 'day', 'category', 'total', 'count'))
+
+        DailyRollup.objects.all().delete()
+        call_command('rebuild_rollups', 'rollupuser', stdout=StringIO())
+        rebuilt = set(DailyRollup.objects.filter(user=self.user).values_list('kind', 'day', 'category', 'total', 'count'))
+        self.assertEqual(rebuilt, expected)
+        self.assertEqual(len(rebuilt), 3) # Income, Expense and the automatic Savings bucket
+        print("Rollup Rebuild: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class BudgetEvaluationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='budgetuser', password='password')
+        self.client.login(username='budgetuser', password='password')
+        caching.get_cache().clear()
+
+    def test_spent_per_budget_window(self):
+        from finance.models import Budget
+        from finance import budgets
+        from datetime import timedelta
+        today = timezone.localdate()
+        week = Budget.objects.create(user=self.user, category=expense_category(self.user, 'Food'), limit_amount=1000, period='Weekly',
+                                     start_date=today - timedelta(days=2), end_date=today + timedelta(days=4))
+        month = Budget.objects.create(user=self.user, category=expense_category(self.user, 'Food'), limit_amount=5000, period='Monthly',
+                                      start_date=today - timedelta(days=20), end_date=today + timedelta(days=10))
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=300, date=timezone.now())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=200, date=timezone.now() - timedelta(days=10))
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Rent'), amount=999, date=timezone.now())
+
+        week, month = budgets.evaluate(self.user, [week, month])
+        self.assertEqual(week.spent, 300)
+        self.assertEqual(week.remaining, 700)
+        self.assertEqual(month.spent, 500)
+        print("Budget Evaluation: OK")
+
+    def test_dashboard_query_count_independent_of_budgets(self):
+        from finance.models import Budget
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        today = timezone.localdate()
+
+        def dashboard_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse('dashboard'))
+            return len(ctx.captured_queries)
+
+        Budget.objects.create(user=self.user, category=expense_category(self.user, 'Food'), limit_amount=100, start_date=today, end_date=today)
+        baseline = dashboard_queries()
+        for i in range(10):
+            Budget.objects.create(user=self.user, category=expense_category(self.user, f'Cat {i}'), limit_amount=100, start_date=today, end_date=today)
+        self.assertEqual(dashboard_queries(), baseline)
+        print("Budget Query Count: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='cacheuser', password='password')
+        self.client.login(username='cacheuser', password='password')
+        caching.get_cache().clear()
+
+    def dashboard_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        return response, len(ctx.captured_queries)
+
+    def test_repeat_visit_served_from_cache(self):
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=timezone.now())
+        first, cold = self.dashboard_queries()
+        second, warm = self.dashboard_queries()
+        self.assertLess(warm, cold)
+        self.assertEqual(second.context['expense_total'], 100)
+        print("Dashboard Cache Hit: OK")
+
+    def test_write_invalidates_cache(self):
+        self.client.get(reverse('dashboard'))
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=75, date=timezone.now())
+        response, _ = self.dashboard_queries()
+        self.assertEqual(response.context['expense_total'], 75)
+        self.assertEqual(response.context['today_expense'], 75)
+        print("Dashboard Cache Invalidation: OK")
+
+    def test_rolls_over_at_local_midnight(self):
+        from unittest import mock
+        from datetime import timedelta
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=40, date=timezone.now())
+        response, _ = self.dashboard_queries()
+        self.assertEqual(response.context['today_expense'], 40)
+
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch('finance.views.timezone.localdate', return_value=tomorrow):
+            response, _ = self.dashboard_queries()
+        self.assertEqual(response.context['today_expense'], 0)
+        self.assertEqual(response.context['yesterday_expense'], 40)
+        print("Dashboard Midnight Rollover: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class LocalDayBucketingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bucketuser', password='password')
+
+    def test_sums_by_local_not_utc_day(self):
+        from finance.bucketing import sum_by_local_day
+        from datetime import datetime, timedelta
+        today = timezone.localdate()
+        # 00:10 local time is still the previous day in UTC (Asia/Kathmandu is UTC+05:45)
+        just_after_midnight = timezone.make_aware(datetime.combine(today, datetime.min.time())) + timedelta(minutes=10)
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=just_after_midnight)
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Rent'), amount=300, date=just_after_midnight - timedelta(days=40))
+
+        totals = sum_by_local_day(Expense.objects.filter(user=self.user), today - timedelta(days=89), today)
+        self.assertEqual(totals, {(today, ): 100, (today - timedelta(days=40), ): 300})
+
+        by_category = sum_by_local_day(Expense.objects.filter(user=self.user), today, today, group_by=('category',))
+        self.assertEqual(by_category, {(today, expense_category(self.user, 'Food').pk): 100})
+        print("Local Day Bucketing: OK")
+
+    def test_dashboard_chart_windows(self):
+        client = Client()
+        client.login(username='bucketuser', password='password')
+        caching.get_cache().clear()
+        response = client.get(reverse('dashboard'), {'days': 90})
+        self.assertEqual(len(response.context['chart_dates']), 90)
+        response = client.get(reverse('dashboard'), {'days': 13})
+        self.assertEqual(len(response.context['chart_dates']), 7)
+        print("Dashboard Chart Windows: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class TransactionPaginationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='pageuser', password='password')
+        self.client.login(username='pageuser', password='password')
+
+    def test_pages_cover_history_in_order(self):
+        from finance import ledger
+        from datetime import timedelta
+        now = timezone.now()
+        for i in range(7):
+            Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=10 + i, date=now - timedelta(hours=i))
+            Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=20 + i, date=now - timedelta(hours=i))
+        expected = sorted(
+            [('Income', pk) for pk in Income.objects.values_list('pk', flat=True)] +
+            [('Expense', pk) for pk in Expense.objects.values_list('pk', flat=True)]
+        )
+
+        seen, pages, cursor = [], [], None
+        while True:
+            rows, prev_cursor, cursor = ledger.page(self.user, after=cursor, size=4)
+            pages.append((rows, prev_cursor))
+            seen.extend(rows)
+            if not cursor:
+                break
+        self.assertEqual(sorted((tx.transaction_type, tx.object_id) for tx in seen), expected)
+        self.assertEqual(seen, sorted(seen, key=lambda tx: (tx.date, tx.pk), reverse=True))
+        self.assertEqual(len(pages), 4)
+
+        # Going back from the last page returns exactly the page before it
+        last_rows, last_prev = pages[-1]
+        rows, _, next_cursor = ledger.page(self.user, before=last_prev, size=4)
+        self.assertEqual([tx.pk for tx in rows], [tx.pk for tx in pages[-2][0]])
+        self.assertIsNotNone(next_cursor)
+        print("Keyset Pagination: OK")
+
+    def test_all_transactions_view(self):
+        Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=timezone.now())
+        response = self.client.get(reverse('all_transactions'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['record_count'], 1)
+        self.assertIsNone(response.context['next_cursor'])
+        response = self.client.get(reverse('all_transactions'), {'after': 'not-a-cursor'})
+        self.assertEqual(len(response.context['transactions']), 1)
+        print("All Transactions Page: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryPlanTests(TestCase):
+    """Fails when a finance hot-path query stops using an index and scans a whole table."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='planuser', password='password')
+        self.client.login(username='planuser', password='password')
+        caching.get_cache().clear()
+        Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=timezone.now())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=timezone.now())
+
+    def full_scans(self, sql):
+        from django.db import connection
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                # "SCAN <table>" without an index is a full table scan
+                return [row[-1] for row in cursor.fetchall()
+                        if row[-1].startswith('SCAN finance_') and 'INDEX' not in row[-1]]
+            if connection.vendor == 'mysql':
+                cursor.execute('EXPLAIN ' + sql)
+                columns = [col[0] for col in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                return [row['table'] for row in rows if str(row['table']).startswith('finance_') and row['type'] == 'ALL']
+        self.skipTest(f'No query plan check for {connection.vendor}')
+
+    def assert_no_full_scans(self, run):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            run()
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'finance_' in q['sql']]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertEqual(self.full_scans(sql), [], sql)
+
+    def test_dashboard_queries_use_indexes(self):
+        self.assertEqual(len(self.full_scans('SELECT * FROM finance_expense WHERE amount > 1')), 1) # Sanity check
+        self.assert_no_full_scans(lambda: self.client.get(reverse('dashboard')))
+        print("Dashboard Query Plans: OK")
+
+    def test_report_queries_use_indexes(self):
+        today = timezone.localdate().isoformat()
+        self.assert_no_full_scans(lambda: self.client.get(reverse('finance_report'), {'start_date': today, 'end_date': today}))
+        self.assert_no_full_scans(lambda: self.client.get(reverse('all_transactions')))
+        print("Report Query Plans: OK")
+
+    def test_due_reminder_query_uses_index(self):
+        from finance.reminders import due_reminders
+        self.assert_no_full_scans(lambda: list(due_reminders()))
+        print("Reminder Query Plan: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledgeruser', password='password')
+
+    def test_entries_follow_source_rows(self):
+        from finance.models import LedgerEntry
+        income = Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=timezone.now())
+        expense = Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=150, date=timezone.now())
+        self.assertEqual(
+            set(LedgerEntry.objects.filter(user=self.user).values_list('transaction_type', 'label', 'amount')),
+            {('Income', 'Salary', 1000), ('Expense', 'Food', -150), ('Savings', 'Automatic', 200)},
+        )
+
+        expense.category = expense_category(self.user, 'Rent')
+        expense.save()
+        self.assertEqual(LedgerEntry.objects.get(transaction_type='Expense', object_id=expense.pk).label, 'Rent')
+
+        income.delete()
+        self.assertEqual(list(LedgerEntry.objects.filter(user=self.user).values_list('transaction_type', flat=True)), ['Expense'])
+        print("Ledger Sync: OK")
+
+    def test_running_balance(self):
+        from finance import ledger
+        from datetime import timedelta
+        now = timezone.now()
+        Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=now - timedelta(days=2))
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=300, date=now - timedelta(days=1))
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Rent'), amount=200, date=now)
+
+        rows, _, next_cursor = ledger.page(self.user, size=2)
+        self.assertEqual([tx.balance for tx in rows], [500, 700])
+        rows, _, _ = ledger.page(self.user, after=next_cursor, size=2)
+        self.assertEqual([tx.balance for tx in rows], [1000])
+        print("Ledger Running Balance: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportEngineTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='reportuser', password='password')
+        self.client.login(username='reportuser', password='password')
+        caching.get_cache().clear()
+
+    def test_report_figures(self):
+        from finance import reports
+        from datetime import timedelta
+        Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=timezone.now())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=timezone.now())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Rent'), amount=400, date=timezone.now())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=50, date=timezone.now() - timedelta(days=5))
+
+        today = timezone.localdate().isoformat()
+        report = reports.build_report(self.user, today, today)
+        self.assertEqual(report['income_total'], 1000)
+        self.assertEqual(report['expense_total'], 500)
+        self.assertEqual(report['net_balance'], 500)
+        self.assertEqual(report['expenses_by_category'], [{'category': 'Rent', 'total': 400}, {'category': 'Food', 'total': 100}])
+        self.assertEqual(len(report['expenses']), 2)
+        self.assertEqual(reports.build_report(self.user, 'garbage', None)['expense_total'], 550)
+        print("Report Engine: OK")
+
+    def test_report_page_shows_category_names(self):
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=123, date=timezone.now())
+        response = self.client.get(reverse('finance_report'))
+        self.assertContains(response, '<td>Food</td>', count=2) # Category summary and expense log
+        self.assertNotContains(response, '<td></td>')
+        print("Report Category Names: OK")
+
+    def test_html_then_pdf_aggregates_once(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=timezone.now())
+        params = {'start_date': timezone.localdate().isoformat()}
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('finance_report'), params)
+            self.client.get(reverse('download_report_pdf'), params)
+        aggregates = [q['sql'] for q in ctx.captured_queries if 'SUM(' in q['sql']]
+        self.assertEqual(len(aggregates), 2) # Category breakdown + totals, for the HTML page only
+        print("Report Summary Cache: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='exportuser', password='password')
+        self.client.login(username='exportuser', password='password')
+
+    def test_csv_export_streams_all_types(self):
+        import csv
+        from datetime import timedelta
+        Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=1000, date=timezone.now())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, payment_method=payment_method(self.user, 'Esewa'), date=timezone.now())
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Old'), amount=5, date=timezone.now() - timedelta(days=30))
+
+        response = self.client.get(reverse('export_transactions'), {'start_date': timezone.localdate().isoformat()})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([(r['type'], r['category']) for r in rows], [('Income', 'Salary'), ('Expense', 'Food'), ('Savings', 'Automatic')])
+        self.assertEqual(rows[1]['payment_method'], 'Esewa')
+        print("CSV Export: OK")
+
+    def test_ndjson_export(self):
+        import json
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=timezone.now())
+        response = self.client.get(reverse('export_transactions'), {'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['amount'] for line in lines], ['100.00'])
+        print("NDJSON Export: OK")
+
+    def test_rows_span_several_chunks(self):
+        from unittest import mock
+        from finance import exports
+        from datetime import timedelta
+        now = timezone.now()
+        for i in range(7):
+            Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=i + 1, date=now - timedelta(minutes=i % 3))
+        with mock.patch.object(exports, 'CHUNK_SIZE', 2):
+            rows = [row for row in exports.export_rows(self.user) if row['type'] == 'Expense']
+        self.assertEqual(sorted(float(row['amount']) for row in rows), [1, 2, 3, 4, 5, 6, 7])
+        print("Export Chunking: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportJobTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='jobuser', password='password')
+        self.client.login(username='jobuser', password='password')
+
+    def test_abandoned_jobs_failed(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from finance import jobs
+        from finance.models import BackgroundJob
+        old = timezone.now() - timedelta(hours=1)
+        for status in ('pending', 'running', 'done'):
+            BackgroundJob.objects.create(user=self.user, kind='report_pdf', status=status)
+        BackgroundJob.objects.update(created_at=old)
+        fresh = BackgroundJob.objects.create(user=self.user, kind='report_pdf')
+
+        self.assertEqual(jobs.fail_stale(timeout=30 * 60), 2)
+        self.assertEqual(sorted(BackgroundJob.objects.filter(status='failed').values_list('error', flat=True).distinct()),
+                         ['Abandoned: the worker stopped before finishing the job'])
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'pending')
+        self.assertEqual(BackgroundJob.objects.filter(status='done').count(), 1)
+
+        out = StringIO()
+        call_command('fail_stale_jobs', '--timeout', '0', stdout=out)
+        self.assertIn('1 stale jobs', out.getvalue())
+        print("Abandoned Jobs Failed: OK")
+
+    def test_report_job_lifecycle(self):
+        import os
+        from finance import jobs
+        from finance.models import BackgroundJob
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=timezone.now())
+
+        response = self.client.post(reverse('start_report_job'), {'start_date': '', 'end_date': ''})
+        self.assertEqual(response.status_code, 202)
+        job = BackgroundJob.objects.get(pk=response.json()['id'])
+        self.assertEqual(self.client.get(response.json()['status_url']).json()['status'], 'pending')
+
+        # The pool only picks jobs up on commit, which never happens inside a TestCase
+        jobs.run(job.pk)
+        status = self.client.get(reverse('job_status', args=[job.pk])).json()
+        self.assertEqual(status['status'], 'done')
+
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+        os.remove(BackgroundJob.objects.get(pk=job.pk).result_file)
+        print("Background PDF Job: OK")
+
+    def test_other_users_cannot_see_job(self):
+        from finance.models import BackgroundJob
+        other = User.objects.create_user(username='otherjobuser', password='password')
+        job = BackgroundJob.objects.create(user=other, kind='report_pdf')
+        self.assertEqual(self.client.get(reverse('job_status', args=[job.pk])).status_code, 404)
+        print("Job Ownership: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class PdfCacheTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        self.client = Client()
+        self.user = User.objects.create_user(username='pdfuser', password='password')
+        self.client.login(username='pdfuser', password='password')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(FINANCE_PDF_CACHE_DIR=self.tmp.name)
+        self.settings_override.enable()
+        caching.get_cache().clear()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def test_hit_skips_rendering_and_write_invalidates(self):
+        from unittest import mock
+        from finance import pdf_cache
+        Expense.objects.create(user=self.user, category=expense_category(self.user, 'Food'), amount=100, date=timezone.now())
+        from finance import jobs
+
+        def download():
+            response = self.client.get(reverse('download_report_pdf'))
+            if response.status_code == 202:
+                jobs.run(response.json()['id'])
+                response = self.client.get(reverse('download_report_pdf'))
+            return response
+
+        with mock.patch.object(pdf_cache, 'render_pdf_to_file', wraps=pdf_cache.render_pdf_to_file) as render:
+            first = download()
+            second = download()
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(b''.join(first.streaming_content), b''.join(second.streaming_content))
+
+            Expense.objects.create(user=self.user, category=expense_category(self.user, 'Rent'), amount=50, date=timezone.now())
+            download()
+            self.assertEqual(render.call_count, 2)
+        print("PDF Cache: OK")
+
+    def test_lru_eviction(self):
+        import os, time
+        from finance import pdf_cache
+        for i, name in enumerate(['old', 'used', 'new']):
+            path = os.path.join(self.tmp.name, f'{name}.pdf')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 100)
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+        pdf_cache.lookup(os.path.join(self.tmp.name, 'used.pdf')) # Touch: now most recently used
+
+        pdf_cache.evict(max_bytes=200)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['new.pdf', 'used.pdf'])
+        print("PDF Cache Eviction: OK")
+
+    def test_concurrent_renders_of_one_report(self):
+        import os, time
+        from concurrent.futures import ThreadPoolExecutor
+        from types import SimpleNamespace
+        from unittest import mock
+        from finance import reports, utils
+
+        def slow_pisa(source, dest):
+            dest.write(b'%PDF-fake')
+            time.sleep(0.05) # Both renders are writing at once
+            return SimpleNamespace(err=0)
+
+        path = os.path.join(self.tmp.name, 'report.pdf')
+        with mock.patch.object(utils, '_pisa', return_value=SimpleNamespace(pisaDocument=slow_pisa)):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                results = list(pool.map(lambda _: utils.render_pdf_to_file(reports.PDF_TEMPLATE, {}, path), range(2)))
+        self.assertEqual(results, [True, True])
+        self.assertEqual(os.listdir(self.tmp.name), ['report.pdf'])
+
+        broken = SimpleNamespace(pisaDocument=mock.Mock(side_effect=ValueError('bad html')))
+        with mock.patch.object(utils, '_pisa', return_value=broken), self.assertRaises(ValueError):
+            utils.render_pdf_to_file(reports.PDF_TEMPLATE, {}, os.path.join(self.tmp.name, 'other.pdf'))
+        self.assertEqual(os.listdir(self.tmp.name), ['report.pdf']) # No temp file left behind
+        print("Concurrent PDF Renders: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class BulkImportTests(TestCase):
+    def _state(self, user):
+        from finance.models import Savings, LedgerEntry, DailyRollup
+        # Category ids differ between users, so rollups are compared by category name
+        names = {('Income', pk): name for pk, name in IncomeCategory.objects.filter(user=user).values_list('pk', 'name')}
+        names.update({('Expense', pk): name for pk, name in ExpenseCategory.objects.filter(user=user).values_list('pk', 'name')})
+        return (
+            sorted(Savings.objects.filter(user=user).values_list('amount', 'date', 'description', 'is_automatic')),
+            sorted(LedgerEntry.objects.filter(user=user).values_list('transaction_type', 'label', 'amount', 'date', 'description')),
+            sorted(
+                (kind, day, names.get((kind, category), category), total, count)
+                for kind, day, category, total, count in DailyRollup.objects.filter(user=user).values_list('kind', 'day', 'category', 'total', 'count')
+            ),
+        )
+
+    def _rows(self, user, now):
+        from datetime import timedelta
+        salary, food, rent = income_category(user, 'Salary'), expense_category(user, 'Food'), expense_category(user, 'Rent')
+        incomes = [Income(source=salary, amount=1000 + i, date=now - timedelta(days=i, hours=i * 5)) for i in range(5)]
+        expenses = [Expense(category=[food, rent][i % 2], amount=10 + i, date=now - timedelta(hours=i * 7)) for i in range(7)]
+        return incomes, expenses
+
+    def test_bulk_matches_signal_path(self):
+        from finance import importers
+        saved = User.objects.create_user(username='saved', password='password')
+        bulk = User.objects.create_user(username='bulk', password='password')
+
+        now = timezone.now()
+        incomes, expenses = self._rows(saved, now)
+        for obj in incomes + expenses:
+            obj.user = saved
+            obj.save()
+        incomes, expenses = self._rows(bulk, now)
+        result = importers.import_transactions(bulk, incomes=incomes, expenses=expenses, batch_size=3)
+
+        self.assertEqual((result['incomes'], result['expenses'], result['savings']), (5, 7, 5))
+        self.assertEqual(self._state(saved), self._state(bulk))
+        print("Bulk Import Equivalence: OK")
+
+    def test_import_command(self):
+        import os, tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        user = User.objects.create_user(username='csvuser', password='password')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'expenses.csv')
+            with open(path, 'w', newline='') as f:
+                f.write("date,category,amount,description,payment_method\n2026-01-05T10:00,Food,120.50,Lunch,Esewa\n2026-01-06,Rent,9000,,\n")
+            out = StringIO()
+            call_command('import_transactions', 'csvuser', path, stdout=out)
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertEqual(sorted(Expense.objects.filter(user=user).values_list('category__name', 'payment_method__name')), [('Food', 'Esewa'), ('Rent', 'Cash')])
+        print("Bulk Import Command: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class StatementImportTests(TestCase):
+    STATEMENT = (
+        "Date & Time,Remarks,Amount (Rs),Type\n"
+        "2026-01-05 10:15:00,Payment to Foodmandu,450.00,DR\n"
+        "2026-01-06 08:00:00,NEA Electricity bill,1200.00,DR\n"
+        "2026-01-06 09:30:00,Wallet load from bank,5000.00,CR\n"
+        "2026-01-07 18:45:00,Pathao ride,180.00,DR\n"
+    )
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        self.client = Client()
+        self.user = User.objects.create_user(username='stmtuser', password='password')
+        self.client.login(username='stmtuser', password='password')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp.name)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def _upload(self, content, provider='esewa'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from finance import jobs
+        response = self.client.post(reverse('upload_statement'), {
+            'provider': provider, 'statement': SimpleUploadedFile('statement.csv', content.encode()),
+        })
+        self.assertEqual(response.status_code, 202)
+        jobs.run(response.json()['id'])
+        return self.client.get(response.json()['status_url']).json()
+
+    def test_import_maps_categories_and_payment_method(self):
+        status = self._upload(self.STATEMENT)
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['summary'], {'imported': 3, 'duplicates': 0, 'skipped': 1})
+        self.assertEqual(status['progress'], status['total'])
+        self.assertEqual(
+            sorted(Expense.objects.filter(user=self.user).values_list('category__name', 'payment_method__name', 'amount')),
+            [('Food', 'Esewa', 450), ('Transportation', 'Esewa', 180), ('Utilities', 'Esewa', 1200)],
+        )
+        print("Statement Import: OK")
+
+    def test_overlapping_statement_is_deduplicated(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self._upload(self.STATEMENT)
+        overlap = self.STATEMENT + "2026-01-08 12:00:00,Bhatbhateni supermarket,2300.00,DR\n"
+        with CaptureQueriesContext(connection) as ctx:
+            status = self._upload(overlap)
+        self.assertEqual(status['summary'], {'imported': 1, 'duplicates': 3, 'skipped': 1})
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 4)
+        lookups = [q for q in ctx.captured_queries if '"fingerprint" IN' in q['sql']]
+        self.assertEqual(len(lookups), 1) # One lookup per batch, not one per line
+        print("Statement Deduplication: OK")
+
+    def test_identical_lines_are_separate_transactions(self):
+        rides = (
+            "Date,Remarks,Amount (Rs),Type\n"
+            "07/01/2026,Pathao ride,150.00,DR\n"
+            "07/01/2026,Pathao ride,150.00,DR\n"
+        )
+        self.assertEqual(self._upload(rides)['summary'], {'imported': 2, 'duplicates': 0, 'skipped': 0})
+        # Re-importing, or a later statement repeating them plus a third ride, adds only the new one
+        self.assertEqual(self._upload(rides)['summary'], {'imported': 0, 'duplicates': 2, 'skipped': 0})
+        more = rides + "07/01/2026,Pathao ride,150.00,DR\n"
+        self.assertEqual(self._upload(more)['summary'], {'imported': 1, 'duplicates': 2, 'skipped': 0})
+        self.assertEqual(Expense.objects.filter(user=self.user, amount=150).count(), 3)
+        print("Statement Repeated Lines: OK")
+
+    def test_bad_upload_rejected(self):
+        response = self.client.post(reverse('upload_statement'), {'provider': 'paypal'})
+        self.assertEqual(response.status_code, 400)
+        print("Statement Upload Validation: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class ReminderOutboxTests(TestCase):
+    def setUp(self):
+        from finance.models import Reminder
+        from datetime import timedelta
+        due = timezone.now() - timedelta(minutes=5)
+        self.users = [User.objects.create_user(username=f'remind{i}', password='password', email=f'remind{i}@example.com') for i in range(3)]
+        self.users.append(User.objects.create_user(username='noemail', password='password'))
+        Reminder.objects.bulk_create([
+            Reminder(user=user, title=f'Bill {n}', message='Pay it', reminder_date=due)
+            for user in self.users for n in range(5)
+        ])
+
+    def test_send_reminders_only_enqueues(self):
+        from django.core import mail
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from finance import reminders
+        from finance.models import OutboxMessage, Reminder
+        with CaptureQueriesContext(connection) as ctx:
+            counts = reminders.enqueue_due(batch_size=4)
+
+        self.assertEqual(counts, {'queued': 15, 'skipped': 5})
+        self.assertEqual(len(mail.outbox), 0) # Nothing is sent inline
+        self.assertEqual(OutboxMessage.objects.filter(status='pending').count(), 15)
+        self.assertEqual(Reminder.objects.filter(email_sent=True).count(), 15)
+        self.assertEqual(reminders.enqueue_due(), {'queued': 0, 'skipped': 5}) # Never queued twice
+        statements = [q['sql'].split()[0] for q in ctx.captured_queries if 'finance_' in q['sql']]
+        # 5 batch SELECTs with users joined + the final empty one; per batch with mail, one INSERT and one UPDATE
+        self.assertEqual([statements.count(k) for k in ('SELECT', 'INSERT', 'UPDATE')], [6, 4, 4])
+        print("Reminder Enqueue: OK")
+
+    def test_drain_sends_over_one_connection_per_worker(self):
+        from unittest import mock
+        from django.core import mail
+        from finance import outbox, reminders
+        from finance.models import OutboxMessage
+        reminders.enqueue_due()
+        with mock.patch.object(outbox, 'get_connection', wraps=mail.get_connection) as connect:
+            counts = outbox.drain(workers=1, batch_size=4)
+        self.assertEqual(counts, {'sent': 15, 'retry': 0, 'failed': 0})
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(len(mail.outbox), 15)
+        self.assertEqual(OutboxMessage.objects.filter(status='sent').count(), 15)
+
+        stats = outbox.stats()
+        self.assertEqual((stats['depth'], stats['sent']), (0, 15))
+        self.assertIsNotNone(stats['latency_p95'])
+        print("Outbox Drain: OK")
+
+    def test_crash_mid_batch_never_resends_delivered(self):
+        from unittest import mock
+        from datetime import timedelta
+        from django.core import mail
+        from django.core.mail.backends.locmem import EmailBackend
+        from finance import outbox, reminders
+        from finance.models import OutboxMessage
+        reminders.enqueue_due()
+        original = EmailBackend.send_messages
+
+        class WorkerKilled(BaseException):
+            pass
+
+        def dies_on_third(backend, messages):
+            if len(mail.outbox) == 2:
+                raise WorkerKilled
+            return original(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', dies_on_third), self.assertRaises(WorkerKilled):
+            outbox.drain(workers=1, batch_size=5)
+        self.assertEqual(OutboxMessage.objects.filter(status='sent').count(), 2) # Saved as they went out
+        self.assertEqual(OutboxMessage.objects.filter(status='sending').count(), 3)
+
+        # Once the dead worker's claim runs out, only the undelivered messages go out again
+        OutboxMessage.objects.filter(status='sending').update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.drain(workers=1), {'sent': 13, 'retry': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 15)
+        self.assertEqual(outbox.claim_timeout(10), timedelta(seconds=10 * 30 * outbox.SEND_WAITS))
+        print("Outbox Crash Mid-batch: OK")
+
+    def test_failures_back_off_then_give_up(self):
+        from unittest import mock
+        from datetime import timedelta
+        from django.core import mail
+        from django.core.mail.backends.locmem import EmailBackend
+        from django.test import override_settings
+        from finance import outbox, reminders
+        from finance.models import OutboxMessage
+        reminders.enqueue_due()
+        original = EmailBackend.send_messages
+
+        def flaky(backend, messages):
+            if messages[0].to == ['remind1@example.com']:
+                raise ConnectionError("mailbox unavailable")
+            return original(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', flaky), override_settings(FINANCE_OUTBOX_MAX_ATTEMPTS=3):
+            self.assertEqual(outbox.drain(workers=1), {'sent': 10, 'retry': 5, 'failed': 0})
+            retry = OutboxMessage.objects.filter(status='pending').first()
+            self.assertAlmostEqual((retry.next_attempt_at - timezone.now()).total_seconds(), 60, delta=5)
+            self.assertEqual(outbox.drain(workers=1), {'sent': 0, 'retry': 0, 'failed': 0}) # Not due yet
+
+            for retry_result, failed_result in [(5, 0), (0, 5)]:
+                OutboxMessage.objects.filter(status='pending').update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+                self.assertEqual(outbox.drain(workers=1), {'sent': 0, 'retry': retry_result, 'failed': failed_result})
+        self.assertEqual(outbox.backoff(2), timedelta(minutes=2))
+        self.assertEqual(OutboxMessage.objects.filter(status='failed', attempts=3).count(), 5)
+        self.assertEqual(len(mail.outbox), 10)
+        print("Outbox Retry Backoff: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class ReminderSchedulerTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from finance import scheduler
+        self.user = User.objects.create_user(username='scheduser', password='password', email='sched@example.com')
+        self.scheduler = BackgroundScheduler()
+        self.scheduler.start(paused=True) # Jobs are planned but never executed
+        patcher = mock.patch.object(scheduler, '_scheduler', self.scheduler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.scheduler.shutdown, wait=False)
+
+    def _next_run(self):
+        from finance import scheduler
+        return self.scheduler.get_job(scheduler.JOB_ID).next_run_time
+
+    def test_sleeps_until_earliest_reminder(self):
+        from datetime import timedelta
+        from finance import scheduler
+        from finance.models import Reminder
+        now = timezone.now()
+        self.assertEqual(scheduler.next_wakeup(now), now + scheduler.max_sleep())
+
+        due = now + timedelta(minutes=3)
+        Reminder.objects.create(user=self.user, title='Soon', reminder_date=due)
+        Reminder.objects.create(user=self.user, title='Sent', reminder_date=now + timedelta(minutes=1), email_sent=True)
+        Reminder.objects.create(user=self.user, title='Later', reminder_date=now + timedelta(days=2))
+        self.assertEqual(scheduler.next_wakeup(now), due)
+        print("Scheduler Next Wake-up: OK")
+
+    def test_unsendable_reminder_does_not_spin(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from finance import scheduler
+        from finance.models import Reminder
+        now = timezone.now()
+        no_email = User.objects.create_user(username='noemail', password='password')
+        Reminder.objects.create(user=no_email, title='Overdue', reminder_date=now - timedelta(hours=1))
+        call_command('send_reminders', stdout=StringIO())
+        self.assertFalse(Reminder.objects.get(title='Overdue').email_sent) # Skipped, still pending
+        self.assertEqual(scheduler.next_wakeup(now), now + scheduler.max_sleep())
+
+        # Even a sendable reminder in the past is planned a moment ahead, never for right now
+        Reminder.objects.create(user=self.user, title='Missed', reminder_date=now - timedelta(minutes=5))
+        self.assertEqual(scheduler.next_wakeup(now), now + scheduler.MIN_SLEEP)
+        print("Scheduler Unsendable Reminder: OK")
+
+    def test_saving_earlier_reminder_wakes_scheduler(self):
+        from datetime import timedelta
+        from finance import scheduler
+        from finance.models import Reminder
+        now = timezone.now()
+        scheduler._schedule(now + timedelta(minutes=10))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reminder.objects.create(user=self.user, title='Later', reminder_date=now + timedelta(hours=1))
+        self.assertEqual(self._next_run(), now + timedelta(minutes=10))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reminder.objects.create(user=self.user, title='Sooner', reminder_date=now + timedelta(minutes=2))
+        self.assertEqual(self._next_run(), now + timedelta(minutes=2))
+        print("Scheduler Wake-up On Save: OK")
+
+    def test_poll_picks_up_reminders_saved_elsewhere(self):
+        from datetime import timedelta
+        from unittest import mock
+        from finance import scheduler
+        from finance.models import Reminder
+        now = timezone.now()
+        scheduler._schedule(now + timedelta(minutes=15))
+        with mock.patch.object(scheduler, 'is_leader', return_value=True), mock.patch.dict(scheduler._signals_seen, clear=True):
+            with self.assertNumQueries(0):
+                scheduler.poll() # Nothing signalled: idle polls never touch the database
+
+            # Saved by a process that is not the leader: it can only leave a signal in the cache
+            with mock.patch.object(scheduler, '_scheduler', None), self.captureOnCommitCallbacks(execute=True):
+                reminder = Reminder.objects.create(user=self.user, title='Soon', reminder_date=now + timedelta(minutes=10))
+            self.assertEqual(self._next_run(), now + timedelta(minutes=15))
+            scheduler.poll()
+            self.assertEqual(self._next_run(), now + timedelta(minutes=10))
+            with self.assertNumQueries(0):
+                scheduler.poll() # Signal already handled
+
+            # Moving an existing reminder earlier is signalled too
+            reminder.reminder_date = now + timedelta(minutes=2)
+            with mock.patch.object(scheduler, '_scheduler', None), self.captureOnCommitCallbacks(execute=True):
+                reminder.save()
+            scheduler.poll()
+        self.assertEqual(self._next_run(), now + timedelta(minutes=2))
+        print("Scheduler Poll Wake-up: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class SchedulerLeaderTests(TestCase):
+    def test_single_leader_with_failover(self):
+        from datetime import timedelta
+        from finance import leader
+        from finance.models import SchedulerLease
+        ttl = timedelta(seconds=60)
+        self.assertIsNotNone(leader.try_acquire('jobs', 'worker-a', ttl))
+        self.assertIsNone(leader.try_acquire('jobs', 'worker-b', ttl))
+        self.assertIsNotNone(leader.try_acquire('jobs', 'worker-a', ttl)) # Renewal
+
+        # worker-a dies: once its lease runs out worker-b takes over, and a cannot come back
+        SchedulerLease.objects.filter(name='jobs').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNotNone(leader.try_acquire('jobs', 'worker-b', ttl))
+        self.assertIsNone(leader.try_acquire('jobs', 'worker-a', ttl))
+
+        leader.release('jobs', 'worker-b')
+        self.assertIsNotNone(leader.try_acquire('jobs', 'worker-a', ttl))
+        print("Scheduler Lease: OK")
+
+    def test_lease_decides_who_schedules(self):
+        from unittest import mock
+        from datetime import timedelta
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from finance import leader, scheduler
+        paused = BackgroundScheduler()
+        paused.start(paused=True)
+        self.addCleanup(paused.shutdown, wait=False)
+        leader.try_acquire(scheduler.LEASE_NAME, 'other-process', timedelta(seconds=60))
+
+        with mock.patch.multiple(scheduler, _scheduler=paused, _holder='this-process', _lease_expires=None):
+            scheduler.renew_lease()
+            self.assertFalse(scheduler.is_leader())
+            self.assertIsNone(paused.get_job(scheduler.JOB_ID))
+
+            leader.release(scheduler.LEASE_NAME, 'other-process')
+            scheduler.renew_lease()
+            self.assertTrue(scheduler.is_leader())
+            self.assertIsNotNone(paused.get_job(scheduler.JOB_ID))
+        print("Scheduler Leader Election: OK")
+
+    def test_no_autostart_in_management_commands(self):
+        from unittest import mock
+        from finance import scheduler
+        self.assertFalse(scheduler.should_autostart(['manage.py', 'migrate']))
+        self.assertFalse(scheduler.should_autostart(['manage.py', 'send_reminders']))
+        self.assertFalse(scheduler.should_autostart(['manage.py', 'runserver'])) # Reloader parent
+        self.assertTrue(scheduler.should_autostart(['manage.py', 'runserver', '--noreload']))
+        with mock.patch.dict('os.environ', {'RUN_MAIN': 'true'}):
+            self.assertTrue(scheduler.should_autostart(['manage.py', 'runserver']))
+        self.assertTrue(scheduler.should_autostart(['/usr/bin/gunicorn', 'server.wsgi']))
+        print("Scheduler Autostart: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='repeatuser', password='password')
+        self.client.login(username='repeatuser', password='password')
+
+    def _aware(self, *args):
+        from datetime import datetime
+        return timezone.make_aware(datetime(*args))
+
+    def test_monthly_occurrences_keep_their_day(self):
+        from finance import recurrence
+        from finance.models import RecurrenceRule
+        rule = RecurrenceRule(frequency='monthly', interval=1, start=self._aware(2026, 1, 31, 9))
+        days = [timezone.localtime(recurrence.occurrence(rule, n)).date().isoformat() for n in range(4)]
+        self.assertEqual(days, ['2026-01-31', '2026-02-28', '2026-03-31', '2026-04-30'])
+        rule.frequency, rule.interval = 'custom', 10
+        self.assertEqual(recurrence.occurrence(rule, 2), self._aware(2026, 2, 20, 9))
+        print("Recurrence Dates: OK")
+
+    def test_materialize_is_idempotent(self):
+        from finance import recurrence
+        from finance.models import Savings
+        rent = Expense.objects.create(user=self.user, category=expense_category(self.user, 'Rent'), amount=15000, payment_method=payment_method(self.user, 'Mobile Banking'), date=self._aware(2026, 1, 1, 8))
+        salary = Income.objects.create(user=self.user, source=income_category(self.user, 'Salary'), amount=50000, date=self._aware(2026, 1, 28, 10))
+        recurrence.create_rule(rent, 'monthly')
+        recurrence.create_rule(salary, 'monthly', until=self._aware(2026, 2, 28, 0).date())
+
+        now = self._aware(2026, 4, 15)
+        self.assertEqual(recurrence.materialize(now), {'rules': 2, 'Income': 1, 'Expense': 3, 'Reminder': 0})
+        self.assertEqual(recurrence.materialize(now), {'rules': 0, 'Income': 0, 'Expense': 0, 'Reminder': 0})
+
+        self.assertEqual(Expense.objects.filter(user=self.user, category__name='Rent', payment_method__name='Mobile Banking').count(), 4)
+        self.assertEqual(Income.objects.filter(user=self.user).count(), 2) # Stopped after February
+        self.assertEqual(Savings.objects.filter(user=self.user, is_automatic=True).count(), 2)
+        print("Recurrence Materialization: OK")
+
+    def test_batched_queries_do_not_grow_with_rules(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from finance import recurrence
+        from finance.models import Reminder
+
+        def run(rule_count):
+            start = self._aware(2026, 1, 1, 9)
+            for i in range(rule_count):
+                recurrence.create_rule(Reminder.objects.create(user=self.user, title=f'Bill {i}', reminder_date=start), 'weekly')
+            with CaptureQueriesContext(connection) as ctx:
+                counts = recurrence.materialize(self._aware(2026, 1, 16), batch_size=100)
+            self.assertEqual(counts['Reminder'], rule_count * 2)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(run(3), run(60))
+        print("Recurrence Batching: OK")
+
+    def test_repeat_from_reminder_form(self):
+        from finance.models import RecurrenceRule
+        response = self.client.post(reverse('add_reminder'), {
+            'title': 'Internet bill', 'message': '', 'date': '2026-02-05', 'time': '09:00',
+            'repeat': 'monthly', 'repeat_every': 1,
+        })
+        self.assertEqual(response.status_code, 302)
+        rule = RecurrenceRule.objects.get(user=self.user)
+        self.assertEqual((rule.kind, rule.count, rule.next_run), ('Reminder', 1, self._aware(2026, 3, 5, 9)))
+
+        self.client.get(reverse('stop_recurrence', args=[rule.pk]))
+        self.assertFalse(RecurrenceRule.objects.get(pk=rule.pk).is_active)
+        print("Recurrence Form: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class CategoryCacheTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='catuser', password='password')
+        self.client.login(username='catuser', password='password')
+        caching.get_cache().clear()
+
+    def category_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Reads of the category tables themselves; a JOIN for a budget's category name does not count
+        tables = ('finance_incomecategory', 'finance_expensecategory', 'finance_paymentmethod')
+        return response, sum(1 for q in ctx.captured_queries if any(f'FROM "{table}"' in q['sql'] for table in tables))
+
+    def test_defaults_seeded_with_user(self):
+        from finance import categories
+        from finance.models import IncomeCategory, ExpenseCategory, PaymentMethod
+        self.assertEqual(list(IncomeCategory.objects.filter(user=self.user).values_list('name', flat=True)), categories.DEFAULT_INCOME_CATEGORIES)
+        self.assertEqual(ExpenseCategory.objects.filter(user=self.user, is_default=True).count(), len(categories.DEFAULT_EXPENSE_CATEGORIES))
+        self.assertEqual(PaymentMethod.objects.filter(user=self.user).count(), len(categories.DEFAULT_PAYMENT_METHODS))
+        print("Default Categories Seeded: OK")
+
+    def test_warm_forms_skip_category_queries(self):
+        for url in ('add_income', 'add_expense', 'add_budget'):
+            self.category_queries(reverse(url))
+            response, queries = self.category_queries(reverse(url))
+            self.assertEqual(queries, 0, url)
+        response, _ = self.category_queries(reverse('add_expense'))
+        self.assertIn('Khalti', [label for value, label in response.context['form'].fields['payment_method'].choices])
+        print("Category Cache Hit: OK")
+
+    def test_new_category_invalidates_choices(self):
+        self.category_queries(reverse('add_expense'))
+        self.client.post(reverse('add_budget'), {
+            'category': 'Add New', 'new_category': 'Vacation', 'limit_amount': 20000,
+            'period': 'Monthly', 'start_date': date.today(),
+        })
+        response, queries = self.category_queries(reverse('add_expense'))
+        self.assertGreater(queries, 0)
+        self.assertIn('Vacation', [label for value, label in response.context['form'].fields['category'].choices])
+        print("Category Cache Invalidation: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class SyntheticBenchmarkTests(TestCase):
+    def test_generate_is_reproducible(self):
+        from finance import synthetic
+        from finance.models import Reminder
+        end = date(2026, 3, 31)
+        counts = synthetic.generate(users=2, years=0.1, seed=7, end=end, prefix='syn')
+        self.assertEqual(counts['users'], 2)
+        self.assertEqual(Expense.objects.filter(user__username__startswith='syn').count(), counts['expenses'])
+        self.assertTrue(Reminder.objects.filter(user__username='syn0000', email_sent__in=[False]).exists())
+        first = list(Expense.objects.filter(user__username='syn0000').order_by('date', 'amount').values_list('amount', 'category__name'))
+
+        synthetic.generate(users=1, years=0.1, seed=7, end=end, prefix='again')
+        again = list(Expense.objects.filter(user__username='again0000').order_by('date', 'amount').values_list('amount', 'category__name'))
+        self.assertEqual(first, again)
+        print("Synthetic Data Reproducible: OK")
+
+    def test_benchmark_run(self):
+        from finance import benchmarks, synthetic
+        synthetic.generate(users=1, years=0.1, prefix='syn')
+        user = User.objects.get(username='syn0000')
+        results = benchmarks.run(user, ['dashboard', 'send_reminders'], runs=2, warmup=0, cold=True)
+        self.assertEqual(set(results['results']), {'dashboard', 'send_reminders'})
+        self.assertGreater(results['results']['dashboard']['queries'], 0)
+        self.assertGreater(results['rows']['due_reminders'], 0)
+        # send_reminders is rolled back, so the reminders stay due for the next run
+        self.assertEqual(benchmarks.run(user, ['send_reminders'], runs=1, warmup=0)['rows']['due_reminders'], results['rows']['due_reminders'])
+        self.assertEqual(benchmarks.compare(results, results)['dashboard']['queries'], 0)
+        with self.assertRaises(ValueError):
+            benchmarks.run(user, ['nope'])
+        print("Benchmark Run: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='timeduser', password='password')
+        self.client.login(username='timeduser', password='password')
+        caching.get_cache().clear()
+
+    def test_disabled_by_default(self):
+        from django.test import override_settings
+        with override_settings(FINANCE_REQUEST_TIMING=False):
+            response = self.client.get(reverse('dashboard'))
+        self.assertNotIn('Server-Timing', response)
+        print("Request Timing Disabled: OK")
+
+    def test_server_timing_header(self):
+        from django.test import override_settings
+        with override_settings(FINANCE_REQUEST_TIMING=True, FINANCE_SLOW_REQUEST_MS=60000):
+            with self.assertNoLogs('finance.middleware'):
+                response = self.client.get(reverse('dashboard'))
+        metrics = {part.split(';')[0]: part for part in response['Server-Timing'].split(', ')}
+        self.assertEqual(set(metrics), {'db', 'template', 'view', 'total'})
+        self.assertRegex(metrics['db'], r'desc="[1-9]\d* queries"')
+        print("Server-Timing Header: OK")
+
+    def test_slow_request_logged(self):
+        import json
+        from django.test import override_settings
+        with override_settings(FINANCE_REQUEST_TIMING=True, FINANCE_SLOW_REQUEST_MS=0):
+            with self.assertLogs('finance.middleware', 'WARNING') as logs:
+                self.client.get(reverse('all_transactions'))
+        record = json.loads(logs.records[0].getMessage().split(' ', 2)[2])
+        self.assertEqual((record['path'], record['status'], record['user_id']), (reverse('all_transactions'), 200, self.user.pk))
+        self.assertTrue(record['top_queries'])
+        self.assertLessEqual(sum(q['count'] for q in record['top_queries']), record['queries'])
+        print("Slow Request Log: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(FINANCE_PROFILE_DIR=self.tmp.name, FINANCE_PROFILE_SAMPLE_RATE=1.0, FINANCE_PROFILE_KEEP=3)
+        self.settings_override.enable()
+        self.client = Client()
+        self.user = User.objects.create_user(username='profuser', password='password')
+        self.client.login(username='profuser', password='password')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def test_sampled_requests_dumped_and_rotated(self):
+        import os
+        for _ in range(5):
+            self.client.get(reverse('dashboard'))
+        files = sorted(os.listdir(self.tmp.name))
+        self.assertEqual(len(files), 3)
+        self.assertTrue(all('-dashboard-' in name for name in files))
+        print("Profiles Dumped And Rotated: OK")
+
+    def test_rate_zero_skips(self):
+        import os
+        from finance import profiling
+        with profiling.sampled('send_reminders', rate=0) as sample:
+            pass
+        self.assertIsNone(sample.path)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        print("Profiling Not Sampled: OK")
+
+    def test_hotspots_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from finance import profiling
+        with profiling.sampled('send_reminders') as sample:
+            call_command('send_reminders', stdout=StringIO())
+        rows = profiling.hotspots([sample.path], sort='cumtime', limit=5)
+        self.assertEqual(len(rows), 5)
+        self.assertGreaterEqual(rows[0]['cumtime_ms'], rows[-1]['cumtime_ms'])
+        out = StringIO()
+        call_command('profile_hotspots', '--name', 'send_reminders', stdout=out)
+        self.assertIn('1 profiles', out.getvalue())
+        print("Profile Hotspots: OK")
+
+@override_settings(CACHES=TEST_CACHES)
+class MetricsTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from finance import metrics
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(FINANCE_METRICS=True, FINANCE_METRICS_DIR=self.tmp.name, FINANCE_METRICS_TOKEN='secret', FINANCE_METRICS_ALLOW_LOCALHOST=False)
+        self.settings_override.enable()
+        metrics.reset()
+        self.client = Client()
+        self.user = User.objects.create_user(username='metricsuser', password='password', email='metrics@example.com')
+        self.client.login(username='metricsuser', password='password')
+
+    def tearDown(self):
+        from finance import metrics
+        metrics.reset()
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def test_request_metrics_exposed(self):
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('dashboard'))
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('finance_request_duration_seconds_count{status="200",view="dashboard"} 2', text)
+        self.assertIn('finance_request_queries_bucket{view="dashboard",le="+Inf"} 2', text)
+        self.assertIn('finance_outbox_depth 0', text)
+        self.assertNotIn('view="metrics"', text)
+        print("Metrics Endpoint: OK")
+
+    def test_send_reminders_counted(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from finance.models import Reminder
+        from finance import metrics
+        Reminder.objects.create(user=self.user, title='Rent', message='Pay rent', reminder_date=timezone.now())
+        call_command('send_reminders', stdout=StringIO())
+        self.assertIn('finance_reminders_total{outcome="queued"} 1', metrics.render())
+        print("Reminder Metrics: OK")
+
+    def test_processes_aggregated(self):
+        import json, os
+        from finance import metrics
+        metrics.inc('finance_job_failures_total', job='send_reminders')
+        other = {'counters': [['finance_job_failures_total', {'job': 'send_reminders'}, 2]], 'histograms': []}
+        with open(os.path.join(self.tmp.name, f'{os.getpid()}-other.json'), 'w') as f:
+            json.dump(other, f) # Another live worker
+        with open(os.path.join(self.tmp.name, '999999999-gone.json'), 'w') as f:
+            json.dump(other, f) # A worker that has exited
+        self.assertEqual(metrics.collect()['counters'][('finance_job_failures_total', (('job', 'send_reminders'),))], 5)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, '999999999-gone.json')))
+        self.assertEqual(metrics.collect()['counters'][('finance_job_failures_total', (('job', 'send_reminders'),))], 5)
+        print("Metrics Aggregated Across Processes: OK")
+
+    def test_concurrent_flushes(self):
+        import os
+        from concurrent.futures import ThreadPoolExecutor
+        from finance import metrics
+        metrics.inc('finance_reminders_total', outcome='queued')
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for future in [pool.submit(metrics.flush, force=True) for _ in range(200)]:
+                future.result() # Raises if any flush did
+        self.assertEqual([name for name in os.listdir(self.tmp.name) if not name.endswith('.json')], [])
+        print("Concurrent Metrics Flushes: OK")
+
+    def test_flush_failure_does_not_break_request(self):
+        from unittest import mock
+        from finance import metrics
+        with mock.patch.object(metrics, 'snapshot', side_effect=OSError('disk full')), self.assertLogs('finance.metrics', 'ERROR'):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        print("Metrics Failure Isolated: OK")
+
+    def test_access(self):
+        from django.test import override_settings
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403) # Test client comes from 127.0.0.1
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+        with override_settings(FINANCE_METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+            with override_settings(FINANCE_METRICS_ALLOW_LOCALHOST=True):
+                self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        with override_settings(FINANCE_METRICS=False):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').status_code, 404)
+        print("Metrics Access: OK")
+
+# Not overridden: the boot subprocess needs the real settings module, and nothing here touches a cache
+class BootImportTests(TestCase):
+    def test_parse_importtime(self):
+        from finance import benchmarks
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   finance.utils\n"
+            "import time:       300 |        420 | finance.views\n"
+            "import time:        50 |         50 | site\n"
+        )
+        self.assertEqual(benchmarks._parse_importtime(stderr), [('finance.views', 420), ('site', 50)])
+        print("Import Time Parsing: OK")
+
+    def test_heavy_packages_deferred(self):
+        from finance import benchmarks
+        results = benchmarks.import_time(runs=1)
+        self.assertEqual(results['deferred_loaded'], [])
+        self.assertGreater(results['total_ms'], 0)
+        print("Heavy Imports Deferred: OK")
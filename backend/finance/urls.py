@@ -10,9 +10,16 @@ urlpatterns = [
     path('add-reminder/', views.add_reminder, name='add_reminder'),
     path('reports/', views.finance_report, name='finance_report'),
     path('download-report/', views.download_report_pdf, name='download_report_pdf'),
+    path('export/', views.export_transactions, name='export_transactions'),
+    path('report-jobs/', views.start_report_job, name='start_report_job'),
+    path('import-statement/', views.upload_statement, name='upload_statement'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
     path('complete-reminder/<int:pk>/', views.complete_reminder, name='complete_reminder'),
     path('delete-reminder/<int:pk>/', views.delete_reminder, name='delete_reminder'),
+    path('stop-recurrence/<int:pk>/', views.stop_recurrence, name='stop_recurrence'),
     path('transactions/', views.all_transactions, name='all_transactions'),
+    path('metrics/', views.metrics_endpoint, name='metrics'),
     path('delete-income/<int:pk>/', views.delete_income, name='delete_income'),
     path('delete-expense/<int:pk>/', views.delete_expense, name='delete_expense'),
     path('delete-budget/<int:pk>/', views.delete_budget, name='delete_budget'),
@@ -1,13 +1,41 @@
+import os
+import tempfile
 from io import BytesIO
 from django.http import HttpResponse
 from django.template.loader import get_template
-from xhtml2pdf import pisa
+from .middleware import timed
+from . import metrics
+
+def _pisa():
+    # xhtml2pdf drags in reportlab, html5lib and pyhanko (most of a worker's boot time),
+    # so it is only imported when the first PDF is rendered
+    from xhtml2pdf import pisa
+    return pisa
 
 def render_to_pdf(template_src, context_dict={}):
     template = get_template(template_src)
     html  = template.render(context_dict)
     result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html.encode("ISO-8859-1")), result)
+    with timed('pdf'), metrics.timer('finance_pdf_render_seconds'):
+        pdf = _pisa().pisaDocument(BytesIO(html.encode("ISO-8859-1")), result)
     if not pdf.err:
         return HttpResponse(result.getvalue(), content_type='application/pdf')
     return None
+
+def render_pdf_to_file(template_src, context_dict, path):
+    # Render into a temporary file of this call's own first, so readers never see a
+    # half-written PDF and concurrent renders of the same report never share one
+    template = get_template(template_src)
+    html = template.render(context_dict)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    result = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False)
+    try:
+        with result, timed('pdf'), metrics.timer('finance_pdf_render_seconds'):
+            pdf = _pisa().pisaDocument(BytesIO(html.encode("ISO-8859-1")), result)
+        if pdf.err:
+            return False
+        os.replace(result.name, path)
+        return True
+    finally:
+        if os.path.exists(result.name):
+            os.remove(result.name) # Failed or raised: never leave it behind for evict() to miss
@@ -1,155 +1,74 @@
+import hmac
+import os
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse, JsonResponse, FileResponse, Http404
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum
 from django.utils import timezone
-from datetime import datetime
-from .models import Income, Expense, SavingsGoal, Budget, Reminder, Savings
-from .forms import IncomeForm, ExpenseForm, SavingsGoalForm, BudgetForm, ReminderForm
-from .utils import render_to_pdf
+from .models import Income, Expense, Budget, Reminder, DailyRollup, BackgroundJob, RecurrenceRule
+from .forms import ADD_NEW, IncomeForm, ExpenseForm, SavingsGoalForm, BudgetForm, ReminderForm
+from . import rollups, budgets, caching, ledger, reports, exports, jobs, statements, recurrence, metrics
 from django.contrib.humanize.templatetags.humanize import intcomma
 
+CHART_WINDOWS = (7, 30, 90, 365)
+
 @login_required
 def dashboard(request):
-    # Overall statistics
-    total_income = Income.objects.filter(user=request.user).aggregate(Sum('amount'))['amount__sum'] or 0
-    total_expense = Expense.objects.filter(user=request.user).aggregate(Sum('amount'))['amount__sum'] or 0
+    today = timezone.localdate()
+    chart_days = request.GET.get('days', '7')
+    chart_days = int(chart_days) if chart_days.isdigit() and int(chart_days) in CHART_WINDOWS else 7
+
+    # Cached per data version and local day, so figures roll over at midnight
+    context = caching.memoize(
+        request.user.pk, 'dashboard', lambda: _dashboard_context(request.user, today, chart_days), today, chart_days,
+        timeout=caching.seconds_until_local_midnight(),
+    )
+    return render(request, 'finance/dashboard.html', context)
+
+def _dashboard_context(user, today, chart_days=7):
+    # Overall statistics (read from the daily rollup table, not the raw transactions)
+    totals, total_automated_savings, categories = rollups.overview(user)
+    total_income = totals['Income']
+    total_expense = totals['Expense']
     total_savings = total_income - total_expense
-    total_automated_savings = Savings.objects.filter(user=request.user, is_automatic=True).aggregate(Sum('amount'))['amount__sum'] or 0
     unallocated_savings = total_savings - total_automated_savings
 
-    today = timezone.localdate()
     yesterday = today - timezone.timedelta(days=1)
     last_30_days = today - timezone.timedelta(days=30)
 
-    today_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
-    today_end = timezone.make_aware(datetime.combine(today, datetime.max.time()))
-    yesterday_start = timezone.make_aware(datetime.combine(yesterday, datetime.min.time()))
-    yesterday_end = timezone.make_aware(datetime.combine(yesterday, datetime.max.time()))
+    chart_start = today - timezone.timedelta(days=chart_days - 1)
+
+    # One query for every per-day figure: today/yesterday/30-day expense and the chart
+    daily = rollups.daily_totals(user, min(last_30_days, chart_start))
 
     # Specific time period expenses
-    today_expense = Expense.objects.filter(
-        user=request.user, 
-        date__range=(today_start, today_end)
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-    
-    yesterday_expense = Expense.objects.filter(
-        user=request.user, 
-        date__range=(yesterday_start, yesterday_end)
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-    
-    last_30_days_expense = Expense.objects.filter(
-        user=request.user, 
-        date__gte=timezone.make_aware(datetime.combine(last_30_days, datetime.min.time()))
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
+    today_expense = daily.get(('Expense', today), 0)
+    yesterday_expense = daily.get(('Expense', yesterday), 0)
+    last_30_days_expense = sum(total for (kind, day), total in daily.items() if kind == 'Expense' and day >= last_30_days)
 
-    # Chart data: daily expenses and income for the last 7 days (including today)
-    seven_days_ago = today - timezone.timedelta(days=6)
-    
-    # Construct aware start/end datetimes for the range to avoid SQLite date lookup issues
-    start_dt = timezone.make_aware(timezone.datetime.combine(seven_days_ago, timezone.datetime.min.time()))
-    end_dt = timezone.make_aware(timezone.datetime.combine(today, timezone.datetime.max.time()))
-
-    # Fetch all relevant records using efficient range filter
-    relevant_expenses = Expense.objects.filter(
-        user=request.user, 
-        date__gte=start_dt, 
-        date__lte=end_dt
-    )
-    relevant_income = Income.objects.filter(
-        user=request.user, 
-        date__gte=start_dt, 
-        date__lte=end_dt
-    )
-    
-    # Aggregate in Python to avoid SQLite TruncDate issues
-    expense_map = {}
-    for exp in relevant_expenses:
-        local_date = timezone.localtime(exp.date).date()
-        expense_map[local_date] = expense_map.get(local_date, 0) + float(exp.amount)
-        
-    income_map = {}
-    for inc in relevant_income:
-        local_date = timezone.localtime(inc.date).date()
-        income_map[local_date] = income_map.get(local_date, 0) + float(inc.amount)
-    
+    # Chart data: daily expenses and income for the selected window (including today)
     chart_dates = []
     expense_chart_data = []
     income_chart_data = []
     
-    for i in range(6, -1, -1):
+    for i in range(chart_days - 1, -1, -1):
         day = today - timezone.timedelta(days=i)
         chart_dates.append(day.strftime('%b %d'))
-        expense_chart_data.append(expense_map.get(day, 0.0))
-        income_chart_data.append(income_map.get(day, 0.0))
-
-    # Category summary
-    categories = Expense.objects.filter(user=request.user).values('category').annotate(total=Sum('amount')).order_by('-total')
+        expense_chart_data.append(float(daily.get(('Expense', day), 0)))
+        income_chart_data.append(float(daily.get(('Income', day), 0)))
 
-    # Combined Transaction History
-    recent_income = Income.objects.filter(user=request.user).order_by('-date')[:10]
-    recent_expenses = Expense.objects.filter(user=request.user).order_by('-date')[:10]
-    
-    recent_transactions = []
-    for inc in recent_income:
-        inc.transaction_type = 'Income'
-        recent_transactions.append(inc)
-    for exp in recent_expenses:
-        exp.transaction_type = 'Expense'
-        recent_transactions.append(exp)
-        
-    # Sort merged list by date descending and take top 5
-    recent_transactions = sorted(recent_transactions, key=lambda x: x.date, reverse=True)[:5]
+    # Combined Transaction History (newest five income/expense ledger entries)
+    recent_transactions = ledger.recent(user, 5)
     for tx in recent_transactions:
-        tx.amount_f = intcomma(int(tx.amount))
+        tx.amount_f = intcomma(int(tx.display_amount))
 
-    # Active Pockets (Budgets)
-    active_budgets = Budget.objects.filter(user=request.user).order_by('end_date')
-    
-    weekly_pockets = []
-    monthly_pockets = []
-    
-    for budget in active_budgets:
-        # Check if active
-        is_active = True
-        if budget.start_date and budget.end_date:
-            if not (budget.start_date <= today <= budget.end_date):
-                is_active = False # Skip inactive for "Active Pockets" list
-
-        if is_active:
-            # Calculate spent in this pocket's period and category
-            expenses_query = Expense.objects.filter(
-                user=request.user, 
-                category=budget.category
-            )
-            
-            if budget.start_date:
-                expenses_query = expenses_query.filter(date__gte=budget.start_date)
-            if budget.end_date:
-                expenses_query = expenses_query.filter(date__lte=budget.end_date)
-                
-            spent = expenses_query.aggregate(Sum('amount'))['amount__sum'] or 0
-            remaining = (budget.limit_amount or 0) - spent
-            
-            pocket_data = {
-                'category': budget.category,
-                'limit': budget.limit_amount,
-                'limit_f': intcomma(int(budget.limit_amount)),
-                'spent': spent,
-                'spent_f': intcomma(int(spent)),
-                'remaining': remaining,
-                'remaining_f': intcomma(int(remaining)),
-                'period': budget.period,
-                'end_date': budget.end_date,
-                'start_date': budget.start_date
-            }
-            
-            if budget.period == 'Weekly':
-                weekly_pockets.append(pocket_data)
-            else:
-                monthly_pockets.append(pocket_data)
+    # Active Pockets (Budgets), spending for all of them comes from one grouped query
+    weekly_pockets, monthly_pockets = budgets.active_pockets(user, today)
 
-    context = {
+    return {
         'income_total': total_income,
         'expense_total': total_expense,
         'savings': total_savings,
@@ -168,6 +87,8 @@ def dashboard(request):
         'today_expense': today_expense,
         'yesterday_expense': yesterday_expense,
         'last_30_days_expense': last_30_days_expense,
+        'chart_days': chart_days,
+        'chart_windows': CHART_WINDOWS,
         'chart_dates': chart_dates,
         'expense_chart_data': expense_chart_data,
         'income_chart_data': income_chart_data,
@@ -175,40 +96,37 @@ def dashboard(request):
         'recent_transactions': recent_transactions,
         'weekly_budgets': weekly_pockets,
         'monthly_budgets': monthly_pockets,
-        'reminders': Reminder.objects.filter(user=request.user, is_completed=False).order_by('reminder_date'),
+        'reminders': list(Reminder.objects.filter(user=user, is_completed=False).order_by('reminder_date')),
     }
-    return render(request, 'finance/dashboard.html', context)
 
 @login_required
 def all_transactions(request):
-    income_records = Income.objects.filter(user=request.user).order_by('-date')
-    expense_records = Expense.objects.filter(user=request.user).order_by('-date')
-    
-    transactions = []
-    for inc in income_records:
-        inc.transaction_type = 'Income'
-        transactions.append(inc)
-    for exp in expense_records:
-        exp.transaction_type = 'Expense'
-        transactions.append(exp)
-        
-    # Sort all transactions by date descending
-    transactions = sorted(transactions, key=lambda x: x.date, reverse=True)
+    # Keyset pagination over the merged income/expense history, see finance.ledger
+    transactions, prev_cursor, next_cursor = ledger.page(
+        request.user, after=request.GET.get('after'), before=request.GET.get('before'),
+    )
+    record_count = DailyRollup.objects.filter(
+        user=request.user, kind__in=['Income', 'Expense']
+    ).aggregate(Sum('count'))['count__sum'] or 0
     
     context = {
         'transactions': transactions,
+        'record_count': record_count,
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor,
     }
     return render(request, 'finance/all_transactions.html', context)
 
+def _save_recurrence(form, entry):
+    # "Repeat" chosen on the form: the saved entry becomes the first occurrence of a rule
+    frequency = form.cleaned_data.get('repeat')
+    if frequency:
+        recurrence.create_rule(entry, frequency, form.cleaned_data.get('repeat_every'), form.cleaned_data.get('repeat_until'))
+
 @login_required
 def add_income(request):
     from .models import IncomeCategory
-    # Ensure some default categories exist if the user has none
-    defaults = ['Salary', 'Bonus', 'Allowance', 'Overtime', 'Investment', 'Other']
-    if not IncomeCategory.objects.filter(user=request.user).exists():
-        for cat in defaults:
-            IncomeCategory.objects.get_or_create(user=request.user, name=cat, is_default=True)
-
+    # Default categories are created with the user, see signals.seed_default_categories
     if request.method == 'POST':
         form = IncomeForm(request.POST, user=request.user)
         if form.is_valid():
@@ -218,11 +136,10 @@ def add_income(request):
             source = form.cleaned_data.get('source')
             new_cat = form.cleaned_data.get('new_category')
             
-            if source == 'Add New' and new_cat:
-                IncomeCategory.objects.get_or_create(user=request.user, name=new_cat)
-                income.source = new_cat
+            if source == ADD_NEW:
+                income.source = IncomeCategory.objects.get_or_create(user=request.user, name=new_cat)[0]
             else:
-                income.source = source
+                income.source_id = int(source)
             
             # Combine Date and Time
             date_val = form.cleaned_data.get('date')
@@ -235,6 +152,7 @@ def add_income(request):
                     income.date = timezone.make_aware(income.date)
                 
             income.save()
+            _save_recurrence(form, income)
             
             # Create automatic savings (20%) - Now handled by signals
             return redirect('dashboard')
@@ -245,18 +163,7 @@ def add_income(request):
 @login_required
 def add_expense(request):
     from .models import ExpenseCategory, PaymentMethod
-    # Ensure some default categories exist
-    defaults = ['Food', 'Rent', 'Utilities', 'Transportation', 'Entertainment', 'Health', 'Groceries', 'Other']
-    if not ExpenseCategory.objects.filter(user=request.user).exists():
-        for cat in defaults:
-            ExpenseCategory.objects.get_or_create(user=request.user, name=cat, is_default=True)
-    
-    # Ensure default payment methods exist
-    p_defaults = ['Esewa', 'Khalti', 'Mobile Banking', 'Cash']
-    if not PaymentMethod.objects.filter(user=request.user).exists():
-        for pm in p_defaults:
-            PaymentMethod.objects.get_or_create(user=request.user, name=pm, is_default=True)
-
+    # Default categories and payment methods are created with the user, see signals.seed_default_categories
     if request.method == 'POST':
         form = ExpenseForm(request.POST, user=request.user)
         if form.is_valid():
@@ -266,20 +173,18 @@ def add_expense(request):
             # Handle Category
             category = form.cleaned_data.get('category')
             new_cat = form.cleaned_data.get('new_category')
-            if category == 'Add New' and new_cat:
-                ExpenseCategory.objects.get_or_create(user=request.user, name=new_cat)
-                expense.category = new_cat
+            if category == ADD_NEW:
+                expense.category = ExpenseCategory.objects.get_or_create(user=request.user, name=new_cat)[0]
             else:
-                expense.category = category
+                expense.category_id = int(category)
             
             # Handle Payment Method
             pm = form.cleaned_data.get('payment_method')
             new_pm = form.cleaned_data.get('new_payment_method')
-            if pm == 'Add New' and new_pm:
-                PaymentMethod.objects.get_or_create(user=request.user, name=new_pm)
-                expense.payment_method = new_pm
+            if pm == ADD_NEW:
+                expense.payment_method = PaymentMethod.objects.get_or_create(user=request.user, name=new_pm)[0]
             else:
-                expense.payment_method = pm
+                expense.payment_method_id = int(pm)
             
             # Combine Date and Time
             date_val = form.cleaned_data.get('date')
@@ -291,6 +196,7 @@ def add_expense(request):
                     expense.date = timezone.make_aware(expense.date)
                 
             expense.save()
+            _save_recurrence(form, expense)
             return redirect('dashboard')
     else:
         form = ExpenseForm(user=request.user)
@@ -320,12 +226,11 @@ def add_budget(request):
             # Handle Category
             category = form.cleaned_data.get('category')
             new_cat = form.cleaned_data.get('new_category')
-            if category == 'Add New' and new_cat:
+            if category == ADD_NEW:
                 from .models import ExpenseCategory
-                ExpenseCategory.objects.get_or_create(user=request.user, name=new_cat)
-                budget.category = new_cat
+                budget.category = ExpenseCategory.objects.get_or_create(user=request.user, name=new_cat)[0]
             else:
-                budget.category = category
+                budget.category_id = int(category)
 
             # Calculate end_date based on period
             if budget.period == 'Weekly':
@@ -339,13 +244,9 @@ def add_budget(request):
     else:
         form = BudgetForm(user=request.user)
     
-    weekly_budgets = Budget.objects.filter(user=request.user, period='Weekly').order_by('-start_date')
-    monthly_budgets = Budget.objects.filter(user=request.user, period='Monthly').order_by('-start_date')
-    
-    for b in weekly_budgets:
-        b.limit_f = intcomma(int(b.limit_amount))
-    for b in monthly_budgets:
-        b.limit_f = intcomma(int(b.limit_amount))
+    all_budgets = budgets.evaluate(request.user, Budget.objects.filter(user=request.user).select_related('category').order_by('-start_date'))
+    weekly_budgets = [b for b in all_budgets if b.period == 'Weekly']
+    monthly_budgets = [b for b in all_budgets if b.period == 'Monthly']
         
     context = {
         'form': form, 
@@ -379,17 +280,20 @@ def add_reminder(request):
                     reminder.reminder_date = timezone.make_aware(reminder.reminder_date)
             
             reminder.save()
+            _save_recurrence(form, reminder)
             return redirect('add_reminder')
     else:
         form = ReminderForm()
     
     active_reminders = Reminder.objects.filter(user=request.user, is_completed=False).order_by('reminder_date')
+    recurring = RecurrenceRule.objects.filter(user=request.user, is_active=True).order_by('kind', 'next_run')
     completed_reminders = Reminder.objects.filter(user=request.user, is_completed=True).order_by('-reminder_date')
     
     context = {
         'form': form,
         'active_reminders': active_reminders,
         'completed_reminders': completed_reminders,
+        'recurring': recurring,
         'title': 'Reminders'
     }
     return render(request, 'finance/reminder_list.html', context)
@@ -401,6 +305,13 @@ def complete_reminder(request, pk):
     reminder.save()
     return redirect(request.META.get('HTTP_REFERER', 'add_reminder'))
 
+@login_required
+def stop_recurrence(request, pk):
+    rule = get_object_or_404(RecurrenceRule, pk=pk, user=request.user)
+    rule.is_active = False
+    rule.save()
+    return redirect(request.META.get('HTTP_REFERER', 'add_reminder'))
+
 @login_required
 def delete_reminder(request, pk):
     reminder = get_object_or_404(Reminder, pk=pk, user=request.user)
@@ -409,109 +320,96 @@ def delete_reminder(request, pk):
 
 @login_required
 def finance_report(request):
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    
-    expenses_query = Expense.objects.filter(user=request.user)
-    income_query = Income.objects.filter(user=request.user)
-    
-    if start_date:
-        try:
-            sd = datetime.strptime(start_date, '%Y-%m-%d').date()
-            start_dt = timezone.make_aware(timezone.datetime.combine(sd, timezone.datetime.min.time()))
-            expenses_query = expenses_query.filter(date__gte=start_dt)
-            income_query = income_query.filter(date__gte=start_dt)
-        except ValueError:
-            pass
-            
-    if end_date:
-        try:
-            ed = datetime.strptime(end_date, '%Y-%m-%d').date()
-            end_dt = timezone.make_aware(timezone.datetime.combine(ed, timezone.datetime.max.time()))
-            expenses_query = expenses_query.filter(date__lte=end_dt)
-            income_query = income_query.filter(date__lte=end_dt)
-        except ValueError:
-            pass
-        
-    expenses_by_category = expenses_query.values('category').annotate(total=Sum('amount')).order_by('-total')
-    income_total = income_query.aggregate(Sum('amount'))['amount__sum'] or 0
-    expense_total = expenses_query.aggregate(Sum('amount'))['amount__sum'] or 0
-    net_balance = income_total - expense_total
-    
-    # Fetch individual expenses for the detailed table
-    expenses = expenses_query.order_by('-date')
+    report = reports.build_report(request.user, request.GET.get('start_date'), request.GET.get('end_date'))
     
     # Add formatted amounts to lists
-    for item in expenses_by_category:
-        item['total_f'] = intcomma(int(item['total']))
-    
-    for exp in expenses:
-        exp.amount_f = intcomma(int(exp.amount))
+    expenses_by_category = [dict(item, total_f=intcomma(int(item['total']))) for item in report['expenses_by_category']]
+    for exp in report['expenses']:
+        exp.amount_f = intcomma(int(exp.display_amount))
 
     context = {
+        **report,
         'expenses_by_category': expenses_by_category,
-        'expenses': expenses,
-        'income_total': income_total,
-        'expense_total': expense_total,
-        'net_balance': net_balance,
-        'income_total_f': intcomma(int(income_total)),
-        'expense_total_f': intcomma(int(expense_total)),
-        'net_balance_f': intcomma(int(net_balance)),
-        'start_date': start_date,
-        'end_date': end_date,
+        'income_total_f': intcomma(int(report['income_total'])),
+        'expense_total_f': intcomma(int(report['expense_total'])),
+        'net_balance_f': intcomma(int(report['net_balance'])),
     }
     return render(request, 'finance/report.html', context)
 
 @login_required
 def download_report_pdf(request):
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    
-    expenses_query = Expense.objects.filter(user=request.user)
-    income_query = Income.objects.filter(user=request.user)
-    
-    if start_date:
-        try:
-            sd = datetime.strptime(start_date, '%Y-%m-%d').date()
-            start_dt = timezone.make_aware(timezone.datetime.combine(sd, timezone.datetime.min.time()))
-            expenses_query = expenses_query.filter(date__gte=start_dt)
-            income_query = income_query.filter(date__gte=start_dt)
-        except ValueError:
-            pass
-            
-    if end_date:
+    # Only ever serves an already rendered PDF: a miss queues the render and answers like start_report_job
+    start_date, end_date = request.GET.get('start_date') or '', request.GET.get('end_date') or ''
+    path = reports.cached_report_pdf(request.user, start_date, end_date)
+    if path:
+        filename = f"Financial_Report_{timezone.now().strftime('%Y-%m-%d')}.pdf"
         try:
-            ed = datetime.strptime(end_date, '%Y-%m-%d').date()
-            end_dt = timezone.make_aware(timezone.datetime.combine(ed, timezone.datetime.max.time()))
-            expenses_query = expenses_query.filter(date__lte=end_dt)
-            income_query = income_query.filter(date__lte=end_dt)
-        except ValueError:
-            pass
-        
-    expenses_by_category = expenses_query.values('category').annotate(total=Sum('amount')).order_by('-total')
-    income_total = income_query.aggregate(Sum('amount'))['amount__sum'] or 0
-    expense_total = expenses_query.aggregate(Sum('amount'))['amount__sum'] or 0
-    net_balance = income_total - expense_total
-    
-    # Fetch individual expenses for the detailed table
-    expenses = expenses_query.order_by('-date')
-    
-    context = {
-        'expenses_by_category': expenses_by_category,
-        'expenses': expenses,
-        'income_total': income_total,
-        'expense_total': expense_total,
-        'net_balance': net_balance,
-        'user': request.user,
-        'start_date': start_date,
-        'end_date': end_date,
-    }
-    pdf_response = render_to_pdf('finance/report_pdf.html', context)
-    if pdf_response:
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+        except FileNotFoundError:
+            pass # Evicted from the PDF cache in between
+    return _report_job_response(request.user, start_date, end_date)
+
+@login_required
+@require_POST
+def start_report_job(request):
+    # Render the PDF off the request path; the report page polls job_status
+    return _report_job_response(request.user, request.POST.get('start_date') or '', request.POST.get('end_date') or '')
+
+def _report_job_response(user, start_date, end_date):
+    # An unfinished job for the same range is reused, so repeated clicks queue a single render
+    job = BackgroundJob.objects.filter(
+        user=user, kind='report_pdf', status__in=['pending', 'running'],
+        params__start_date=start_date, params__end_date=end_date,
+    ).first()
+    if job is None:
         filename = f"Financial_Report_{timezone.now().strftime('%Y-%m-%d')}.pdf"
-        pdf_response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return pdf_response
-    return HttpResponse("Not found")
+        job = jobs.create(user, 'report_pdf', start_date=start_date, end_date=end_date, filename=filename)
+    return JsonResponse({'id': job.pk, 'status_url': reverse('job_status', args=[job.pk])}, status=202)
+
+@login_required
+@require_POST
+def upload_statement(request):
+    # The file is parsed by a background job; the page polls job_status for progress
+    uploaded = request.FILES.get('statement')
+    provider = request.POST.get('provider')
+    if not uploaded or provider not in statements.PROVIDERS:
+        return JsonResponse({'error': 'Choose a statement CSV and where it is from'}, status=400)
+    path = statements.save_upload(uploaded)
+    job = jobs.create(request.user, 'statement_import', path=path, provider=provider)
+    return JsonResponse({'id': job.pk, 'status_url': reverse('job_status', args=[job.pk])}, status=202)
+
+@login_required
+def job_status(request, pk):
+    job = get_object_or_404(BackgroundJob, pk=pk, user=request.user)
+    data = {'id': job.pk, 'status': job.status, 'progress': job.progress, 'total': job.total}
+    if 'summary' in job.params:
+        data['summary'] = job.params['summary']
+    if job.status == 'done' and job.result_file:
+        data['download_url'] = reverse('job_download', args=[job.pk])
+    return JsonResponse(data)
+
+@login_required
+def job_download(request, pk):
+    job = get_object_or_404(BackgroundJob, pk=pk, user=request.user, status='done')
+    if not job.result_file or not os.path.exists(job.result_file):
+        raise Http404("Job result no longer available")
+    filename = job.params.get('filename') or os.path.basename(job.result_file)
+    return FileResponse(open(job.result_file, 'rb'), as_attachment=True, filename=filename)
+
+@login_required
+def export_transactions(request):
+    # Streamed straight from chunked queries, so the first bytes go out immediately
+    start_date, end_date = request.GET.get('start_date'), request.GET.get('end_date')
+    rows = exports.export_rows(request.user, reports.parse_day(start_date), reports.parse_day(end_date))
+    stamp = timezone.now().strftime('%Y-%m-%d')
+
+    if request.GET.get('format') == 'ndjson':
+        response = StreamingHttpResponse(exports.stream_ndjson(rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="Transactions_{stamp}.ndjson"'
+    else:
+        response = StreamingHttpResponse(exports.stream_csv(rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="Transactions_{stamp}.csv"'
+    return response
 
 @login_required
 def delete_income(request, pk):
@@ -524,3 +422,17 @@ def delete_expense(request, pk):
     expense = get_object_or_404(Expense, pk=pk, user=request.user)
     expense.delete()
     return redirect('all_transactions')
+
+def metrics_endpoint(request):
+    # For Prometheus rather than people: no login, a bearer token instead. Localhost is only
+    # trusted on request, since behind a same-host proxy every request comes from there
+    if not metrics.enabled():
+        raise Http404
+    token = getattr(settings, 'FINANCE_METRICS_TOKEN', '')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        allowed = True
+    else:
+        allowed = getattr(settings, 'FINANCE_METRICS_ALLOW_LOCALHOST', False) and request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -42,6 +42,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware; removed at startup unless FINANCE_REQUEST_TIMING
+    'finance.middleware.RequestTimingMiddleware',
+    # Removed at startup unless FINANCE_PROFILE_SAMPLE_RATE is above 0
+    'finance.middleware.ProfilingMiddleware',
+    # Removed at startup unless FINANCE_METRICS
+    'finance.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +98,23 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# The 'finance' cache holds per-user dashboard/report figures. It must be shared by
+# every worker process (a per-process local-memory cache would serve one worker's stale
+# figures after another worker's write), so it defaults to the file-based backend.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'finance': {
+        'BACKEND': os.getenv('FINANCE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('FINANCE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    },
+}
+FINANCE_CACHE_ALIAS = 'finance'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -133,6 +156,59 @@ STATICFILES_DIRS = [
 
 LOGIN_URL = 'login'
 
+# Generated files (report PDFs, uploaded statements). Served only through
+# login-protected views, never directly.
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Background jobs: at most this many PDF reports render at the same time
+FINANCE_PDF_RENDER_WORKERS = int(os.getenv('FINANCE_PDF_RENDER_WORKERS', '2'))
+# ...and this many statement CSVs import at the same time
+FINANCE_IMPORT_WORKERS = int(os.getenv('FINANCE_IMPORT_WORKERS', '1'))
+# Jobs still pending or running after this long were lost with a restarted process; the
+# scheduler leader (or `manage.py fail_stale_jobs`) marks them failed
+FINANCE_JOB_TIMEOUT_SECONDS = int(os.getenv('FINANCE_JOB_TIMEOUT_SECONDS', str(30 * 60)))
+
+# The reminder scheduler sleeps until the next due reminder, but never longer than this
+FINANCE_REMINDER_MAX_SLEEP = int(os.getenv('FINANCE_REMINDER_MAX_SLEEP', str(15 * 60)))
+# The scheduler runs in `manage.py run_scheduler`. Set FINANCE_SCHEDULER_AUTOSTART=1 to also start it
+# in every web process (they elect one leader), at the cost of loading APScheduler at boot
+FINANCE_SCHEDULER_AUTOSTART = os.getenv('FINANCE_SCHEDULER_AUTOSTART', '') == '1'
+# Processes that are not the scheduler leader signal new or moved reminders and recurrence rules
+# through the 'finance' cache; the leader reads it this often (no database queries unless signalled).
+# Workers on several hosts need a shared cache backend (e.g. Redis) for this to reach the leader
+FINANCE_SCHEDULER_POLL_SECONDS = int(os.getenv('FINANCE_SCHEDULER_POLL_SECONDS', '5'))
+# Only the process holding the scheduler lease runs it; a dead leader is replaced within this
+FINANCE_SCHEDULER_LEASE_SECONDS = int(os.getenv('FINANCE_SCHEDULER_LEASE_SECONDS', '60'))
+
+# Email outbox: concurrent senders, and retries after 1, 2, 4... minutes up to this many attempts
+FINANCE_OUTBOX_WORKERS = int(os.getenv('FINANCE_OUTBOX_WORKERS', '4'))
+FINANCE_OUTBOX_BACKOFF_SECONDS = int(os.getenv('FINANCE_OUTBOX_BACKOFF_SECONDS', '60'))
+FINANCE_OUTBOX_MAX_ATTEMPTS = int(os.getenv('FINANCE_OUTBOX_MAX_ATTEMPTS', '6'))
+
+# Rendered report PDFs are cached on disk, least recently used evicted beyond this size
+FINANCE_PDF_CACHE_DIR = os.path.join(MEDIA_ROOT, 'pdf-cache')
+FINANCE_PDF_CACHE_MAX_BYTES = int(os.getenv('FINANCE_PDF_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# Per-request query count and SQL/template/PDF/view time in a Server-Timing header.
+# Requests slower than FINANCE_SLOW_REQUEST_MS are logged to the 'finance.middleware' logger
+FINANCE_REQUEST_TIMING = os.getenv('FINANCE_REQUEST_TIMING', '') == '1'
+FINANCE_SLOW_REQUEST_MS = int(os.getenv('FINANCE_SLOW_REQUEST_MS', '1000'))
+
+# Profile this fraction (0-1) of requests, scheduler runs and background jobs with cProfile.
+# The newest FINANCE_PROFILE_KEEP profiles are kept; profile_hotspots summarizes them
+FINANCE_PROFILE_SAMPLE_RATE = float(os.getenv('FINANCE_PROFILE_SAMPLE_RATE', '0'))
+FINANCE_PROFILE_DIR = os.path.join(MEDIA_ROOT, 'profiles')
+FINANCE_PROFILE_KEEP = int(os.getenv('FINANCE_PROFILE_KEEP', '500'))
+
+# In-process metrics, served in the Prometheus text format at /finance/metrics/. Each
+# process writes its totals to FINANCE_METRICS_DIR and the endpoint adds them up. Scrapes
+# must send "Authorization: Bearer <FINANCE_METRICS_TOKEN>". FINANCE_METRICS_ALLOW_LOCALHOST=1
+# also lets requests from 127.0.0.1 in without it: never enable it behind a same-host proxy
+FINANCE_METRICS = os.getenv('FINANCE_METRICS', '') == '1'
+FINANCE_METRICS_DIR = os.path.join(MEDIA_ROOT, 'metrics')
+FINANCE_METRICS_TOKEN = os.getenv('FINANCE_METRICS_TOKEN', '')
+FINANCE_METRICS_ALLOW_LOCALHOST = os.getenv('FINANCE_METRICS_ALLOW_LOCALHOST', '') == '1'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
 
@@ -145,3 +221,6 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+# Seconds an SMTP connection may block; the outbox sizes its claims from it, so a hung server
+# cannot outlast a claim and get a message sent twice
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '30'))